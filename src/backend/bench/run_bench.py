@@ -0,0 +1,190 @@
+"""
+Offline benchmark of ingestion (per stage of `create_embedding_event_generator`) and retrieval
+(`/papers/similarity_search` latency), writing the results as JSON.
+
+Usage, from src/backend:
+    python -m bench.run_bench --output bench/results/latest.json
+    python -m bench.run_bench --compare bench/results/baseline.json --tolerance 0.2
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+import httpx
+from prometheus_client import REGISTRY
+
+from bench.standins import SampleCorpus, StubArxivServer, configure_environment, install_mongo_standin, percentiles
+
+STAGES = ["download", "validate", "convert", "chunk", "embed", "qdrant_upsert", "qdrant_search"]
+BENCH_USER = "bench"
+BENCH_PAPER = "bench-paper"
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def _stage_metrics() -> dict:
+    """
+    Read the pipeline stage counters recorded by utils/metrics.py.
+    """
+    stages = {}
+    for stage in STAGES:
+        seconds = REGISTRY.get_sample_value("pipeline_stage_duration_seconds_sum", {"stage": stage}) or 0.0
+        calls = REGISTRY.get_sample_value("pipeline_stage_duration_seconds_count", {"stage": stage}) or 0.0
+        items = REGISTRY.get_sample_value("pipeline_stage_items_total", {"stage": stage}) or 0.0
+        stages[stage] = {
+            "calls": int(calls),
+            "items": int(items),
+            "busy_seconds": round(seconds, 4),
+            "items_per_second": round(items / seconds, 3) if seconds else None,
+        }
+    return stages
+
+async def _index(main, client: httpx.AsyncClient, n_papers: int) -> dict:
+    """
+    Create a paper idea with the stub arXiv results as related papers and run the indexing pipeline on it.
+    """
+    response = await client.post("/papers/create", json={"paper_name": BENCH_PAPER, "username": BENCH_USER})
+    response.raise_for_status()
+    response = await client.post("/arxiv/search", json={"query": ["bench"], "max_results": n_papers})
+    response.raise_for_status()
+    response = await client.post("/papers/update", json={
+        "paper_name": BENCH_PAPER,
+        "username": BENCH_USER,
+        "new_data": {"keywords": ["bench"], "related_papers": response.json()["papers"]},
+    })
+    response.raise_for_status()
+
+    # Stage wall time from the progress events: from a stage's first event to the next stage's
+    stage_starts, last_stage = {}, None
+    start_time = time.perf_counter()
+    async for message in main.create_embedding_event_generator({"paper_name": BENCH_PAPER, "username": BENCH_USER}):
+        if not message.startswith("event: progress"):
+            continue
+        stage = json.loads(message.split("data: ", 1)[1])["stage"]
+        if stage != last_stage:
+            stage_starts[stage] = time.perf_counter()
+            last_stage = stage
+    end_time = time.perf_counter()
+
+    ordered = list(stage_starts.items())
+    wall = {
+        stage: round((ordered[i + 1][1] if i + 1 < len(ordered) else end_time) - started, 4)
+        for i, (stage, started) in enumerate(ordered)
+    }
+    return {"total_seconds": round(end_time - start_time, 4), "stage_wall_seconds": wall}
+
+async def _similarity_search(client: httpx.AsyncClient, queries: list[str], n_queries: int, concurrency: int) -> dict:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(query: str):
+        async with semaphore:
+            start_time = time.perf_counter()
+            response = await client.post("/papers/similarity_search",
+                                         json={"paper_name": BENCH_PAPER, "username": BENCH_USER, "query": query})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start_time)
+
+    # Warm-up outside the measurement
+    await one(queries[0])
+    latencies.clear()
+    start_time = time.perf_counter()
+    await asyncio.gather(*(one(queries[i % len(queries)]) for i in range(n_queries)))
+    elapsed = time.perf_counter() - start_time
+    return {**percentiles(latencies), "concurrency": concurrency, "queries_per_second": round(n_queries / elapsed, 2)}
+
+async def run(args) -> dict:
+    corpus = SampleCorpus(args.papers, args.paragraphs, args.seed)
+    with tempfile.TemporaryDirectory() as data_dir, StubArxivServer(corpus) as arxiv_server:
+        configure_environment(arxiv_server.api_url, data_dir)
+        import main # reads the settings above at import time
+        from utils import db as paper_db
+
+        install_mongo_standin()
+        await paper_db.ensure_indexes()
+        # Load the embedding model before timing anything
+        await asyncio.to_thread(main.get_text_embedding, ["warm up"])
+
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            indexing = await _index(main, client, args.papers)
+            indexing["stages"] = _stage_metrics()
+            search = await _similarity_search(client, corpus.queries, args.queries, args.concurrency)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "embedding_model": os.environ["EMBEDDING_MODEL"],
+            "papers": args.papers,
+            "paragraphs": args.paragraphs,
+            "seed": args.seed,
+        },
+        "indexing": indexing,
+        "similarity_search": search,
+    }
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    List the metrics that got worse than `baseline` by more than `tolerance` (a fraction).
+    """
+    checks = [("indexing.total_seconds", current["indexing"]["total_seconds"], baseline["indexing"]["total_seconds"], False)]
+    for quantile in ("p50_ms", "p99_ms"):
+        checks.append((f"similarity_search.{quantile}", current["similarity_search"].get(quantile),
+                       baseline["similarity_search"].get(quantile), False))
+    for stage, stats in current["indexing"]["stages"].items():
+        checks.append((f"stages.{stage}.items_per_second", stats["items_per_second"],
+                       baseline["indexing"]["stages"].get(stage, {}).get("items_per_second"), True))
+
+    regressions = []
+    for name, value, reference, higher_is_better in checks:
+        if not value or not reference:
+            continue
+        change = (reference - value) / reference if higher_is_better else (value - reference) / reference
+        print(f"{name:45s} {reference:>12.3f} -> {value:>12.3f} ({-change if higher_is_better else change:+.1%})")
+        if change > tolerance:
+            regressions.append(name)
+    return regressions
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description="Offline ingestion and retrieval benchmark")
+    parser.add_argument("--papers", type=int, default=5, help="related papers indexed")
+    parser.add_argument("--paragraphs", type=int, default=40, help="paragraphs per sample PDF")
+    parser.add_argument("--queries", type=int, default=200, help="similarity searches measured")
+    parser.add_argument("--concurrency", type=int, default=1, help="similarity searches in flight")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="bench/results/latest.json")
+    parser.add_argument("--compare", help="baseline results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before failing, as a fraction")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"Regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,219 @@
+"""
+Local stand-ins for the backend's external dependencies, shared by the benchmarks and the load test.
+
+- A deterministic sample corpus, rendered to small text PDFs.
+- A stub arXiv API serving the corpus as an Atom feed, and its PDFs.
+- In-memory Qdrant (QDRANT_URL=":memory:") and mongomock storage.
+- A small fastembed model.
+
+The embedding model and Docling's layout models are loaded from their local caches; fetch
+them once with network access (see bench/README.md) and the runs are fully offline.
+"""
+import os
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from xml.sax.saxutils import escape
+
+BENCH_EMBEDDING_MODEL = os.getenv("BENCH_EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
+
+_SUBJECTS = [
+    "graph neural networks", "uncertainty quantification", "bayesian inference", "contrastive learning",
+    "diffusion models", "reinforcement learning", "causal discovery", "federated learning",
+    "knowledge distillation", "retrieval augmented generation", "time series forecasting",
+    "protein structure prediction", "molecular generation", "anomaly detection", "active learning",
+]
+_VERBS = ["improves", "stabilises", "accelerates", "regularises", "generalises", "calibrates", "explains"]
+_OBJECTS = [
+    "out-of-distribution detection", "sample efficiency", "training dynamics", "predictive calibration",
+    "long-range dependencies", "sparse observations", "noisy labels", "distribution shift",
+]
+_FILLER = [
+    "We evaluate on standard benchmarks and report consistent gains.",
+    "Ablations isolate the contribution of each component.",
+    "The method adds little overhead at inference time.",
+    "Theoretical analysis bounds the error under mild assumptions.",
+    "Results hold across model sizes and random seeds.",
+]
+
+def _sentence(rng: random.Random) -> str:
+    return (f"{rng.choice(_SUBJECTS).capitalize()} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)} "
+            f"when combined with {rng.choice(_SUBJECTS)}. {rng.choice(_FILLER)}")
+
+class SampleCorpus:
+    """
+    A reproducible set of fake papers: the same seed always gives the same titles, abstracts and PDFs.
+    """
+
+    def __init__(self, n_papers: int = 5, paragraphs: int = 20, seed: int = 7):
+        rng = random.Random(seed)
+        self.papers = []
+        for i in range(n_papers):
+            subject, other = rng.sample(_SUBJECTS, 2)
+            title = f"{subject.title()} for {rng.choice(_OBJECTS).title()} with {other.title()}"
+            summary = " ".join(_sentence(rng) for _ in range(3))
+            body = [" ".join(_sentence(rng) for _ in range(4)) for _ in range(paragraphs)]
+            self.papers.append({"id": f"bench{i:04d}", "title": title, "summary": summary, "body": body})
+        self.queries = [f"{subject} {obj}" for subject in _SUBJECTS for obj in _OBJECTS]
+        rng.shuffle(self.queries)
+        self._pdfs: dict[str, bytes] = {}
+
+    def pdf(self, paper_id: str) -> bytes:
+        if paper_id not in self._pdfs:
+            paper = next(paper for paper in self.papers if paper["id"] == paper_id)
+            self._pdfs[paper_id] = make_pdf(paper["title"], [paper["summary"], *paper["body"]])
+        return self._pdfs[paper_id]
+
+def _wrap(text: str, width: int = 90) -> list[str]:
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    return lines + ([line] if line else [])
+
+def make_pdf(title: str, paragraphs: list[str], lines_per_page: int = 50) -> bytes:
+    """
+    Render plain text to a minimal multi-page PDF (Helvetica, no dependencies).
+    """
+    lines = [title, ""]
+    for paragraph in paragraphs:
+        lines.extend(_wrap(paragraph) + [""])
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", b"", b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_refs = []
+    for page in pages:
+        text = "\n".join(
+            "({}) Tj T*".format(line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)"))
+            for line in page
+        )
+        stream = f"BT /F1 10 Tf 14 TL 56 780 Td\n{text}\nET".encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % content_ref
+        )
+        page_refs.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % ref for ref in page_refs), len(page_refs))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+class StubArxivServer:
+    """
+    Serves a SampleCorpus as the arXiv API (`/api/query`) and its PDFs (`/pdf/<id>`) on localhost.
+
+    Every query returns the first `max_results` papers, so runs are reproducible.
+    """
+
+    def __init__(self, corpus: SampleCorpus, host: str = "127.0.0.1", port: int = 0):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/api/query":
+                    max_results = int(parse_qs(url.query).get("max_results", ["10"])[0])
+                    self._send(200, "application/atom+xml", stub.atom_feed(max_results).encode("utf-8"))
+                elif url.path.startswith("/pdf/"):
+                    paper_id = url.path.removeprefix("/pdf/")
+                    if any(paper["id"] == paper_id for paper in stub.corpus.papers):
+                        self._send(200, "application/pdf", stub.corpus.pdf(paper_id))
+                    else:
+                        self._send(404, "text/plain", b"not found")
+                else:
+                    self._send(404, "text/plain", b"not found")
+
+            def _send(self, status: int, content_type: str, body: bytes):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.corpus = corpus
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self.base_url = f"http://{host}:{self._httpd.server_address[1]}"
+        self.api_url = f"{self.base_url}/api/query"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def atom_feed(self, max_results: int) -> str:
+        entries = []
+        for paper in self.corpus.papers[:max_results]:
+            entries.append(f"""
+  <entry>
+    <id>{self.base_url}/abs/{paper['id']}</id>
+    <title>{escape(paper['title'])}</title>
+    <summary>{escape(paper['summary'])}</summary>
+    <published>2025-01-01T00:00:00Z</published>
+    <updated>2025-01-01T00:00:00Z</updated>
+    <author><name>Bench Author</name></author>
+    <link href="{self.base_url}/abs/{paper['id']}" rel="alternate" type="text/html"/>
+    <link title="pdf" href="{self.base_url}/pdf/{paper['id']}" rel="related" type="application/pdf"/>
+    <arxiv:primary_category term="cs.LG"/>
+    <category term="cs.LG"/>
+  </entry>""")
+        return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:arxiv="http://arxiv.org/schemas/atom">'
+                + "".join(entries) + "\n</feed>\n")
+
+    def __enter__(self) -> "StubArxivServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+def configure_environment(arxiv_api_url: str, data_dir: str) -> None:
+    """
+    Point the backend at the stand-ins. Must run before `main` is imported, which reads its settings at import time.
+    """
+    os.environ.update({
+        "QDRANT_URL": ":memory:",
+        "EMBEDDING_PROVIDER": "fastembed",
+        "EMBEDDING_MODEL": BENCH_EMBEDDING_MODEL,
+        "ARXIV_API_URL": arxiv_api_url,
+        "ARXIV_DOWNLOAD_DELAY": "0",
+        "DATABASE_URL": f"sqlite:///{os.path.join(data_dir, 'users.db')}",
+        "OPENROUTE_API_KEY": "unused",
+    })
+
+def install_mongo_standin() -> None:
+    """
+    Replace the MongoDB client with an in-memory mongomock one.
+    """
+    from mongomock_motor import AsyncMongoMockClient
+    from utils import db as paper_db
+
+    paper_db.set_mongo_client(AsyncMongoMockClient())
+
+def percentiles(samples: list[float], qs=(0.5, 0.9, 0.99)) -> dict:
+    """
+    Nearest-rank percentiles of `samples`, in milliseconds, with count and mean.
+    """
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    result = {"count": len(ordered), "mean_ms": 1000 * sum(ordered) / len(ordered)}
+    for q in qs:
+        result[f"p{round(q * 100):d}_ms"] = 1000 * ordered[min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.5) - 1))]
+    result["max_ms"] = 1000 * ordered[-1]
+    return result
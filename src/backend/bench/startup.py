@@ -0,0 +1,133 @@
+"""
+Startup benchmark: time to import `main` and time until a fresh server answers, each in new
+interpreters, plus the slowest top-level imports from `python -X importtime`.
+
+Usage, from src/backend:
+    python -m bench.startup --runs 5 --output bench/results/startup.json
+    python -m bench.startup --budget 2.0   # exit 1 if the median import takes longer
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import urllib.error
+import urllib.request
+
+from bench.standins import configure_environment
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Child process: the app against the Mongo stand-in, so the lifespan does not wait for a server
+SERVE_SCRIPT = """
+import sys, uvicorn
+from bench.standins import install_mongo_standin
+import main
+install_mongo_standin()
+uvicorn.run(main.app, host="127.0.0.1", port=int(sys.argv[1]), log_level="warning")
+"""
+
+def _import_seconds(env: dict) -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+def _slowest_imports(env: dict, top: int) -> list[dict]:
+    """
+    Top-level modules imported by `main`, by cumulative import time (`python -X importtime`).
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        # "import time: <self us> | <cumulative us> | <two spaces per nesting level><module>"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if name[1:].startswith(" "):
+            continue # imported by another module
+        modules.append({"module": name.strip(), "cumulative_ms": int(cumulative_us) / 1000, "self_ms": int(self_us) / 1000})
+    return sorted(modules, key=lambda module: module["cumulative_ms"], reverse=True)[:top]
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _ready_seconds(env: dict, timeout: float = 120) -> float:
+    """
+    Seconds from starting a server process until GET /version succeeds.
+    """
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-c", SERVE_SCRIPT, str(port)], cwd=BACKEND_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with status {server.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/version", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError, TimeoutError):
+                time.sleep(0.02)
+        raise TimeoutError("Server did not become ready")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+def _summary(samples: list[float]) -> dict:
+    return {
+        "runs": len(samples),
+        "median_seconds": round(statistics.median(samples), 3),
+        "min_seconds": round(min(samples), 3),
+        "max_seconds": round(max(samples), 3),
+    }
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description="Backend startup benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports listed")
+    parser.add_argument("--budget", type=float, help="fail if the median import of main takes longer (seconds)")
+    parser.add_argument("--output", default="bench/results/startup.json")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        # Nothing is contacted while starting; the arXiv URL is never queried
+        configure_environment("http://127.0.0.1:9/api/query", data_dir)
+        env = {**os.environ, "PYTHONPATH": BACKEND_DIR}
+        import_samples = [_import_seconds(env) for _ in range(args.runs)]
+        ready_samples = [_ready_seconds(env) for _ in range(args.runs)]
+        slowest = _slowest_imports(env, args.top)
+
+    results = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count()},
+        "import_main": _summary(import_samples),
+        "ready": _summary(ready_samples),
+        "slowest_imports": slowest,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"import main: {results['import_main']['median_seconds']} s median, "
+          f"ready: {results['ready']['median_seconds']} s median ({args.runs} runs)")
+    for module in slowest:
+        print(f"  {module['module']:40s} {module['cumulative_ms']:>9.1f} ms")
+    print(f"Results written to {args.output}")
+
+    if args.budget is not None and results["import_main"]["median_seconds"] > args.budget:
+        print(f"Median import time is over the {args.budget} s budget")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
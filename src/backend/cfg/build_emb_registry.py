@@ -0,0 +1,98 @@
+"""
+Regenerate cfg/emb_registry.json, the embedding model table read at startup by cfg/emb.py.
+
+Run after upgrading fastembed or changing the API model lists, and commit the result:
+    cd src/backend && python -m cfg.build_emb_registry
+"""
+import os
+import re
+import json
+from datetime import date
+from importlib.metadata import version
+
+REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "emb_registry.json")
+# Bump when the registry layout changes
+SCHEMA_VERSION = 2
+
+# Multimodal or task-specific models that cannot be used as plain text embedders
+EXCLUDED_FASTEMBED_MODELS = {"jinaai/jina-clip-v1", "jinaai/jina-embeddings-v3"}
+
+OPENAI_EMB_MODELS = [
+    {"model": "text-embedding-ada-002", "context_length": 8191, "dim": 1536},
+    {"model": "text-embedding-3-small", "context_length": 8191, "dim": 1536},
+    {"model": "text-embedding-3-large", "context_length": 8191, "dim": 3072},
+]
+
+VOYAGEAI_EMB_MODELS = [
+    {"model": "voyage-3-large", "context_length": 32000, "dim": 1024},
+    {"model": "voyage-3", "context_length": 32000, "dim": 1024},
+    {"model": "voyage-3-lite", "context_length": 32000, "dim": 512},
+]
+
+# int8-quantized ONNX exports of fastembed models, registered at load time with add_custom_model.
+# "source" is the Hugging Face repo holding "model_file"; None means fastembed already ships the
+# quantized model under "quantized_model". Models whose default export is already quantized
+# (the "-onnx-Q" sources, e.g. BAAI/bge-small-en-v1.5) are not listed.
+FASTEMBED_INT8_MODELS = [
+    {"model": "BAAI/bge-large-en-v1.5", "quantized_model": "BAAI/bge-large-en-v1.5-int8",
+     "source": "Xenova/bge-large-en-v1.5", "model_file": "onnx/model_quantized.onnx", "pooling": "CLS", "normalization": True},
+    {"model": "mixedbread-ai/mxbai-embed-large-v1", "quantized_model": "mixedbread-ai/mxbai-embed-large-v1-int8",
+     "source": "mixedbread-ai/mxbai-embed-large-v1", "model_file": "onnx/model_quantized.onnx", "pooling": "CLS", "normalization": True},
+    {"model": "snowflake/snowflake-arctic-embed-xs", "quantized_model": "snowflake/snowflake-arctic-embed-xs-int8",
+     "source": "Snowflake/snowflake-arctic-embed-xs", "model_file": "onnx/model_quantized.onnx", "pooling": "CLS", "normalization": True},
+    {"model": "snowflake/snowflake-arctic-embed-s", "quantized_model": "snowflake/snowflake-arctic-embed-s-int8",
+     "source": "Snowflake/snowflake-arctic-embed-s", "model_file": "onnx/model_quantized.onnx", "pooling": "CLS", "normalization": True},
+    {"model": "snowflake/snowflake-arctic-embed-m", "quantized_model": "snowflake/snowflake-arctic-embed-m-int8",
+     "source": "Snowflake/snowflake-arctic-embed-m", "model_file": "onnx/model_quantized.onnx", "pooling": "CLS", "normalization": True},
+    {"model": "snowflake/snowflake-arctic-embed-l", "quantized_model": "snowflake/snowflake-arctic-embed-l-int8",
+     "source": "Snowflake/snowflake-arctic-embed-l", "model_file": "onnx/model_quantized.onnx", "pooling": "CLS", "normalization": True},
+    {"model": "sentence-transformers/all-MiniLM-L6-v2", "quantized_model": "sentence-transformers/all-MiniLM-L6-v2-int8",
+     "source": "Xenova/all-MiniLM-L6-v2", "model_file": "onnx/model_quantized.onnx", "pooling": "MEAN", "normalization": True},
+    {"model": "jinaai/jina-embeddings-v2-small-en", "quantized_model": "jinaai/jina-embeddings-v2-small-en-int8",
+     "source": "Xenova/jina-embeddings-v2-small-en", "model_file": "onnx/model_quantized.onnx", "pooling": "MEAN", "normalization": True},
+    {"model": "jinaai/jina-embeddings-v2-base-en", "quantized_model": "jinaai/jina-embeddings-v2-base-en-int8",
+     "source": "Xenova/jina-embeddings-v2-base-en", "model_file": "onnx/model_quantized.onnx", "pooling": "MEAN", "normalization": True},
+    {"model": "thenlper/gte-base", "quantized_model": "thenlper/gte-base-int8",
+     "source": "Xenova/gte-base", "model_file": "onnx/model_quantized.onnx", "pooling": "MEAN", "normalization": True},
+    {"model": "nomic-ai/nomic-embed-text-v1.5", "quantized_model": "nomic-ai/nomic-embed-text-v1.5-Q",
+     "source": None, "model_file": None, "pooling": None, "normalization": None},
+    {"model": "Qwen/Qwen3-Embedding-0.6B", "quantized_model": "Qwen/Qwen3-Embedding-0.6B-Q",
+     "source": None, "model_file": None, "pooling": None, "normalization": None},
+]
+
+def fastembed_models() -> list[dict]:
+    """
+    fastembed's text models, smallest first, with the context length parsed from their descriptions.
+    """
+    from fastembed import TextEmbedding
+
+    models = []
+    for model in sorted(TextEmbedding.list_supported_models(), key=lambda model: model["size_in_GB"]):
+        if model["model"] in EXCLUDED_FASTEMBED_MODELS:
+            continue
+        match = re.search(r"(\d+)\s*input tokens truncation", model["description"])
+        models.append({
+            "model": model["model"],
+            "context_length": int(match.group(1)) if match else None,
+            "dim": model["dim"],
+            "size_in_GB": model["size_in_GB"],
+        })
+    return models
+
+def main() -> None:
+    registry = {
+        "schema_version": SCHEMA_VERSION,
+        "fastembed_version": version("fastembed"),
+        "generated_on": date.today().isoformat(),
+        "fastembed": fastembed_models(),
+        "fastembed_int8": FASTEMBED_INT8_MODELS,
+        "openai": OPENAI_EMB_MODELS,
+        "voyageai": VOYAGEAI_EMB_MODELS,
+    }
+    with open(REGISTRY_PATH, "w", encoding="utf-8") as f:
+        json.dump(registry, f, indent=2)
+        f.write("\n")
+    print(f"Wrote {len(registry['fastembed'])} fastembed models (fastembed {registry['fastembed_version']}) to {REGISTRY_PATH}")
+
+if __name__ == "__main__":
+    main()
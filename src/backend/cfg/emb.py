@@ -1,58 +1,36 @@
-import pandas as pd
-from fastembed import TextEmbedding
-import re
+"""
+Embedding model table: context length and vector size per provider and model.
 
-temp_supported_models = (
-    pd.DataFrame(TextEmbedding.list_supported_models())
-    .sort_values("size_in_GB")
-    .reset_index(drop=True)
-)
-temp_supported_models = temp_supported_models[["model", "description", "dim"]]
-temp_supported_models["context_length"] = temp_supported_models["description"].apply(
-    lambda x: re.search(r"(\d+)\s*input tokens truncation", x).group(1) if re.search(r"(\d+)\s*input tokens truncation", x) else x
-)
+Read from the precomputed emb_registry.json, so startup does not import fastembed or pandas
+to build it. Regenerate it with `python -m cfg.build_emb_registry` after upgrading fastembed.
+"""
+import os
+import json
+from typing import Optional
 
-FASTEMBED_MODELS = temp_supported_models.to_dict(orient="records")
-# remove jinaai/jina-clip-v1 and jinaai/jina-embeddings-v3
-FASTEMBED_MODELS = [
-    model for model in FASTEMBED_MODELS if model["model"] not in ["jinaai/jina-clip-v1", "jinaai/jina-embeddings-v3"]
-]
-# [{'model': 'BAAI/bge-small-en-v1.5', 'context_length': '512', 'dim': 384},
-#  {'model': 'BAAI/bge-small-zh-v1.5', 'context_length': '512', 'dim': 512},
-#  {'model': 'snowflake/snowflake-arctic-embed-xs', 'context_length': '512', 'dim': 384},...]
+REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "emb_registry.json")
 
-OPENAI_EMB_MODELS = [
-    {
-        "model": "text-embedding-ada-002",
-        "context_length": '8191',
-        "dim": 1536
-    },
-    {
-        "model": "text-embedding-3-small",
-        "context_length": '8191',
-        "dim": 1536
-    },
-    {
-        "model": "text-embedding-3-large",
-        "context_length": '8191',
-        "dim": 3072
-    }
-]
+with open(REGISTRY_PATH, encoding="utf-8") as f:
+    EMB_REGISTRY = json.load(f)
 
-VOYAGEAI_EMB_MODELS = [
-    {
-        "model": "voyage-3-large",
-        "context_length": '32000',
-        "dim": 1024
-    },
-    {
-        "model": "voyage-3",
-        "context_length": '32000',
-        "dim": 1024
-    },
-    {
-        "model": "voyage-3-lite",
-        "context_length": '32000',
-        "dim": 512
-    }
-]
\ No newline at end of file
+# The fastembed release the table was generated with
+REGISTRY_FASTEMBED_VERSION = EMB_REGISTRY["fastembed_version"]
+
+FASTEMBED_MODELS = EMB_REGISTRY["fastembed"]
+# [{'model': 'BAAI/bge-small-en-v1.5', 'context_length': 512, 'dim': 384, 'size_in_GB': 0.067}, ...]
+OPENAI_EMB_MODELS = EMB_REGISTRY["openai"]
+VOYAGEAI_EMB_MODELS = EMB_REGISTRY["voyageai"]
+# int8-quantized ONNX variants of fastembed models, see build_emb_registry.FASTEMBED_INT8_MODELS
+FASTEMBED_INT8_MODELS = EMB_REGISTRY["fastembed_int8"]
+
+def get_model_spec(provider: str, model: str) -> Optional[dict]:
+    """
+    Get the registry entry of `model`, or None if the provider has no table or does not list it.
+    """
+    return next((it for it in EMB_REGISTRY.get(provider, []) if it["model"] == model), None)
+
+def get_int8_variant(model: str) -> Optional[dict]:
+    """
+    Get the int8-quantized variant of a fastembed model, or None if none is listed.
+    """
+    return next((it for it in FASTEMBED_INT8_MODELS if it["model"] == model), None)
@@ -0,0 +1,225 @@
+"""
+HTTP load test of one backend worker against local stand-ins for all of its dependencies
+(see bench/standins.py): the app runs under uvicorn in a separate process, and virtual users
+drive a weighted mix of requests while one index build runs in the background.
+
+Usage, from src/backend:
+    python -m loadtest.run_load --users 20 --duration 60 --output loadtest/results/latest.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+from collections import defaultdict
+
+import httpx
+
+from bench.standins import SampleCorpus, StubArxivServer, configure_environment, install_mongo_standin, percentiles
+
+# Operation -> weight in the traffic mix
+DEFAULT_MIX = {
+    "login": 5,
+    "list": 25,
+    "get_one": 25,
+    "update": 10,
+    "search": 10,
+    "similarity_search": 25,
+}
+PAPERS_PER_USER = 3
+
+def _serve(port: int, arxiv_api_url: str, data_dir: str) -> None:
+    """
+    Run the backend app under uvicorn, wired to the stand-ins (child process entry point).
+    """
+    configure_environment(arxiv_api_url, data_dir)
+    import uvicorn
+    import main # reads the settings above at import time
+
+    install_mongo_standin()
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def _wait_ready(client: httpx.AsyncClient, timeout: float = 120) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/version")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise TimeoutError("Backend did not start")
+
+async def _build_index(client: httpx.AsyncClient, username: str, paper_name: str) -> float:
+    """
+    Run an index build through the SSE endpoint until [DONE], returning its duration.
+    """
+    start_time = time.perf_counter()
+    async with client.stream("GET", "/papers/get_emb_index", json={"paper_name": paper_name, "username": username},
+                             timeout=None) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.startswith("event: error"):
+                raise RuntimeError(f"Index build failed for {paper_name}")
+            if line == "data: [DONE]":
+                break
+    return time.perf_counter() - start_time
+
+async def _seed(client: httpx.AsyncClient, n_users: int, n_related: int) -> list[dict]:
+    """
+    Register users and create their paper ideas, with the stub arXiv results as related papers.
+    """
+    response = await client.post("/arxiv/search", json={"query": ["load test"], "max_results": n_related})
+    response.raise_for_status()
+    related_papers = response.json()["papers"]
+    users = []
+    for i in range(n_users):
+        user = {"username": f"load-user-{i}", "password": "load-test", "papers": []}
+        (await client.post("/register", json={"username": user["username"], "password": user["password"]})).raise_for_status()
+        for j in range(PAPERS_PER_USER):
+            paper_name = f"idea-{j}"
+            (await client.post("/papers/create", json={"paper_name": paper_name, "username": user["username"]})).raise_for_status()
+            (await client.post("/papers/update", json={
+                "paper_name": paper_name,
+                "username": user["username"],
+                "new_data": {"keywords": ["load", "test"], "related_papers": related_papers},
+            })).raise_for_status()
+            user["papers"].append(paper_name)
+        users.append(user)
+    return users
+
+def _request(op: str, user: dict, rng: random.Random, queries: list[str]) -> tuple[str, str, dict]:
+    paper = {"username": user["username"], "paper_name": rng.choice(user["papers"])}
+    if op == "login":
+        return "POST", "/login", {"username": user["username"], "password": user["password"]}
+    if op == "list":
+        return "POST", "/papers/list", {"username": user["username"], "page": 1, "page_size": 12}
+    if op == "get_one":
+        return "POST", "/papers/get_one", paper
+    if op == "update":
+        return "POST", "/papers/patch", {**paper, "set": {"desc": f"updated {rng.random():.6f}"}}
+    if op == "search":
+        return "POST", "/arxiv/search", {"query": [rng.choice(queries)], "max_results": 5}
+    if op == "similarity_search":
+        # Only the seeded index exists, so every similarity search goes to it
+        return "POST", "/papers/similarity_search", {**user["indexed"], "query": rng.choice(queries)}
+    raise ValueError(f"Unknown operation: {op}")
+
+async def _virtual_user(client, user, mix, queries, deadline, think_time, seed, samples, errors):
+    rng = random.Random(seed)
+    ops, weights = zip(*mix.items())
+    while time.monotonic() < deadline:
+        op = rng.choices(ops, weights)[0]
+        method, path, payload = _request(op, user, rng, queries)
+        start_time = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=payload)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        samples[op].append(time.perf_counter() - start_time)
+        if not ok:
+            errors[op] += 1
+        if think_time:
+            await asyncio.sleep(rng.uniform(0, 2 * think_time))
+
+async def run(args) -> dict:
+    corpus = SampleCorpus(args.related, args.paragraphs, args.seed)
+    port = _free_port()
+    mix = json.loads(args.mix) if args.mix else DEFAULT_MIX
+    with tempfile.TemporaryDirectory() as data_dir, StubArxivServer(corpus) as arxiv_server:
+        server = multiprocessing.get_context("spawn").Process(
+            target=_serve, args=(port, arxiv_server.api_url, data_dir), daemon=True)
+        server.start()
+        try:
+            limits = httpx.Limits(max_connections=args.users + 4, max_keepalive_connections=args.users + 4)
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60, limits=limits) as client:
+                await _wait_ready(client)
+                users = await _seed(client, args.users, args.related)
+                # Similarity search needs an index, built before the measurement
+                indexed = {"username": users[0]["username"], "paper_name": users[0]["papers"][0]}
+                seed_index_seconds = await _build_index(client, **indexed)
+                for user in users:
+                    user["indexed"] = indexed
+
+                samples, errors = defaultdict(list), defaultdict(int)
+                start_time = time.perf_counter()
+                deadline = time.monotonic() + args.duration
+                # One index build in the background, competing with the interactive traffic
+                background = asyncio.create_task(_build_index(client, users[-1]["username"], users[-1]["papers"][-1]))
+                await asyncio.gather(*(
+                    _virtual_user(client, user, mix, corpus.queries, deadline, args.think_time, args.seed + i, samples, errors)
+                    for i, user in enumerate(users)
+                ))
+                elapsed = time.perf_counter() - start_time
+                try:
+                    background_seconds = await asyncio.wait_for(background, timeout=args.index_timeout)
+                except (asyncio.TimeoutError, httpx.HTTPError, RuntimeError) as e:
+                    background_seconds = None
+                    print(f"Background index build did not finish: {e!r}")
+        finally:
+            server.terminate()
+            server.join(timeout=10)
+
+    total = sum(len(latencies) for latencies in samples.values())
+    return {
+        "meta": {
+            "users": args.users,
+            "duration_seconds": args.duration,
+            "think_time_seconds": args.think_time,
+            "mix": mix,
+            "related_papers": args.related,
+            "seed": args.seed,
+        },
+        "throughput_rps": round(total / elapsed, 2),
+        "requests": total,
+        "errors": sum(errors.values()),
+        "operations": {
+            op: {**percentiles(latencies), "errors": errors[op], "rps": round(len(latencies) / elapsed, 2)}
+            for op, latencies in sorted(samples.items())
+        },
+        "seed_index_seconds": round(seed_index_seconds, 2),
+        "background_index_seconds": round(background_seconds, 2) if background_seconds is not None else None,
+    }
+
+def _print_report(results: dict) -> None:
+    print(f"{'operation':20s} {'count':>7s} {'errors':>7s} {'rps':>8s} {'p50 ms':>9s} {'p90 ms':>9s} {'p99 ms':>9s}")
+    for op, stats in results["operations"].items():
+        print(f"{op:20s} {stats['count']:>7d} {stats['errors']:>7d} {stats['rps']:>8.1f} "
+              f"{stats['p50_ms']:>9.1f} {stats['p90_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+    print(f"Total: {results['requests']} requests, {results['errors']} errors, {results['throughput_rps']} req/s; "
+          f"background index build: {results['background_index_seconds']} s")
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description="Load test one backend worker against local stand-ins")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60, help="seconds of measured load")
+    parser.add_argument("--think-time", type=float, default=0.1, help="mean pause between a user's requests")
+    parser.add_argument("--mix", help='operation weights as JSON, e.g. \'{"list": 1, "get_one": 1}\'')
+    parser.add_argument("--related", type=int, default=5, help="related papers per idea (PDFs per index build)")
+    parser.add_argument("--paragraphs", type=int, default=20, help="paragraphs per sample PDF")
+    parser.add_argument("--index-timeout", type=float, default=600, help="seconds to wait for the background index build")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="loadtest/results/latest.json")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    _print_report(results)
+    print(f"Results written to {args.output}")
+    return 1 if results["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
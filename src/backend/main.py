@@ -3,16 +3,16 @@ import json
 import time
 import uvicorn
 import logging
-import pymongo
+import asyncio
+import secrets
 import tempfile
-import numpy as np
-import pandas as pd
 from datetime import timezone
-from pprint import pprint
-from langchain_text_splitters import CharacterTextSplitter
-from docling.document_converter import DocumentConverter
-from fastapi import FastAPI, HTTPException, Depends
-from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Depends, Header, Request
+from fastapi.responses import StreamingResponse, Response, FileResponse, JSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST
+from opentelemetry.trace import SpanKind
 from sqlalchemy import create_engine, Column, String, Integer
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.ext.declarative import declarative_base
@@ -25,42 +25,172 @@ logging.basicConfig(level=logging.INFO)
 # self-defined imports
 from utils.arxiv import ArXivComponent
 from utils.download import download_arxiv_pdf
-from utils.sse import make_sse_message
-from utils.embed import get_text_embedding
+from utils.sse import make_sse_message, make_sse_event, heartbeats_until, ProgressTracker
+from utils.embed import get_text_embedding, plan_embedding_rounds
+from utils.convert import new_document_converter, convert_pdf
+from utils.model_worker import get_model_worker_client
 from utils.pdf import is_valid_pdf
-from utils.vectorstores import create_qd_collection, insert_qd_collection, search_qd_collection, get_collection_info
+from utils.patch import build_patch_update, version_filter
+from utils import db as paper_db
+from utils.vectorstores import create_qd_collection, insert_qd_collection, search_qd_collection, scroll_qd_collection, get_collection_info, get_collection_stats
+from utils.cache import TTLCache
+from utils.jobs import JobRegistry
+from utils.tracing import setup_tracing, span, extract_context
+from utils.profiling import ProfileRecorder, ProfileStore, activate, current_recorder
+from utils.metrics import REQUEST_LATENCY, StateCollector, register_state_collector, generate_metrics, run_stage, stage_timer
+from utils.llm_gateway import LLMGateway, QueueFullError
+from utils.novelty import normalize_text, cosine_similarities, classify_overlap, merge_overlaps
+from utils.keywords import extract_candidates, rank_candidates
 
 # self-defined config
-from cfg.emb import FASTEMBED_MODELS, OPENAI_EMB_MODELS, VOYAGEAI_EMB_MODELS
+from cfg.emb import FASTEMBED_MODELS, OPENAI_EMB_MODELS, VOYAGEAI_EMB_MODELS, REGISTRY_FASTEMBED_VERSION, get_model_spec
 
 # 常數設定，從環境變數中讀取設定
 HOST = os.getenv("HOST", "127.0.0.1")
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./users.db")
-MONGO_SERVER = os.getenv("MONGO_SERVER", "mongodb://localhost:27017")
-MONGO_INITDB_ROOT_USERNAME = os.getenv("MONGO_INITDB_ROOT_USERNAME", "root")
-MONGO_INITDB_ROOT_PASSWORD = os.getenv("MONGO_INITDB_ROOT_PASSWORD", "example")
 OLLAMA_SERVER = os.getenv("OLLAMA_SERVER", "http://localhost:11434")
-ACCLERATOR = os.getenv("ACCLERATOR", "cpu")
+LIST_MAX_PAGE_SIZE = int(os.getenv("LIST_MAX_PAGE_SIZE", "100"))
+ACCELERATOR = (os.getenv("ACCELERATOR") or os.getenv("ACCLERATOR") or "cpu").lower() # ACCLERATOR: misspelt name read before
 EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "fastembed")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-large-en-v1.5")
 EMBEDDING_PROVIDER_API_KEY = os.getenv("EMBEDDING_PROVIDER_API_KEY", "your_embedding_provider_api_key")
 EMBEDDING_PROVIDER_URL = os.getenv("EMBEDDING_PROVIDER_URL", "https://api.openai.com/v1/embeddings")
 QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+ARXIV_DOWNLOAD_DELAY = float(os.getenv("ARXIV_DOWNLOAD_DELAY", "0.78")) # seconds between PDF downloads
+VEC_STATS_CACHE_TTL = float(os.getenv("VEC_STATS_CACHE_TTL", "10"))
+SSE_PROGRESS_INTERVAL = float(os.getenv("SSE_PROGRESS_INTERVAL", "0.5")) # seconds between progress events of a stage
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+INDEX_STEPS = 7 # load, download, convert, chunk, embed, embed_summaries, index
+SSE_REPLAY_BUFFER = int(os.getenv("SSE_REPLAY_BUFFER", "500")) # events kept per indexing job for replay
+INDEX_JOB_RETENTION = float(os.getenv("INDEX_JOB_RETENTION", "300")) # seconds a finished job can still be replayed
+OPENROUTE_BASE_URL = os.getenv("OPENROUTE_BASE_URL", "https://openrouter.ai/api/v1")
+OPENROUTE_API_KEY = os.getenv("OPENROUTE_API_KEY", "your_openroute_api_key")
+LLM_GATEWAY_MAX_CONCURRENCY = int(os.getenv("LLM_GATEWAY_MAX_CONCURRENCY", "8"))
+LLM_GATEWAY_MAX_QUEUE = int(os.getenv("LLM_GATEWAY_MAX_QUEUE", "32"))
+# e.g. '{"perplexity/sonar-reasoning-pro": {"max_concurrency": 2, "max_queue": 10}}'
+LLM_GATEWAY_MODEL_LIMITS = json.loads(os.getenv("LLM_GATEWAY_MODEL_LIMITS", "{}"))
+LLM_GATEWAY_TIMEOUT = float(os.getenv("LLM_GATEWAY_TIMEOUT", "120"))
+NOVELTY_HIGH_SIMILARITY = float(os.getenv("NOVELTY_HIGH_SIMILARITY", "0.9"))
+NOVELTY_LOW_SIMILARITY = float(os.getenv("NOVELTY_LOW_SIMILARITY", "0.75"))
+NOVELTY_TOP_K = int(os.getenv("NOVELTY_TOP_K", "5"))
+TEXT_EMBEDDING_CACHE_TTL = float(os.getenv("TEXT_EMBEDDING_CACHE_TTL", "3600"))
+KEYWORD_MAX_CANDIDATES = int(os.getenv("KEYWORD_MAX_CANDIDATES", "200"))
+KEYWORD_MAX_CHUNKS = int(os.getenv("KEYWORD_MAX_CHUNKS", "64"))
+KEYWORD_DIVERSITY = float(os.getenv("KEYWORD_DIVERSITY", "0.3"))
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "") # required by the profiling header and /admin endpoints
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001")) # seconds between samples
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+
+if EMBEDDING_PROVIDER in ("fastembed", "openai", "voyageai") and get_model_spec(EMBEDDING_PROVIDER, EMBEDDING_MODEL) is None:
+    logging.warning(f"{EMBEDDING_MODEL} is not in the embedding model registry (fastembed {REGISTRY_FASTEMBED_VERSION}), "
+                    "using default chunk and vector sizes; regenerate it with `python -m cfg.build_emb_registry`")
+
+# Short-lived cache of collection statistics, keyed by collection name
+collection_stats_cache = TTLCache(ttl=VEC_STATS_CACHE_TTL)
+# Embeddings of short texts (abstracts not indexed yet, keyword candidates), keyed by model and text
+text_embedding_cache = TTLCache(ttl=TEXT_EMBEDDING_CACHE_TTL, maxsize=8192)
+
+# Saved profiles, and whether every indexing run is profiled (toggled with POST /admin/profiling)
+profile_store = ProfileStore(PROFILE_DIR, PROFILE_MAX_FILES)
+profiling_settings = {"index_runs": False}
+
+# Indexing runs, keyed by (username, paper_name), survive client disconnects
+index_jobs = JobRegistry(buffer_size=SSE_REPLAY_BUFFER, retention=INDEX_JOB_RETENTION)
+
+# Shared gateway for LLM calls from all frontend sessions
+llm_gateway = LLMGateway(
+    base_url=OPENROUTE_BASE_URL,
+    api_key=OPENROUTE_API_KEY,
+    max_concurrency=LLM_GATEWAY_MAX_CONCURRENCY,
+    max_queue=LLM_GATEWAY_MAX_QUEUE,
+    model_limits=LLM_GATEWAY_MODEL_LIMITS,
+    timeout=LLM_GATEWAY_TIMEOUT,
+)
 
 # 設定SQLAlchemy
 Base = declarative_base()
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# MongoDB Database Setup
-mongo_client = pymongo.MongoClient(
-    MONGO_SERVER,
-    username=MONGO_INITDB_ROOT_USERNAME,
-    password=MONGO_INITDB_ROOT_PASSWORD
-)
+# MongoDB Database Setup (see utils/db.py for pool settings)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    paper_db.get_mongo_client()
+    try:
+        await paper_db.ensure_indexes()
+    except Exception as e:
+        logging.warning(f"Could not create MongoDB indexes: {e}")
+    yield
+    await paper_db.close_mongo_client()
+    await llm_gateway.close()
 # ---
 
-app = FastAPI()
+setup_tracing("backend")
+app = FastAPI(lifespan=lifespan)
+
+register_state_collector(StateCollector(
+    caches={"collection_stats": collection_stats_cache, "text_embedding": text_embedding_cache},
+    gateway=llm_gateway,
+    jobs=index_jobs,
+    db_stats=paper_db.get_operation_stats,
+))
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start_time = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, to keep the label set bounded
+        route = request.scope.get("route")
+        REQUEST_LATENCY.labels(
+            request.method, route.path if route is not None else "unmatched", str(status)
+        ).observe(time.perf_counter() - start_time)
+
+def is_admin(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and token is not None and secrets.compare_digest(token, ADMIN_TOKEN)
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    """
+    Profile a request sent with `X-Profile: 1` and the admin token in `X-Admin-Token`, if PROFILING_ENABLED.
+    The event loop thread is sampled while the request runs (so concurrent requests show up too),
+    and so are the pipeline stages it runs in worker threads. The profile ID is returned in the
+    `X-Profile-Id` header; an indexing run started this way saves its profile when it finishes.
+    """
+    if not PROFILING_ENABLED or "x-profile" not in request.headers:
+        return await call_next(request)
+    if not is_admin(request.headers.get("x-admin-token")):
+        return JSONResponse(status_code=403, content={"detail": "Profiling requires the admin token"})
+
+    recorder = ProfileRecorder(f"{request.method} {request.url.path}", PROFILE_INTERVAL)
+    with activate(recorder), recorder.record():
+        response = await call_next(request)
+    if not recorder.detached and await asyncio.to_thread(profile_store.save, recorder, status_code=response.status_code):
+        response.headers["X-Profile-Id"] = recorder.id
+    return response
+
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    """
+    Run each request in a server span, continuing the caller's trace if it sent a `traceparent` header.
+    Streaming responses end the span when the headers are sent; an indexing job keeps its spans in the same trace.
+    """
+    with span(f"{request.method} {request.url.path}", SpanKind.SERVER, {"http.request.method": request.method},
+              context=extract_context(request.headers)) as current:
+        response = await call_next(request)
+        # Name by route template, not raw path, like the latency metric
+        route = request.scope.get("route")
+        if route is not None:
+            current.update_name(f"{request.method} {route.path}")
+            current.set_attribute("http.route", route.path)
+        current.set_attribute("http.response.status_code", response.status_code)
+        return response
 
 # ---
 
@@ -141,14 +271,12 @@ async def create_paper(paper: dict):
     ```
     """
 
-    mongo_db = mongo_client["papers_db"]
-    papers_collection = mongo_db["papers"]
-    
     if not paper.get("paper_name") or not paper.get("username"):
         raise HTTPException(status_code=400, detail="Paper name and username are required")
 
-    result = papers_collection.insert_one(paper)
-    pprint(result)
+    paper["version"] = 0
+    inserted_id = await paper_db.insert_paper(paper)
+    logging.info(f"Created paper {inserted_id}")
     return {"status": "success", "message": "Paper created successfully"}
 
 @app.post("/papers/update")
@@ -166,23 +294,61 @@ async def update_paper(paper: dict):
     }
     ```
     """
-    mongo_db = mongo_client["papers_db"]
-    papers_collection = mongo_db["papers"]
-    
     paper_name = paper.get("paper_name")
     username = paper.get("username")
     if not paper_name or not username:
         raise HTTPException(status_code=400, detail="Paper name and username are required")
-    new_data = paper.get("new_data", {})
+    new_data = {k: v for k, v in paper.get("new_data", {}).items() if k not in ("_id", "version")}
     
     # Update the paper in MongoDB
-    result = papers_collection.update_one({"paper_name": paper_name, "username": username}, {"$set": new_data})
+    matched_count = await paper_db.update_paper(paper_name, username, {"$set": new_data, "$inc": {"version": 1}})
     
-    if result.matched_count == 0:
+    if matched_count == 0:
         raise HTTPException(status_code=404, detail="Paper not found")
     
     return {"status": "success", "message": "Paper updated successfully"}
 
+@app.post("/papers/patch")
+async def patch_paper(paper: dict):
+    """
+    Apply a field-level patch to a paper in MongoDB.
+    ## Structure:
+    ```json
+    {
+        "paper_name": "paper_name",
+        "username": "username",
+        "set": {"generator.abstract": "value"}, # dotted paths
+        "unset": ["generator.old_field"],
+        "append": {"keywords": ["keyword"]}, # keywords, related_papers
+        "remove": {"related_papers": [{"id": "arxiv_id"}]},
+        "expected_version": 3 # optional, 409 if the paper has changed
+    }
+    ```
+    """
+    paper_name = paper.get("paper_name")
+    username = paper.get("username")
+    if not paper_name or not username:
+        raise HTTPException(status_code=400, detail="Paper name and username are required")
+    expected_version = paper.get("expected_version")
+    if expected_version is not None and (not isinstance(expected_version, int) or expected_version < 0):
+        raise HTTPException(status_code=400, detail="expected_version must be a non-negative integer")
+
+    try:
+        update = build_patch_update(paper)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    query = {"paper_name": paper_name, "username": username, **version_filter(expected_version)}
+    result = await paper_db.find_and_update_paper(query, update, projection={"_id": 0, "version": 1})
+
+    if result is None:
+        current = await paper_db.find_paper(paper_name, username, {"_id": 0, "version": 1})
+        if current is None:
+            raise HTTPException(status_code=404, detail="Paper not found")
+        raise HTTPException(status_code=409, detail={"message": "Version conflict", "version": current.get("version", 0)})
+
+    return {"status": "success", "message": "Paper patched successfully", "version": result["version"]}
+
 @app.post("/papers/delete")
 async def delete_paper(paper: dict):
     """
@@ -195,9 +361,6 @@ async def delete_paper(paper: dict):
     }
     ```
     """
-    mongo_db = mongo_client["papers_db"]
-    papers_collection = mongo_db["papers"]
-    
     paper_name = paper.get("paper_name")
     username = paper.get("username")
     
@@ -205,9 +368,9 @@ async def delete_paper(paper: dict):
         raise HTTPException(status_code=400, detail="Paper name and username are required")
     
     # Delete the paper in MongoDB
-    result = papers_collection.delete_one({"paper_name": paper_name, "username": username})
+    deleted_count = await paper_db.delete_paper(paper_name, username)
     
-    if result.deleted_count == 0:
+    if deleted_count == 0:
         raise HTTPException(status_code=404, detail="Paper not found")
     
     return {"status": "success", "message": "Paper deleted successfully"}
@@ -216,13 +379,37 @@ async def delete_paper(paper: dict):
 async def list_papers(data:dict):
     """
     List all papers in MongoDB.
+    ## Structure:
+    ```json
+    {
+        "username": "username",
+        "query": "name filter", # optional, case-insensitive substring
+        "page": 1, # optional, 1-based
+        "page_size": 12 # optional, paginates and returns card fields only
+    }
+    ```
     """
-    mongo_db = mongo_client["papers_db"]
-    papers_collection = mongo_db["papers"]
-    
-    papers = list(papers_collection.find({"username": data.get("username")}, {"_id": 0}))
-    
-    return {"status": "success", "papers": papers}
+    username = data.get("username")
+    name_query = data.get("query") or None
+    page_size = data.get("page_size")
+
+    if page_size is None:
+        papers = await paper_db.list_papers(username, name_query=name_query)
+        return {"status": "success", "papers": papers}
+
+    page = data.get("page", 1)
+    if not isinstance(page, int) or not isinstance(page_size, int) or page < 1 or page_size < 1:
+        raise HTTPException(status_code=400, detail="page and page_size must be positive integers")
+    page_size = min(page_size, LIST_MAX_PAGE_SIZE)
+
+    papers, total = await paper_db.list_papers_page(
+        username,
+        page,
+        page_size,
+        name_query=name_query,
+        projection={"_id": 0, "paper_name": 1, "username": 1, "icon": 1, "desc": 1},
+    )
+    return {"status": "success", "papers": papers, "total": total, "page": page, "page_size": page_size}
 
 @app.post("/papers/get_one")
 async def get_one_paper(paper: dict):
@@ -236,9 +423,6 @@ async def get_one_paper(paper: dict):
     }
     ```
     """
-    mongo_db = mongo_client["papers_db"]
-    papers_collection = mongo_db["papers"]
-    
     paper_name = paper.get("paper_name")
     username = paper.get("username")
     print(f"paper_name: {paper_name}, username: {username}")
@@ -247,7 +431,7 @@ async def get_one_paper(paper: dict):
         raise HTTPException(status_code=400, detail="Paper name and username are required")
     
     # Get the paper in MongoDB
-    paper_data = papers_collection.find_one({"paper_name": paper_name, "username": username}, { "_id": 0})
+    paper_data = await paper_db.find_paper(paper_name, username)
     
     if not paper_data:
         raise HTTPException(status_code=404, detail="Paper not found")
@@ -278,6 +462,15 @@ async def search_arxiv(query_data: dict):
     
     return {"status": "success", "papers": papers}
 
+def new_text_splitter(chunk_size: int):
+    """
+    Create the token-based text splitter, importing langchain and loading the tiktoken encoding on first use.
+    """
+    from langchain_text_splitters import CharacterTextSplitter
+    return CharacterTextSplitter.from_tiktoken_encoder(
+        encoding_name="o200k_base", chunk_size=chunk_size, chunk_overlap=200
+    )
+
 async def create_embedding_event_generator(data:dict):
     """
     Create an embedding for the database.
@@ -287,76 +480,72 @@ async def create_embedding_event_generator(data:dict):
         "username": "username"
     }
     ```
+    Progress is sent as `progress` events (stage, done, total, rate, ETA), at most one per
+    SSE_PROGRESS_INTERVAL seconds per stage, with heartbeats while blocking work runs.
     """
     logging.info("Creating embedding...")
     # Load the paper data
-    yield make_sse_message("Loading paper data...")
+    progress = ProgressTracker("load", 1, 1, INDEX_STEPS, SSE_PROGRESS_INTERVAL)
+    yield progress.event(0, "Loading paper data...")
     paper_name = data.get("paper_name")
     username = data.get("username")
     if not paper_name or not username:
         raise HTTPException(status_code=400, detail="Paper name and username are required")
-    yield make_sse_message("Loading paper data done.")
-    
 
     logging.info(f"paper_name: {paper_name}, username: {username}")
     # Get the paper data from MongoDB
-    yield make_sse_message("Loading paper data from MongoDB...")
-    mongo_db = mongo_client["papers_db"]
-    papers_collection = mongo_db["papers"]
-    paper_data = papers_collection.find_one({"paper_name": paper_name, "username": username}, { "_id": 0})
+    paper_data = await paper_db.find_paper(paper_name, username)
     if not paper_data:
         raise HTTPException(status_code=404, detail="Paper not found")
-    yield make_sse_message("Loading paper data from MongoDB done.")
 
     logging.info(f"Get related papers from MongoDB")
     # Get related papers
-    yield make_sse_message("Loading related papers...")
     related_papers = paper_data.get("related_papers", [])
     if not related_papers:
         raise HTTPException(status_code=400, detail="No related papers found")
-    yield make_sse_message("Loading related papers done.")
+    # Extract summary from related_papers
+    summaries = [paper.get("summary", "") for paper in related_papers] # list[str]
+    yield progress.event(1, "Loading paper data done.")
     
     # Download the related papers
-    yield make_sse_message("Downloading related papers...")
     pdf_urls = [paper["pdf_url"] for paper in related_papers]
     temp_dir = tempfile.mkdtemp()
     logging.info(f"Temporary directory: {temp_dir}")
+    progress = ProgressTracker("download", len(pdf_urls), 2, INDEX_STEPS, SSE_PROGRESS_INTERVAL)
+    yield progress.event(0, "Downloading related papers...")
     for idx, pdf_url in enumerate(pdf_urls):
-        yield make_sse_message(f"Downloading related paper {idx+1}/{len(pdf_urls)}...")
-        download_arxiv_pdf(pdf_url, save_root_dir=temp_dir)
-        time.sleep(0.78) # avoid too many requests
-    yield make_sse_message("Downloading related papers done.")
-
-    # Extract summary from related_papers
-    yield make_sse_message("Extracting summary from related papers...")
-    summaries = [] # list[str]
-    for idx, paper in enumerate(related_papers):
-        yield make_sse_message(f"Extracting summary from related paper {idx+1}/{len(related_papers)}...")
-        summary = paper.get("summary", "")
-        summaries.append(summary)
-        time.sleep(1) # avoid too many requests
-    yield make_sse_message("Extracting summary from related papers done.")
+        task = asyncio.ensure_future(asyncio.to_thread(run_stage, "download", download_arxiv_pdf, pdf_url, save_root_dir=temp_dir))
+        async for heartbeat in heartbeats_until(task, SSE_HEARTBEAT_INTERVAL):
+            yield heartbeat
+        task.result()
+        if event := progress.update(idx + 1):
+            yield event
+        await asyncio.sleep(ARXIV_DOWNLOAD_DELAY) # avoid too many requests
 
     # Using Docling to convert pdf to markdown
-    yield make_sse_message("Converting pdf to markdown...")
-    converter = DocumentConverter()
+    # With a shared model worker the PDFs are converted there, by its already loaded converter
+    converter = None if get_model_worker_client() is not None else await asyncio.to_thread(new_document_converter)
     markdowns = []
     # save markdown to temp dir
     md_tmp_dir = tempfile.mkdtemp()
     logging.info(f"Temporary markdown directory: {md_tmp_dir}")
-    pdfs = [os.path.join(temp_dir, pdf) for pdf in os.listdir(temp_dir) if pdf.endswith(".pdf") and is_valid_pdf(os.path.join(temp_dir, pdf))] 
-    for pdf in pdfs:
-        yield make_sse_message(f"Converting {pdf} to markdown...")
-        result = converter.convert(pdf)
-        markdowns.append(result.document.export_to_markdown())
+    with stage_timer("validate", items=len(os.listdir(temp_dir))):
+        pdfs = [os.path.join(temp_dir, pdf) for pdf in os.listdir(temp_dir) if pdf.endswith(".pdf") and is_valid_pdf(os.path.join(temp_dir, pdf))] 
+    progress = ProgressTracker("convert", len(pdfs), 3, INDEX_STEPS, SSE_PROGRESS_INTERVAL)
+    yield progress.event(0, "Converting pdf to markdown...")
+    for idx, pdf in enumerate(pdfs):
+        task = asyncio.ensure_future(asyncio.to_thread(run_stage, "convert", convert_pdf, pdf, converter))
+        async for heartbeat in heartbeats_until(task, SSE_HEARTBEAT_INTERVAL):
+            yield heartbeat
+        markdowns.append(task.result())
         # write to file
         with open(os.path.join(md_tmp_dir, os.path.basename(pdf) + ".md"), "w", encoding="utf-8") as f:
             f.write(markdowns[-1])
         logging.info(f"Saved markdown for {pdf} to {md_tmp_dir}")
-    yield make_sse_message("Converting pdf to markdown done.")
+        if event := progress.update(idx + 1):
+            yield event
 
     # Chunk
-    yield make_sse_message("Chunking markdown...")
     if EMBEDDING_PROVIDER == "fastembed":
         chunk_size = next((int(it['context_length']) for it in FASTEMBED_MODELS if it['model'] == EMBEDDING_MODEL), 512)
         chunk_size = 2048 if chunk_size >= 2048 else chunk_size
@@ -367,87 +556,87 @@ async def create_embedding_event_generator(data:dict):
     elif EMBEDDING_PROVIDER == "voyageai":
         chunk_size = next((int(it['context_length']) for it in VOYAGEAI_EMB_MODELS if it['model'] == EMBEDDING_MODEL), 16000)
         vector_size = next((int(it['dim']) for it in VOYAGEAI_EMB_MODELS if it['model'] == EMBEDDING_MODEL), 1536)
-    text_splitter = CharacterTextSplitter.from_tiktoken_encoder(
-        encoding_name="o200k_base", chunk_size=chunk_size, chunk_overlap=200
-    )
+    text_splitter = await asyncio.to_thread(new_text_splitter, chunk_size)
     # for loop: chunking
     chuncked_markdowns = [] # List[List[str]]
+    progress = ProgressTracker("chunk", len(markdowns), 4, INDEX_STEPS, SSE_PROGRESS_INTERVAL)
+    yield progress.event(0, "Chunking markdown...")
     for idx, markdown in enumerate(markdowns):
         logging.info(f"Chunking {idx+1}/{len(markdowns)}...")
-        yield make_sse_message(f"Chunking {idx+1}/{len(markdowns)}...")
-        chunks = text_splitter.split_text(markdown)
+        chunks = await asyncio.to_thread(run_stage, "chunk", text_splitter.split_text, markdown)
         chuncked_markdowns.extend(chunks)
-        time.sleep(0.78)
+        if event := progress.update(idx + 1):
+            yield event
     
     logging.info(f"Chunking done. Total chunks: {len(chuncked_markdowns)}")
-    yield make_sse_message(f"Chunking done. Total chunks: {len(chuncked_markdowns)}")
     
-    # Create embedding(full paper)
-    yield make_sse_message("Creating embedding...")
-    full_paper_embeddings = []
-    for idx, chunk in enumerate(chuncked_markdowns):
-        
-        logging.info(f"Creating embedding {idx+1}/{len(chuncked_markdowns)}...")
-        yield make_sse_message(f"Creating embedding {idx+1}/{len(chuncked_markdowns)}...")
-        
-        start_time = time.time()
-        embedding = get_text_embedding(chunk)
-        full_paper_embeddings.append(embedding)
-        end_time = time.time()
-        elapsed_time = end_time - start_time
-        
-        logging.info(f"Embedding {idx+1}/{len(chuncked_markdowns)} done. Elapsed time: {elapsed_time:.2f} seconds")
-        yield make_sse_message(f"Creating embedding {idx+1}/{len(chuncked_markdowns)} done. Elapsed time: {elapsed_time:.2f} seconds")
-    
-    yield make_sse_message("Creating embedding done.")
+    # Create embedding(full paper), in batches of chunks of similar token length
+    full_paper_embeddings = [None] * len(chuncked_markdowns)
+    progress = ProgressTracker("embed", len(chuncked_markdowns), 5, INDEX_STEPS, SSE_PROGRESS_INTERVAL)
+    yield progress.event(0, "Creating embedding...")
+    start_time = time.time()
+    rounds = await asyncio.to_thread(plan_embedding_rounds, chuncked_markdowns)
+    done = 0
+    for indices in rounds:
+        task = asyncio.ensure_future(asyncio.to_thread(get_text_embedding, [chuncked_markdowns[i] for i in indices]))
+        async for heartbeat in heartbeats_until(task, SSE_HEARTBEAT_INTERVAL):
+            yield heartbeat
+        for i, embedding in zip(indices, task.result()):
+            full_paper_embeddings[i] = embedding
+        done += len(indices)
+        if event := progress.update(done):
+            yield event
+    logging.info(f"Embedding {len(chuncked_markdowns)} chunks done in {len(rounds)} rounds. Elapsed time: {time.time() - start_time:.2f} seconds")
 
     # Create embedding(summary)
-    yield make_sse_message("Creating embedding for summary...")
-    summary_embeddings = []
-    for idx, summary in enumerate(summaries):
-        yield make_sse_message(f"Creating embedding for summary {idx+1}/{len(summaries)}...")
-        embedding = get_text_embedding(summary)
-        summary_embeddings.append(embedding)
-    yield make_sse_message("Creating embedding for summary done.")
+    progress = ProgressTracker("embed_summaries", len(summaries), 6, INDEX_STEPS, SSE_PROGRESS_INTERVAL)
+    yield progress.event(0, "Creating embedding for summary...")
+    task = asyncio.ensure_future(asyncio.to_thread(get_text_embedding, summaries))
+    async for heartbeat in heartbeats_until(task, SSE_HEARTBEAT_INTERVAL):
+        yield heartbeat
+    summary_embeddings = task.result()
+    if event := progress.update(len(summaries)):
+        yield event
 
     # Create Qdrant collection
-    yield make_sse_message("Creating Qdrant collection...")
+    import numpy as np
+    progress = ProgressTracker("index", 2, 7, INDEX_STEPS, SSE_PROGRESS_INTERVAL)
+    yield progress.event(0, "Creating Qdrant collection...")
     full_paper_coll_name = f"full_paper_collection_{int(datetime.now(timezone.utc).timestamp())}"
     summary_coll_name = f"summary_collection_{int(datetime.now(timezone.utc).timestamp())}"
     # update to mongo
-    papers_collection.update_one({"paper_name": paper_name, "username": username}, {"$set": {"emb_index": [full_paper_coll_name, summary_coll_name]}})
+    await paper_db.update_paper(paper_name, username, {"$set": {"emb_index": [full_paper_coll_name, summary_coll_name]}, "$inc": {"version": 1}})
     # create qd_client and collection(full_paper)
-    qd_client = create_qd_collection(QDRANT_URL, full_paper_coll_name, vector_size)
+    qd_client = await asyncio.to_thread(create_qd_collection, QDRANT_URL, full_paper_coll_name, vector_size)
     logging.info(f"Full paper embedding length: {len(full_paper_embeddings)}")
     logging.info(f"Full paper chunked_markdowns length: {len(chuncked_markdowns)}")
-    logging.info(f"Full paper embedding shape: {np.array(full_paper_embeddings).shape}") # (N, 1, 768) -> (N, 768)
-    # convert to numpy array
-    full_paper_embeddings = np.array(full_paper_embeddings).reshape(-1, vector_size)
-    logging.info(f"Full paper embedding shape: {full_paper_embeddings.shape}") # (N, 768)
-    # convert to list
-    full_paper_embeddings = full_paper_embeddings.tolist()
+    logging.info(f"Full paper embedding shape: {np.array(full_paper_embeddings).shape}") # (N, 768)
     full_paper_saving_data = {
         "vectors": full_paper_embeddings,
         "payload": [{"text": chunk} for chunk in chuncked_markdowns]
     }
     # insert collection(full_paper) to qd_client
-    insert_qd_collection(qd_client, full_paper_coll_name, full_paper_saving_data)
+    task = asyncio.ensure_future(asyncio.to_thread(insert_qd_collection, qd_client, full_paper_coll_name, full_paper_saving_data))
+    async for heartbeat in heartbeats_until(task, SSE_HEARTBEAT_INTERVAL):
+        yield heartbeat
+    task.result()
+    yield progress.event(1)
     # create qd_client and collection(summary)
-    qd_client = create_qd_collection(QDRANT_URL, summary_coll_name, vector_size)
+    qd_client = await asyncio.to_thread(create_qd_collection, QDRANT_URL, summary_coll_name, vector_size)
     logging.info(f"Summary embedding length: {len(summary_embeddings)}")
-    logging.info(f"Summary embedding shape: {np.array(summary_embeddings).shape}") # (N, 1, 768) -> (N, 768)
-    # convert to numpy array
-    summary_embeddings = np.array(summary_embeddings).reshape(-1, vector_size)
-    logging.info(f"Summary embedding shape: {summary_embeddings.shape}") # (N, 768)
-    # convert to list
-    summary_embeddings = summary_embeddings.tolist()
+    logging.info(f"Summary embedding shape: {np.array(summary_embeddings).shape}") # (N, 768)
     summary_saving_data = {
         "vectors": summary_embeddings,
-        "payload": [{"text": summary} for summary in summaries]
+        "payload": [
+            {"text": summary, "id": paper.get("id"), "title": paper.get("title"), "url": paper.get("arxiv_url")}
+            for summary, paper in zip(summaries, related_papers)
+        ]
     }
     # insert collection(summary) to qd_client
-    insert_qd_collection(qd_client, summary_coll_name, summary_saving_data)
-    yield make_sse_message("Creating Qdrant collection done.")
+    await asyncio.to_thread(insert_qd_collection, qd_client, summary_coll_name, summary_saving_data)
+    collection_stats_cache.invalidate(full_paper_coll_name)
+    collection_stats_cache.invalidate(summary_coll_name)
+    yield progress.event(2, "Creating Qdrant collection done.")
 
     # Clean up
     for pdf in pdfs:
@@ -455,14 +644,18 @@ async def create_embedding_event_generator(data:dict):
     os.rmdir(temp_dir)
     yield make_sse_message("Clean up done.")
 
-    yield make_sse_message("[DONE]")
+    yield make_sse_event("[DONE]")
 
     return
 
 @app.get("/papers/get_emb_index")
-async def get_emb_index(data: dict):
+async def get_emb_index(data: dict, last_event_id: Optional[str] = Header(None)):
     """
     Get embedding index for a paper.
+    The index build runs as a background job, one per paper: a request while it runs attaches
+    to it instead of starting another one, and a client that lost the stream reconnects with
+    the `Last-Event-ID` header to replay the events it missed. Event IDs are `<job id>:<n>`; an ID
+    of another run of the paper's index replays the current run from its first event.
     ## Structure:
     ```json
     {
@@ -471,17 +664,126 @@ async def get_emb_index(data: dict):
     }
     ```
     """
+    paper_name = data.get("paper_name")
+    username = data.get("username")
+    if not paper_name or not username:
+        raise HTTPException(status_code=400, detail="Paper name and username are required")
+
+    key = (username, paper_name)
+    job = index_jobs.get(key)
+    if job is None and last_event_id:
+        raise HTTPException(status_code=404, detail="Indexing job not found, it may have expired")
+    headers = {}
+    if job is None or (job.done and not last_event_id):
+        # Profiled if the request asked for it (see profile_request) or all indexing runs are
+        recorder = current_recorder()
+        if recorder is None and PROFILING_ENABLED and profiling_settings["index_runs"]:
+            recorder = ProfileRecorder(f"index {username}/{paper_name}", PROFILE_INTERVAL)
+        if recorder is None:
+            job = index_jobs.start(key, lambda: create_embedding_event_generator(data))
+        else:
+            recorder.detached = True
+            job = index_jobs.start(key, lambda: profile_index_run(recorder, create_embedding_event_generator(data)))
+            headers["X-Profile-Id"] = recorder.id
+        logging.info(f"Started indexing job {job.id} for {key}")
+        resume_from = 0
+    else:
+        resume_from = job.resume_point(last_event_id)
+        logging.info(f"Attaching to indexing job {job.id} for {key} after event {resume_from}")
+
     return StreamingResponse(
-        create_embedding_event_generator(data),
+        job.subscribe(resume_from, SSE_HEARTBEAT_INTERVAL),
         media_type="text/event-stream",
+        headers={"X-Job-Id": job.id, **headers},
     )
 
+async def profile_index_run(recorder: ProfileRecorder, events):
+    """
+    Run an indexing event generator with `recorder` current, so its pipeline stages are sampled
+    in whichever worker thread runs them, and save the profile when the run ends.
+    """
+    try:
+        with activate(recorder):
+            async for message in events:
+                yield message
+    finally:
+        metadata = await asyncio.to_thread(profile_store.save, recorder)
+        if metadata:
+            logging.info(f"Saved profile {recorder.id} of {recorder.name} ({metadata['sampled_seconds']} s sampled)")
+
+@app.get("/papers/index_jobs")
+async def get_index_jobs():
+    """
+    List running and recently finished indexing jobs.
+    """
+    return {"status": "success", "running": index_jobs.running(), "jobs": index_jobs.status()}
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """
+    List saved profiles, newest first.
+    """
+    profiles = await asyncio.to_thread(profile_store.list)
+    return {"status": "success", "profiles": profiles, "index_runs": profiling_settings["index_runs"]}
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str, format: str = "speedscope"):
+    """
+    Download a saved profile: `format=speedscope` (open in https://www.speedscope.app) or `format=html`.
+    """
+    path = profile_store.path(profile_id, format)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "html":
+        return FileResponse(path, media_type="text/html")
+    return FileResponse(path, media_type="application/json", filename=os.path.basename(path))
+
+@app.post("/admin/profiling", dependencies=[Depends(require_admin)])
+async def set_profiling(data: dict):
+    """
+    Turn profiling of every indexing run on or off.
+    ## Structure:
+    ```json
+    {
+        "index_runs": true
+    }
+    ```
+    """
+    if not isinstance(data.get("index_runs"), bool):
+        raise HTTPException(status_code=400, detail="index_runs must be a boolean")
+    profiling_settings["index_runs"] = data["index_runs"]
+    return {"status": "success", "index_runs": profiling_settings["index_runs"]}
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus metrics: request latency per route, pipeline stage histograms, cache hit counters,
+    LLM gateway queues, indexing jobs and MongoDB operation latency.
+
+    With several workers (serve.py), counters and histograms are summed over all workers, and
+    the cache, gateway, job and MongoDB figures are those of the worker answering the scrape.
+    """
+    return Response(generate_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/db/stats")
+async def db_stats():
+    """
+    Get MongoDB connection pool settings and per-operation latency statistics.
+    """
+    return {"status": "success", "pool": paper_db.get_pool_config(), "operations": paper_db.get_operation_stats()}
+
 @app.get("/vec_store/col_count/{collection_name}")
 async def get_collection_count(collection_name: str):
     """
     Get the count of a collection.
     """
-    col_info = get_collection_info(QDRANT_URL, collection_name)
+    col_info = await asyncio.to_thread(get_collection_info, QDRANT_URL, collection_name)
     return {"indexed_vectors_count": col_info.indexed_vectors_count,
             "optimizer_status": col_info.optimizer_status,
             "points_count": col_info.points_count,
@@ -489,6 +791,43 @@ async def get_collection_count(collection_name: str):
             "status": col_info.status,
             "vectors_count": col_info.vectors_count}
 
+async def _cached_collection_stats(collection_name: str) -> dict:
+    stats = collection_stats_cache.get(collection_name)
+    if stats is None:
+        stats = await asyncio.to_thread(get_collection_stats, QDRANT_URL, collection_name)
+        collection_stats_cache.set(collection_name, stats)
+    return stats
+
+@app.post("/vec_store/stats")
+async def get_collections_stats(data: dict):
+    """
+    Get statistics of several collections in one round trip.
+    ## Structure (one of):
+    ```json
+    {"paper_name": "paper_name", "username": "username"} # collections of one paper
+    {"username": "username"} # collections of all papers of a user
+    {"collection_names": ["collection_name"]}
+    ```
+    """
+    collection_names = data.get("collection_names")
+    paper_name = data.get("paper_name")
+    username = data.get("username")
+
+    if collection_names is None:
+        if not username:
+            raise HTTPException(status_code=400, detail="username or collection_names is required")
+        if paper_name:
+            paper_data = await paper_db.find_paper(paper_name, username, {"_id": 0, "emb_index": 1})
+            if not paper_data:
+                raise HTTPException(status_code=404, detail="Paper not found")
+            collection_names = paper_data.get("emb_index", [])
+        else:
+            papers = await paper_db.list_papers(username, {"_id": 0, "emb_index": 1})
+            collection_names = [name for paper in papers for name in paper.get("emb_index", [])]
+
+    stats = await asyncio.gather(*(_cached_collection_stats(name) for name in collection_names))
+    return {"status": "success", "collections": list(stats)}
+
 @app.post("/papers/similarity_search")
 async def similarity_search(data: dict):
     """
@@ -510,9 +849,7 @@ async def similarity_search(data: dict):
         raise HTTPException(status_code=400, detail="Paper name, username and query are required")
     
     # Get the paper data from MongoDB
-    mongo_db = mongo_client["papers_db"]
-    papers_collection = mongo_db["papers"]
-    paper_data = papers_collection.find_one({"paper_name": paper_name, "username": username}, { "_id": 0})
+    paper_data = await paper_db.find_paper(paper_name, username)
     
     if not paper_data:
         raise HTTPException(status_code=404, detail="Paper not found")
@@ -523,13 +860,226 @@ async def similarity_search(data: dict):
     if not emb_index:
         raise HTTPException(status_code=400, detail="No embedding index found")
     
-    # Perform similarity search
-    results = []
-    for index in emb_index:
-        result = search_qd_collection(QDRANT_URL, index, get_text_embedding([query])[0])
-        results.append(result)
+    # Perform similarity search: the query is embedded once, the collections are searched concurrently
+    query_vector = (await asyncio.to_thread(get_text_embedding, [query]))[0]
+    results = await asyncio.gather(*(
+        asyncio.to_thread(search_qd_collection, QDRANT_URL, index, query_vector) for index in emb_index
+    ))
+    results = list(results)
     
     return {"status": "success", "results": results} # len(results) = 2 
 
+def _novelty_overlap(paper: dict, summary: str, score: float, source: str) -> dict:
+    return {
+        "id": paper.get("id"),
+        "title": paper.get("title"),
+        "url": paper.get("arxiv_url") or paper.get("url"),
+        "summary": summary[:500],
+        "score": float(score),
+        "source": source,
+    }
+
+async def _embed_cached(texts: list[str]) -> list[list[float]]:
+    vectors = {text: text_embedding_cache.get((EMBEDDING_MODEL, text)) for text in texts}
+    missing = [text for text, vector in vectors.items() if vector is None]
+    if missing:
+        # One batched call for everything not cached
+        for text, vector in zip(missing, await asyncio.to_thread(get_text_embedding, missing)):
+            text_embedding_cache.set((EMBEDDING_MODEL, text), vector)
+            vectors[text] = vector
+    return [vectors[text] for text in texts]
+
+@app.post("/papers/novelty_prescreen")
+async def novelty_prescreen(data: dict):
+    """
+    Local novelty pre-screen: nearest-neighbour similarity between a draft and the idea's related papers.
+    The draft is compared with the summary collection of the idea's embedding index, and with the
+    abstracts of related papers that are not indexed yet.
+    ## Structure:
+    ```json
+    {
+        "paper_name": "paper_name",
+        "username": "username",
+        "title": "draft title",
+        "abstract": "draft abstract",
+        "limit": 5 # optional, number of overlapping papers returned
+    }
+    ```
+    ## Verdict:
+    `likely_not_novel` if the best similarity is at least NOVELTY_HIGH_SIMILARITY, `likely_novel` if it is
+    below NOVELTY_LOW_SIMILARITY, `inconclusive` otherwise (worth a remote LLM check).
+    """
+    paper_name = data.get("paper_name")
+    username = data.get("username")
+    draft = "\n\n".join(part.strip() for part in (data.get("title"), data.get("abstract")) if part and part.strip())
+    limit = data.get("limit", NOVELTY_TOP_K)
+    if not paper_name or not username:
+        raise HTTPException(status_code=400, detail="Paper name and username are required")
+    if not draft:
+        raise HTTPException(status_code=400, detail="A draft title or abstract is required")
+    if not isinstance(limit, int) or limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be a positive integer")
+
+    start_time = time.perf_counter()
+    paper_data = await paper_db.find_paper(paper_name, username, {"_id": 0, "emb_index": 1, "related_papers": 1})
+    if not paper_data:
+        raise HTTPException(status_code=404, detail="Paper not found")
+    related_papers = [paper for paper in paper_data.get("related_papers", []) if (paper.get("summary") or "").strip()]
+    papers_by_summary = {normalize_text(paper["summary"]): paper for paper in related_papers}
+    summary_coll_name = next((name for name in paper_data.get("emb_index", []) if name.startswith("summary_collection_")), None)
+
+    draft_vector = (await asyncio.to_thread(get_text_embedding, [draft]))[0]
+
+    overlaps, indexed = [], set()
+    if summary_coll_name:
+        try:
+            # The collection holds one point per related paper at indexing time, so this returns all of them
+            hits = await asyncio.to_thread(search_qd_collection, QDRANT_URL, summary_coll_name, draft_vector,
+                                           max(limit, len(related_papers)))
+        except Exception as e:
+            logging.warning(f"Novelty pre-screen cannot search {summary_coll_name}: {e}")
+            hits = []
+        for hit in hits or []:
+            payload = hit.get("payload") or {}
+            summary = payload.get("text", "")
+            indexed.add(normalize_text(summary))
+            paper = papers_by_summary.get(normalize_text(summary)) or payload
+            overlaps.append(_novelty_overlap(paper, summary, hit["score"], "summary_collection"))
+
+    unindexed = [paper for key, paper in papers_by_summary.items() if key not in indexed]
+    if unindexed:
+        vectors = await _embed_cached([paper["summary"] for paper in unindexed])
+        for paper, score in zip(unindexed, cosine_similarities(draft_vector, vectors)):
+            overlaps.append(_novelty_overlap(paper, paper["summary"], score, "related_papers"))
+
+    overlaps = merge_overlaps(overlaps, limit)
+    max_similarity = overlaps[0]["score"] if overlaps else 0.0
+    return {
+        "status": "success",
+        "verdict": classify_overlap(max_similarity, NOVELTY_HIGH_SIMILARITY, NOVELTY_LOW_SIMILARITY),
+        "max_similarity": max_similarity,
+        "thresholds": {"high": NOVELTY_HIGH_SIMILARITY, "low": NOVELTY_LOW_SIMILARITY},
+        "compared": len(indexed | set(papers_by_summary)),
+        "overlaps": overlaps,
+        "elapsed_ms": round((time.perf_counter() - start_time) * 1000, 1),
+    }
+
+@app.post("/papers/suggest_keywords")
+async def suggest_keywords(data: dict):
+    """
+    Suggest keywords mined from the idea's related papers (titles, abstracts and indexed chunks),
+    ranked by embedding similarity to the current keywords. No LLM is involved, and the same
+    corpus and keywords always give the same suggestions.
+    ## Structure:
+    ```json
+    {
+        "paper_name": "paper_name",
+        "username": "username",
+        "keywords": ["keyword"], # optional, defaults to the stored keywords
+        "top_n": 5 # optional
+    }
+    ```
+    """
+    paper_name = data.get("paper_name")
+    username = data.get("username")
+    top_n = data.get("top_n", 5)
+    if not paper_name or not username:
+        raise HTTPException(status_code=400, detail="Paper name and username are required")
+    if not isinstance(top_n, int) or top_n < 1:
+        raise HTTPException(status_code=400, detail="top_n must be a positive integer")
+
+    start_time = time.perf_counter()
+    paper_data = await paper_db.find_paper(paper_name, username, {"_id": 0, "keywords": 1, "related_papers": 1, "emb_index": 1})
+    if not paper_data:
+        raise HTTPException(status_code=404, detail="Paper not found")
+    keywords = data.get("keywords")
+    if keywords is None:
+        keywords = paper_data.get("keywords", [])
+    keywords = [keyword.strip() for keyword in keywords if keyword and keyword.strip()]
+    related_papers = paper_data.get("related_papers", [])
+
+    corpus = [text for paper in related_papers for text in (paper.get("title"), paper.get("summary")) if text]
+    full_paper_coll_name = next((name for name in paper_data.get("emb_index", []) if name.startswith("full_paper_collection_")), None)
+    if full_paper_coll_name and KEYWORD_MAX_CHUNKS > 0:
+        try:
+            points = await asyncio.to_thread(scroll_qd_collection, QDRANT_URL, full_paper_coll_name, KEYWORD_MAX_CHUNKS)
+            corpus.extend((point["payload"] or {}).get("text", "") for point in points)
+        except Exception as e:
+            logging.warning(f"Keyword suggestion cannot read {full_paper_coll_name}: {e}")
+    if not corpus:
+        raise HTTPException(status_code=400, detail="No related papers found")
+
+    # Without keywords, suggest what is closest to the related paper titles
+    query_texts = keywords or [paper["title"] for paper in related_papers if paper.get("title")]
+    candidates = extract_candidates(corpus, max_candidates=KEYWORD_MAX_CANDIDATES)
+    if not query_texts or not candidates:
+        return {"status": "success", "keywords": [], "candidates": len(candidates), "elapsed_ms": 0.0}
+
+    vectors = await _embed_cached(query_texts + candidates)
+    suggestions = rank_candidates(
+        vectors[:len(query_texts)],
+        candidates,
+        vectors[len(query_texts):],
+        top_n=top_n,
+        diversity=KEYWORD_DIVERSITY,
+        exclude=keywords,
+    )
+    return {
+        "status": "success",
+        "keywords": suggestions,
+        "candidates": len(candidates),
+        "elapsed_ms": round((time.perf_counter() - start_time) * 1000, 1),
+    }
+
+@app.post("/llm/chat")
+async def llm_chat(data: dict):
+    """
+    Chat completion through the shared LLM gateway.
+    Identical requests in flight are coalesced, and each model has a concurrency limit and a bounded queue.
+    ## Structure:
+    ```json
+    {
+        "model": "openai/o3-mini",
+        "messages": [{"role": "user", "content": "..."}],
+        "params": {"response_format": {"type": "json_object"}}, # optional
+        "stream": false # true for SSE token events, ending with [DONE]
+    }
+    ```
+    """
+    model = data.get("model")
+    messages = data.get("messages")
+    if not model or not messages:
+        raise HTTPException(status_code=400, detail="model and messages are required")
+
+    try:
+        entry = llm_gateway.submit(model, messages, data.get("params") or {})
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+
+    if not data.get("stream"):
+        try:
+            content = await entry.result()
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"Upstream LLM error: {e}")
+        return {"status": "success", "content": content}
+
+    async def token_events():
+        try:
+            async for token in entry.stream():
+                yield make_sse_event({"delta": token})
+        except Exception as e:
+            yield make_sse_event({"error": f"Upstream LLM error: {e}"}, event="error")
+            return
+        yield make_sse_event("[DONE]")
+
+    return StreamingResponse(token_events(), media_type="text/event-stream")
+
+@app.get("/llm/queue")
+async def llm_queue():
+    """
+    Get the LLM gateway queue depth per model and its counters.
+    """
+    return {"status": "success", "models": llm_gateway.queue_depth(), "stats": llm_gateway.stats}
+
 if __name__ == "__main__":
     uvicorn.run(app, host=HOST, port=8081)
\ No newline at end of file
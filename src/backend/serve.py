@@ -0,0 +1,88 @@
+"""
+Production entry point of the backend: `python serve.py`.
+
+With BACKEND_WORKERS=1 (the default) this is the same as `python main.py`. With more, uvicorn
+runs that many API worker processes, and the embedding model and Docling converter are loaded
+and warmed up once, in a shared model worker process the API workers call over a Unix socket
+(utils/model_worker.py), instead of once per API worker. Memory then stays at one copy of the
+models however many workers run, and no worker pays the model load on its first request.
+
+Indexing jobs (and their SSE resume), caches and the LLM gateway limits remain per API worker:
+resuming an indexing stream needs the same worker, so run one worker or route clients stickily.
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import secrets
+import tempfile
+import multiprocessing
+
+HOST = os.getenv("HOST", "127.0.0.1")
+PORT = 8081
+BACKEND_WORKERS = int(os.getenv("BACKEND_WORKERS", "1"))
+MODEL_WORKER_START_TIMEOUT = float(os.getenv("MODEL_WORKER_START_TIMEOUT", "600")) # seconds, includes model downloads
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "fastembed")
+
+def run_model_worker(address: str, authkey: bytes, ready) -> None:
+    """
+    Load and warm up the models, then serve embedding and PDF conversion requests of the API workers.
+    """
+    logging.basicConfig(level=logging.INFO)
+    from utils.embed import embed_locally
+    from utils.convert import convert_locally, warm_up_converter
+    from utils.model_worker import serve
+
+    if EMBEDDING_PROVIDER == "fastembed":
+        # Starts the embedding processes, each loading the model, then runs the model once
+        embed_locally(["warm up"])
+    warm_up_converter()
+    logging.info("Model worker models are warm")
+    serve(address, authkey, {"embed": embed_locally, "convert": convert_locally}, ready.set)
+
+def main() -> int:
+    import uvicorn
+
+    if BACKEND_WORKERS <= 1:
+        import main as backend
+        uvicorn.run(backend.app, host=HOST, port=PORT)
+        return 0
+
+    run_dir = tempfile.mkdtemp(prefix="backend-")
+    address = os.path.join(run_dir, "model_worker.sock")
+    authkey = secrets.token_hex(16)
+    metrics_dir = os.path.join(run_dir, "metrics")
+    os.makedirs(metrics_dir)
+    # Inherited by the model worker and the API workers, read when they import utils
+    os.environ.update({
+        "MODEL_WORKER_SOCKET": address,
+        "MODEL_WORKER_AUTHKEY": authkey,
+        "PROMETHEUS_MULTIPROC_DIR": metrics_dir,
+    })
+
+    # Not a daemon: fastembed may start its own worker processes
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    model_worker = context.Process(target=run_model_worker, args=(address, authkey.encode(), ready), name="model-worker")
+    model_worker.start()
+    try:
+        logging.info("Waiting for the model worker to load the models...")
+        deadline = time.monotonic() + MODEL_WORKER_START_TIMEOUT
+        while not ready.wait(1):
+            if not model_worker.is_alive():
+                logging.error(f"Model worker exited with status {model_worker.exitcode}")
+                return 1
+            if time.monotonic() > deadline:
+                logging.error("Model worker did not start in time")
+                return 1
+        uvicorn.run("main:app", host=HOST, port=PORT, workers=BACKEND_WORKERS)
+    finally:
+        model_worker.terminate()
+        model_worker.join(timeout=10)
+        shutil.rmtree(run_dir, ignore_errors=True)
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
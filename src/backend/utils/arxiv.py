@@ -1,9 +1,16 @@
+import os
 import urllib.request
 from urllib.parse import urlparse
 from typing import List, Dict, Optional, Any
 from xml.etree.ElementTree import Element
 
 from defusedxml.ElementTree import fromstring
+from opentelemetry.trace import SpanKind
+
+from .tracing import span
+
+# arXiv API endpoint; only this host is queried (a local stand-in can be used for benchmarks)
+ARXIV_API_URL = os.getenv("ARXIV_API_URL", "http://export.arxiv.org/api/query")
 
 
 class ArXivComponent:
@@ -32,7 +39,7 @@ class ArXivComponent:
 
     def build_query_url(self) -> str:
         """Build the arXiv API query URL."""
-        base_url = "http://export.arxiv.org/api/query?"
+        base_url = ARXIV_API_URL + "?"
 
         # Build the search query
         search_query = f"{self.search_type}:{self.search_query}"
@@ -96,6 +103,12 @@ class ArXivComponent:
 
     def search_papers(self) -> List[Dict[str, Any]]:
         """Search arXiv and return results."""
+        with span("arxiv.search", SpanKind.CLIENT, {"arxiv.query": self.search_query, "arxiv.max_results": self.max_results}) as current:
+            papers = self._search_papers()
+            current.set_attribute("arxiv.results", len(papers))
+            return papers
+
+    def _search_papers(self) -> List[Dict[str, Any]]:
         try:
             # Build the query URL
             url = self.build_query_url()
@@ -105,7 +118,7 @@ class ArXivComponent:
             if parsed_url.scheme not in {"http", "https"}:
                 error_msg = f"Invalid URL scheme: {parsed_url.scheme}"
                 raise ValueError(error_msg)
-            if parsed_url.hostname != "export.arxiv.org":
+            if parsed_url.hostname != urlparse(ARXIV_API_URL).hostname:
                 error_msg = f"Invalid host: {parsed_url.hostname}"
                 raise ValueError(error_msg)
 
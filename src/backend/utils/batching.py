@@ -0,0 +1,65 @@
+from functools import lru_cache
+from typing import Any, Optional, Sequence
+
+@lru_cache(maxsize=None)
+def _get_encoding(encoding_name: str):
+    import tiktoken
+
+    return tiktoken.get_encoding(encoding_name)
+
+def count_tokens(texts: Sequence[str], encoding_name: str = "o200k_base") -> list[int]:
+    """
+    Count the tokens of each text with a tiktoken encoding (the one the text splitter uses), an
+    estimate of the length under other tokenizers.
+    """
+    return [len(tokens) for tokens in _get_encoding(encoding_name).encode_ordinary_batch(list(texts))]
+
+def token_budget_batches(lengths: Sequence[int], max_tokens: int, max_items: Optional[int] = None, padded: bool = True) -> list[list[int]]:
+    """
+    Group items into batches of similar length under a token budget, shortest first.
+
+    Items are sorted by length so that each batch holds texts of similar length. With `padded`,
+    a batch costs its size times its longest item, as a local model pads every text to the longest
+    of its batch; otherwise it costs the sum of its lengths, as counted by a remote API's
+    per-request token limit. An item over the budget on its own is a batch of one.
+
+    Args:
+        lengths (Sequence[int]): Token length of each item.
+        max_tokens (int): Token budget of a batch.
+        max_items (int): Maximum number of items per batch, if any.
+        padded (bool): Whether the cost of a batch is its padded size. Default is True.
+
+    Returns:
+        list[list[int]]: Indices of the items in each batch.
+    """
+    batches = []
+    batch, batch_tokens = [], 0
+    for index in sorted(range(len(lengths)), key=lengths.__getitem__):
+        length = max(int(lengths[index]), 1)
+        # Sorted ascending, so the item added is the longest of the batch
+        tokens = (len(batch) + 1) * length if padded else batch_tokens + length
+        if batch and (tokens > max_tokens or (max_items is not None and len(batch) >= max_items)):
+            batches.append(batch)
+            batch, tokens = [], length
+        batch.append(index)
+        batch_tokens = tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+def restore_order(batches: list[list[int]], results: Sequence[Sequence[Any]]) -> list[Any]:
+    """
+    Put the results of batches from `token_budget_batches` back in the order of the original items.
+
+    Args:
+        batches (list[list[int]]): Indices of the items in each batch.
+        results (Sequence[Sequence]): Results of each batch, one per item, in batch order.
+
+    Returns:
+        list: One result per item, in the original order.
+    """
+    ordered = [None] * sum(len(batch) for batch in batches)
+    for batch, batch_results in zip(batches, results):
+        for index, result in zip(batch, batch_results):
+            ordered[index] = result
+    return ordered
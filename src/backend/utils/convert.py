@@ -0,0 +1,62 @@
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
+
+from .model_worker import get_model_worker_client
+
+if TYPE_CHECKING:
+    from docling.document_converter import DocumentConverter
+
+# The shared converter of the model worker is used by one conversion at a time
+_converter_lock = threading.Lock()
+
+def new_document_converter() -> "DocumentConverter":
+    """
+    Create a Docling converter. Docling takes seconds to import, so it is imported on first use, off the event loop.
+    """
+    from docling.document_converter import DocumentConverter
+    return DocumentConverter()
+
+@lru_cache(maxsize=1)
+def get_document_converter() -> "DocumentConverter":
+    """
+    Get the converter of this process, kept loaded by the model worker.
+    """
+    return new_document_converter()
+
+def warm_up_converter() -> None:
+    """
+    Load the PDF pipeline of this process's shared converter (layout and OCR models), which
+    Docling otherwise loads on the first conversion.
+    """
+    from docling.datamodel.base_models import InputFormat
+
+    converter = get_document_converter()
+    with _converter_lock:
+        converter.initialize_pipeline(InputFormat.PDF)
+
+def convert_locally(pdf: str) -> str:
+    """
+    Convert a PDF to markdown with this process's shared converter.
+    """
+    converter = get_document_converter()
+    with _converter_lock:
+        return converter.convert(pdf).document.export_to_markdown()
+
+def convert_pdf(pdf: str, converter: Optional["DocumentConverter"] = None) -> str:
+    """
+    Convert a PDF to markdown, in the shared model worker if one is running (the PDF must be
+    on the same host), otherwise with `converter`.
+
+    Args:
+        pdf (str): Path of the PDF.
+        converter (DocumentConverter): Converter to use when there is no model worker.
+
+    Returns:
+        str: The document as markdown.
+    """
+    client = get_model_worker_client()
+    if client is not None:
+        return client.call("convert", pdf)
+    converter = converter or get_document_converter()
+    return converter.convert(pdf).document.export_to_markdown()
@@ -0,0 +1,261 @@
+import os
+import re
+import time
+import asyncio
+import inspect
+import logging
+from collections import deque
+from functools import wraps
+from typing import Any, Optional
+
+from pymongo import AsyncMongoClient, ReturnDocument
+from pymongo.asynchronous.collection import AsyncCollection
+from opentelemetry.trace import SpanKind
+
+from .tracing import span
+
+# Constants settings, read from environment variables
+MONGO_SERVER = os.getenv("MONGO_SERVER", "mongodb://localhost:27017")
+MONGO_INITDB_ROOT_USERNAME = os.getenv("MONGO_INITDB_ROOT_USERNAME", "root")
+MONGO_INITDB_ROOT_PASSWORD = os.getenv("MONGO_INITDB_ROOT_PASSWORD", "example")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "papers_db")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "20000"))
+
+logger = logging.getLogger(__name__)
+
+_mongo_client: Optional[AsyncMongoClient] = None
+
+def get_mongo_client() -> AsyncMongoClient:
+    """
+    Get the process-wide async MongoDB client, creating it on first use.
+
+    The client owns a connection pool, so it must be shared rather than created per request.
+    """
+    global _mongo_client
+    if _mongo_client is None:
+        _mongo_client = AsyncMongoClient(
+            MONGO_SERVER,
+            username=MONGO_INITDB_ROOT_USERNAME,
+            password=MONGO_INITDB_ROOT_PASSWORD,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+        )
+    return _mongo_client
+
+def set_mongo_client(client: Any) -> None:
+    """
+    Replace the shared client, e.g. with an in-memory stand-in.
+    """
+    global _mongo_client
+    _mongo_client = client
+
+async def close_mongo_client() -> None:
+    """
+    Close the shared client and its connection pool.
+    """
+    global _mongo_client
+    if _mongo_client is not None:
+        # Stand-ins (e.g. mongomock) may close synchronously
+        result = _mongo_client.close()
+        if inspect.isawaitable(result):
+            await result
+        _mongo_client = None
+
+def papers_collection() -> AsyncCollection:
+    """
+    Get the collection holding paper ideas.
+    """
+    return get_mongo_client()[MONGO_DB_NAME]["papers"]
+
+class OperationStats:
+    """
+    Latency statistics of one kind of database operation.
+    """
+
+    def __init__(self, window: int = 1024):
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds: float, failed: bool = False) -> None:
+        self.count += 1
+        self.errors += int(failed)
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.recent.append(seconds)
+
+    def percentile(self, q: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": 1000 * self.total_seconds / self.count if self.count else 0.0,
+            "p50_ms": 1000 * self.percentile(0.50),
+            "p95_ms": 1000 * self.percentile(0.95),
+            "max_ms": 1000 * self.max_seconds,
+        }
+
+OPERATION_STATS: dict[str, OperationStats] = {}
+
+def timed(op_name: str):
+    """
+    Decorator recording the latency of an async database operation under `op_name`, in a `mongo.<op_name>` span.
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            stats = OPERATION_STATS.setdefault(op_name, OperationStats())
+            start = time.perf_counter()
+            failed = False
+            try:
+                with span(f"mongo.{op_name}", SpanKind.CLIENT, {"db.system": "mongodb", "db.operation.name": op_name}):
+                    return await func(*args, **kwargs)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                stats.observe(time.perf_counter() - start, failed)
+        return wrapper
+    return decorator
+
+def get_operation_stats() -> dict:
+    """
+    Get per-operation latency statistics.
+    """
+    return {op: stats.as_dict() for op, stats in OPERATION_STATS.items()}
+
+def get_pool_config() -> dict:
+    """
+    Get the effective connection pool settings.
+    """
+    return {
+        "max_pool_size": MONGO_MAX_POOL_SIZE,
+        "min_pool_size": MONGO_MIN_POOL_SIZE,
+        "max_idle_time_ms": MONGO_MAX_IDLE_TIME_MS,
+        "wait_queue_timeout_ms": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "server_selection_timeout_ms": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connect_timeout_ms": MONGO_CONNECT_TIMEOUT_MS,
+        "socket_timeout_ms": MONGO_SOCKET_TIMEOUT_MS,
+    }
+
+@timed("insert_paper")
+async def insert_paper(paper: dict) -> Any:
+    result = await papers_collection().insert_one(paper)
+    return result.inserted_id
+
+@timed("find_paper")
+async def find_paper(paper_name: str, username: str, projection: Optional[dict] = None) -> Optional[dict]:
+    return await papers_collection().find_one(
+        {"paper_name": paper_name, "username": username},
+        projection if projection is not None else {"_id": 0},
+    )
+
+async def ensure_indexes() -> None:
+    """
+    Create the indexes used by the paper queries.
+    """
+    await papers_collection().create_index([("username", 1), ("paper_name", 1)])
+
+def _list_query(username: str, name_query: Optional[str]) -> dict:
+    query = {"username": username}
+    if name_query:
+        query["paper_name"] = {"$regex": re.escape(name_query), "$options": "i"}
+    return query
+
+@timed("list_papers")
+async def list_papers(
+    username: str,
+    projection: Optional[dict] = None,
+    name_query: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 0,
+) -> list[dict]:
+    """
+    List the papers of a user in creation order.
+
+    Args:
+        username (str): Owner of the papers.
+        projection (dict): Fields to return, defaults to everything but `_id`.
+        name_query (str): Case-insensitive substring the paper name must contain.
+        skip (int): Number of papers to skip.
+        limit (int): Maximum number of papers to return, 0 for no limit.
+    """
+    cursor = (
+        papers_collection()
+        .find(_list_query(username, name_query), projection if projection is not None else {"_id": 0})
+        .sort("_id", 1)
+        .skip(skip)
+        .limit(limit)
+    )
+    return await cursor.to_list(length=None)
+
+@timed("count_papers")
+async def count_papers(username: str, name_query: Optional[str] = None) -> int:
+    return await papers_collection().count_documents(_list_query(username, name_query))
+
+async def list_papers_page(
+    username: str,
+    page: int,
+    page_size: int,
+    name_query: Optional[str] = None,
+    projection: Optional[dict] = None,
+) -> tuple[list[dict], int]:
+    """
+    Get one page of a user's papers together with the total number of matching papers.
+    """
+    return await asyncio.gather(
+        list_papers(username, projection, name_query, skip=(page - 1) * page_size, limit=page_size),
+        count_papers(username, name_query),
+    )
+
+@timed("update_paper")
+async def update_paper(paper_name: str, username: str, update: dict) -> int:
+    """
+    Apply an update document to a paper.
+
+    Returns:
+        int: The number of matched papers (0 or 1).
+    """
+    result = await papers_collection().update_one({"paper_name": paper_name, "username": username}, update)
+    return result.matched_count
+
+@timed("find_and_update_paper")
+async def find_and_update_paper(query: dict, update: dict, projection: Optional[dict] = None) -> Optional[dict]:
+    """
+    Apply an update document to the paper matching `query` and return it after the update.
+    """
+    return await papers_collection().find_one_and_update(
+        query,
+        update,
+        projection=projection if projection is not None else {"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+
+@timed("delete_paper")
+async def delete_paper(paper_name: str, username: str) -> int:
+    """
+    Delete a paper.
+
+    Returns:
+        int: The number of deleted papers (0 or 1).
+    """
+    result = await papers_collection().delete_one({"paper_name": paper_name, "username": username})
+    return result.deleted_count
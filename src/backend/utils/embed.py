@@ -1,10 +1,17 @@
 import os
-import voyageai
-import fastembed
-import requests
-import ollama
-from openai import OpenAI
-from fastembed import TextEmbedding
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+from typing import TYPE_CHECKING, Optional
+
+from cfg.emb import get_int8_variant, get_model_spec
+from .batching import count_tokens, token_budget_batches, restore_order
+from .metrics import stage_timer
+from .tracing import set_span_attributes
+from .model_worker import get_model_worker_client
 
 # Constants settings, read from environment variables
 EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "fastembed")
@@ -12,6 +19,171 @@ EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-large-en-v1.5")
 EMBEDDING_PROVIDER_API_KEY = os.getenv("EMBEDDING_PROVIDER_API_KEY", "your_embedding_provider_api_key")
 EMBEDDING_PROVIDER_URL = os.getenv("EMBEDDING_PROVIDER_URL", "https://api.openai.com/v1/embeddings")
 OLLAMA_SERVER = os.getenv("OLLAMA_SERVER", "http://localhost:11434")
+# cpu or gpu (cuda); ACCLERATOR is the misspelt name read before
+ACCELERATOR = (os.getenv("ACCELERATOR") or os.getenv("ACCLERATOR") or "cpu").lower()
+USE_CUDA = ACCELERATOR in ("gpu", "cuda")
+EMBEDDING_INT8 = os.getenv("EMBEDDING_INT8", "false").lower() == "true" # int8-quantized ONNX variant of the model
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "0")) # fastembed processes; 0 for one per core, 1 to embed in process
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0")) # ONNX Runtime threads per process; 0 for cores / workers
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "0")) # token budget per batch; 0 for the provider's default
+
+# Per provider: token budget of a batch, maximum texts per batch, and whether the budget counts
+# padding (local models pad each batch to its longest text) or the token sum (API request limits)
+BATCH_LIMITS = {
+    "fastembed": (16384, None, True),
+    "ollama": (16384, None, True),
+    "openai": (250000, 2048, False), # under the 300k tokens and 2048 inputs per request
+    "voyageai": (100000, 1000, False), # under the 120k tokens and 1000 inputs per request of voyage-3
+}
+DEFAULT_BATCH_LIMITS = (16384, None, True)
+
+logger = logging.getLogger(__name__)
+
+if TYPE_CHECKING:
+    from fastembed import TextEmbedding
+
+def embedding_workers() -> int:
+    """
+    Number of fastembed processes: EMBEDDING_WORKERS, one per core if 0, and 1 on GPU.
+    """
+    if USE_CUDA:
+        return 1
+    return EMBEDDING_WORKERS or os.cpu_count() or 1
+
+def embedding_threads() -> int:
+    """
+    ONNX Runtime threads of each fastembed process, so that all processes together use every core once.
+    """
+    return EMBEDDING_THREADS or max(1, (os.cpu_count() or 1) // embedding_workers())
+
+@lru_cache(maxsize=None)
+def resolve_fastembed_model(model_name: str) -> str:
+    """
+    Get the fastembed model to load for `model_name`: its int8 variant if EMBEDDING_INT8 is set and
+    one is listed in the embedding registry (registered with fastembed if needed), else the model itself.
+    """
+    if not EMBEDDING_INT8:
+        return model_name
+    variant = get_int8_variant(model_name)
+    if variant is None:
+        logger.warning(f"No int8 variant listed for {model_name}, using the default export")
+        return model_name
+    if variant["source"] is not None:
+        from fastembed import TextEmbedding
+        from fastembed.common.model_description import ModelSource, PoolingType
+
+        TextEmbedding.add_custom_model(
+            model=variant["quantized_model"],
+            pooling=PoolingType[variant["pooling"]],
+            normalization=variant["normalization"],
+            sources=ModelSource(hf=variant["source"]),
+            dim=next(it["dim"] for it in TextEmbedding.list_supported_models() if it["model"] == model_name),
+            model_file=variant["model_file"],
+        )
+    return variant["quantized_model"]
+
+@lru_cache(maxsize=None)
+def get_fastembed_model(model_name: str) -> "TextEmbedding":
+    """
+    Get a fastembed model, loaded once per process instead of on every call.
+    """
+    from fastembed import TextEmbedding
+
+    if USE_CUDA:
+        options = {"cuda": True}
+    else:
+        options = {"providers": ["CPUExecutionProvider"], "threads": embedding_threads()}
+    return TextEmbedding(model_name=resolve_fastembed_model(model_name), batch_size=32, **options)
+
+# Set in each embedding process: the barrier its warm-up task waits on
+_warm_up_barrier = None
+
+def _init_embedding_worker(model_name: str, warm_up_barrier) -> None:
+    global _warm_up_barrier
+    _warm_up_barrier = warm_up_barrier
+    get_fastembed_model(model_name)
+
+def _warm_up_embedding_worker() -> int:
+    # Held until every process has taken one warm-up task, so none can take two
+    _warm_up_barrier.wait()
+    return os.getpid()
+
+def _fastembed_batch(model_name: str, texts: list[str]):
+    import numpy as np
+
+    # One ONNX run per batch: the batch is already sized to the token budget
+    return np.stack(list(get_fastembed_model(model_name).embed(texts, batch_size=len(texts))))
+
+_embedding_pool_lock = threading.Lock()
+
+def get_embedding_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Get the persistent pool of fastembed processes, each with the model loaded, or None with a single worker.
+    """
+    with _embedding_pool_lock:
+        return _start_embedding_pool()
+
+@lru_cache(maxsize=1)
+def _start_embedding_pool() -> Optional[ProcessPoolExecutor]:
+    workers = embedding_workers()
+    if workers <= 1:
+        return None
+    logger.info(f"Starting {workers} embedding processes with {embedding_threads()} threads each")
+    context = multiprocessing.get_context("spawn")
+    # Synchronisation primitives reach the processes by inheritance only, so through initargs
+    warm_up_barrier = context.Barrier(workers)
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_embedding_worker,
+        initargs=(EMBEDDING_MODEL, warm_up_barrier),
+    )
+    # Processes start on demand: one warm-up task per process, each waiting for the others, makes
+    # all of them start and load the model now rather than during the first large batch
+    pids = {future.result() for future in [pool.submit(_warm_up_embedding_worker) for _ in range(workers)]}
+    logger.info(f"Embedding processes ready: {len(pids)}")
+    return pool
+
+def fastembed_embed(batches: list[list[str]]) -> list[list[list[float]]]:
+    """
+    Embed batches of texts with the local fastembed model, the batches spread over the embedding
+    processes if there are several.
+    """
+    pool = get_embedding_pool()
+    if pool is None:
+        results = [_fastembed_batch(EMBEDDING_MODEL, batch) for batch in batches]
+    else:
+        results = pool.map(_fastembed_batch, repeat(EMBEDDING_MODEL), batches)
+    return [vectors.tolist() for vectors in results]
+
+def plan_embedding_batches(texts: list[str]) -> list[list[int]]:
+    """
+    Group texts into batches of similar token length under the provider's token budget
+    (EMBEDDING_BATCH_TOKENS, or BATCH_LIMITS). Lengths are capped at the model's context
+    length, past which the model truncates.
+
+    Returns:
+        list[list[int]]: Indices of the texts in each batch, shortest texts first.
+    """
+    max_tokens, max_items, padded = BATCH_LIMITS.get(EMBEDDING_PROVIDER, DEFAULT_BATCH_LIMITS)
+    lengths = count_tokens(texts)
+    spec = get_model_spec(EMBEDDING_PROVIDER, EMBEDDING_MODEL)
+    if spec and spec.get("context_length"):
+        lengths = [min(length, spec["context_length"]) for length in lengths]
+    return token_budget_batches(lengths, EMBEDDING_BATCH_TOKENS or max_tokens, max_items, padded)
+
+def plan_embedding_rounds(texts: list[str]) -> list[list[int]]:
+    """
+    Split texts into rounds for progress reporting: each round is the batches embedded concurrently,
+    one per embedding process (a single batch for remote providers). Embedding a round's texts in one
+    `get_text_embedding` call forms the same batches again.
+
+    Returns:
+        list[list[int]]: Indices of the texts in each round.
+    """
+    batches = plan_embedding_batches(texts)
+    size = embedding_workers() if EMBEDDING_PROVIDER == "fastembed" else 1
+    return [[index for batch in batches[i:i + size] for index in batch] for i in range(0, len(batches), size)]
 
 def get_text_embedding(texts: list[str]) -> list[list[float]]:
     """
@@ -23,22 +195,48 @@ def get_text_embedding(texts: list[str]) -> list[list[float]]:
     Returns:
         list[list[float]]: List of embeddings for each text.
     """
+    texts = [texts] if isinstance(texts, str) else texts
+    with stage_timer("embed", items=len(texts)):
+        set_span_attributes({"embedding.provider": EMBEDDING_PROVIDER, "embedding.model": EMBEDDING_MODEL})
+        return _embed(texts)
+
+def _embed(texts: list[str]) -> list[list[float]]:
+    # The local model runs in the shared model worker when there is one (serve.py with BACKEND_WORKERS > 1)
+    client = get_model_worker_client() if EMBEDDING_PROVIDER == "fastembed" else None
+    if client is not None:
+        return client.call("embed", texts)
+    return embed_locally(texts)
+
+def embed_locally(texts: list[str]) -> list[list[float]]:
+    """
+    Embed `texts` in this process, in length-sorted batches under the provider's token budget,
+    loading the local model on first use.
+    """
+    if not texts:
+        return []
+    batches = plan_embedding_batches(texts)
+    if EMBEDDING_PROVIDER == "fastembed":
+        results = fastembed_embed([[texts[i] for i in batch] for batch in batches])
+    else:
+        results = [_embed_batch([texts[i] for i in batch]) for batch in batches]
+    return restore_order(batches, results)
+
+def _embed_batch(texts: list[str]) -> list[list[float]]:
+    # Provider SDKs are imported on first use: only the configured one is needed, and they are slow to import
     if EMBEDDING_PROVIDER == "openai":
+        from openai import OpenAI
         client = OpenAI(api_key=EMBEDDING_PROVIDER_API_KEY)
-        response = client.embeddings.create(text=texts, model=EMBEDDING_MODEL).data[0].embedding
-        return response
+        response = client.embeddings.create(input=texts, model=EMBEDDING_MODEL)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
     
     elif EMBEDDING_PROVIDER == "voyageai":
+        import voyageai
         vo = voyageai.Client(api_key=EMBEDDING_PROVIDER_API_KEY)
         result = vo.embed(texts, model=EMBEDDING_MODEL, input_type="document")
         return result.embeddings # list[list[float]]
 
-    elif EMBEDDING_PROVIDER == "fastembed":
-        embed_model = TextEmbedding(model_name=EMBEDDING_MODEL, batch_size=32)
-        embed_vector = list(embed_model.embed(texts,parallel=0)) # list[numpy.ndarray]
-        return [vec.tolist() for vec in embed_vector] # list[list[float]]
-
     elif EMBEDDING_PROVIDER == "ollama":
+        import ollama
         # ollama.embed(model='llama3.2', input=['The sky is blue because of rayleigh scattering', 'Grass is green because of chlorophyll'])
         model_list = ollama.list()
         if EMBEDDING_MODEL not in model_list:
@@ -0,0 +1,149 @@
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from typing import AsyncIterator, Callable, Hashable, Optional
+
+from fastapi import HTTPException
+
+from .sse import make_sse_event, make_sse_heartbeat
+
+logger = logging.getLogger(__name__)
+
+class Job:
+    """
+    A background run of an SSE event generator whose recent events are buffered, so clients
+    can attach at any time and resume from the last event they received.
+    """
+
+    def __init__(self, key: Hashable, buffer_size: int):
+        self.key = key
+        self.id = uuid.uuid4().hex
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.events: deque[tuple[int, str]] = deque(maxlen=buffer_size)
+        self.last_event_id = 0
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._cond = asyncio.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    async def publish(self, message: str) -> None:
+        """
+        Number and buffer an SSE message; comment lines (heartbeats) are not buffered.
+        Event IDs are `<job id>:<n>`, so a resume can be told apart from one of another run.
+        """
+        if message.startswith(":"):
+            return
+        async with self._cond:
+            self.last_event_id += 1
+            self.events.append((self.last_event_id, f"id: {self.id}:{self.last_event_id}\n{message}"))
+            self._cond.notify_all()
+
+    async def run(self, events: AsyncIterator[str]) -> None:
+        try:
+            async for message in events:
+                await self.publish(message)
+        except HTTPException as e:
+            await self.publish(make_sse_event({"error": e.detail, "status_code": e.status_code}, event="error"))
+        except Exception as e:
+            logger.exception(f"Job {self.key} failed")
+            await self.publish(make_sse_event({"error": str(e), "status_code": 500}, event="error"))
+        finally:
+            async with self._cond:
+                self.finished_at = time.time()
+                self._cond.notify_all()
+
+    def resume_point(self, last_event_id: Optional[str]) -> int:
+        """
+        Get the event number to resume after from a `Last-Event-ID`: its number if it is an ID of
+        this run, else 0 (no ID, or one of another run of the same key) to replay from the start.
+        """
+        job_id, _, number = (last_event_id or "").rpartition(":")
+        if job_id != self.id or not number.isdigit():
+            return 0
+        return min(int(number), self.last_event_id)
+
+    async def subscribe(self, last_event_id: int = 0, heartbeat_interval: float = 15) -> AsyncIterator[str]:
+        """
+        Yield the buffered events after event number `last_event_id` (see `resume_point`), then
+        live events until the job is done.
+        Events older than the buffer are lost; the client resumes from the oldest one kept.
+        """
+        self.subscribers += 1
+        try:
+            while True:
+                async with self._cond:
+                    try:
+                        await asyncio.wait_for(
+                            self._cond.wait_for(lambda: self.last_event_id > last_event_id or self.done),
+                            timeout=heartbeat_interval,
+                        )
+                    except asyncio.TimeoutError:
+                        pending, finished = [], False
+                    else:
+                        pending = [(event_id, message) for event_id, message in self.events if event_id > last_event_id]
+                        finished = self.done
+                if not pending and not finished:
+                    yield make_sse_heartbeat()
+                    continue
+                for event_id, message in pending:
+                    last_event_id = event_id
+                    yield message
+                if finished:
+                    return
+        finally:
+            self.subscribers -= 1
+
+    def status(self) -> dict:
+        return {
+            "job_id": self.id,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "events": self.last_event_id,
+            "subscribers": self.subscribers,
+        }
+
+class JobRegistry:
+    """
+    Registry of background jobs, at most one running per key.
+
+    Finished jobs are kept for `retention` seconds so clients that lost the connection
+    near the end can still replay the last events.
+    """
+
+    def __init__(self, buffer_size: int = 500, retention: float = 300):
+        self.buffer_size = buffer_size
+        self.retention = retention
+        self._jobs: dict[Hashable, Job] = {}
+
+    def _prune(self) -> None:
+        now = time.time()
+        for key, job in list(self._jobs.items()):
+            if job.done and now - job.finished_at > self.retention:
+                del self._jobs[key]
+
+    def get(self, key: Hashable) -> Optional[Job]:
+        self._prune()
+        return self._jobs.get(key)
+
+    def start(self, key: Hashable, events: Callable[[], AsyncIterator[str]]) -> Job:
+        """
+        Start a job for `key` running the generator returned by `events`, replacing a finished one.
+        """
+        self._prune()
+        job = Job(key, self.buffer_size)
+        self._jobs[key] = job
+        job.task = asyncio.create_task(job.run(events()))
+        return job
+
+    def running(self) -> int:
+        return sum(1 for job in self._jobs.values() if not job.done)
+
+    def status(self) -> list[dict]:
+        self._prune()
+        return [{"key": list(key) if isinstance(key, tuple) else key, **job.status()} for key, job in self._jobs.items()]
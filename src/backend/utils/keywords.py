@@ -0,0 +1,110 @@
+import re
+from collections import Counter
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Common English and academic filler words, never part of a keyword
+STOPWORDS = frozenset("""
+a about above across after again against all also among an and any are as at be been before being below between
+both but by can could do does done during each either et etc few for from further had has have having here how
+however i if in into is it its itself may more most much must no nor not of off on once only or other our out over
+own per same several should since so some such than that the their them then there these they this those through
+thus to too under until up upon us use used using very via was we were what when where whether which while who whom
+whose why will with within without would yet
+paper papers propose proposed proposes present presents show shows shown study studies approach approaches method
+methods result results work works based new novel existing various different well first second also further
+""".split())
+
+TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9]*(?:-[a-z0-9]+)*")
+
+def extract_candidates(texts: list[str], max_ngram: int = 3, max_candidates: int = 200) -> list[str]:
+    """
+    Mine candidate keyphrases (1 to `max_ngram` words) from a corpus.
+
+    Phrases may not contain stopwords and must end with a word of at least three characters.
+    Candidates are ranked by the number of texts they appear in, then by frequency and
+    alphabetically, so the result is reproducible.
+
+    Args:
+        texts (list[str]): The corpus (titles, abstracts, chunks).
+        max_ngram (int): The maximum number of words in a phrase.
+        max_candidates (int): The maximum number of candidates returned.
+
+    Returns:
+        list[str]: The candidate phrases, in lower case.
+    """
+    document_frequency, frequency = Counter(), Counter()
+    for text in texts:
+        # Sentence and clause breaks end a phrase
+        seen = set()
+        for segment in re.split(r"[.,;:!?()\[\]{}\"\n]+", (text or "").lower()):
+            tokens = TOKEN_PATTERN.findall(segment)
+            for n in range(1, max_ngram + 1):
+                for i in range(len(tokens) - n + 1):
+                    gram = tokens[i:i + n]
+                    if len(gram[-1]) < 3 or any(token in STOPWORDS for token in gram):
+                        continue
+                    phrase = " ".join(gram)
+                    frequency[phrase] += 1
+                    seen.add(phrase)
+        document_frequency.update(seen)
+    ranked = sorted(frequency, key=lambda phrase: (-document_frequency[phrase], -frequency[phrase], phrase))
+    return ranked[:max_candidates]
+
+def _normalize_rows(matrix: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def rank_candidates(
+    query_vectors: list[list[float]],
+    candidates: list[str],
+    candidate_vectors: list[list[float]],
+    top_n: int = 5,
+    diversity: float = 0.3,
+    exclude: list[str] = (),
+) -> list[dict]:
+    """
+    Rank candidate phrases by embedding similarity to the current keywords (KeyBERT-style).
+
+    The relevance of a candidate is its cosine similarity to the centroid of the query vectors.
+    Picks are made with Maximal Marginal Relevance, so near-duplicates of already picked phrases
+    are pushed down; `diversity` 0 ranks by relevance only.
+
+    Args:
+        query_vectors (list[list[float]]): Embeddings of the current keywords.
+        candidates (list[str]): The candidate phrases.
+        candidate_vectors (list[list[float]]): Embeddings of the candidates, in the same order.
+        top_n (int): The number of keywords returned.
+        diversity (float): Weight of the redundancy penalty, between 0 and 1.
+        exclude (list[str]): Phrases not to suggest (e.g. the current keywords), matched case-insensitively.
+
+    Returns:
+        list[dict]: [{"keyword": str, "score": float}], best first.
+    """
+    excluded = {phrase.strip().lower() for phrase in exclude}
+    keep = [i for i, phrase in enumerate(candidates) if phrase not in excluded]
+    if not keep or not query_vectors:
+        return []
+    # numpy is imported on first use, to keep it out of the backend's startup
+    import numpy as np
+
+    query = _normalize_rows(np.asarray(query_vectors, dtype=np.float32)).mean(axis=0, keepdims=True)
+    matrix = _normalize_rows(np.asarray(candidate_vectors, dtype=np.float32)[keep])
+    relevance = (matrix @ _normalize_rows(query).T).ravel()
+    pairwise = matrix @ matrix.T
+
+    picked: list[int] = []
+    remaining = np.ones(len(keep), dtype=bool)
+    for _ in range(min(top_n, len(keep))):
+        redundancy = pairwise[:, picked].max(axis=1) if picked else np.zeros(len(keep), dtype=np.float32)
+        mmr = (1 - diversity) * relevance - diversity * redundancy
+        mmr[~remaining] = -np.inf
+        best = int(np.argmax(mmr))
+        picked.append(best)
+        remaining[best] = False
+    return [{"keyword": candidates[keep[i]], "score": float(relevance[i])} for i in picked]
@@ -0,0 +1,205 @@
+import json
+import asyncio
+import hashlib
+import logging
+from collections import defaultdict
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+
+from opentelemetry.trace import SpanKind
+
+from .tracing import span
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+# Request parameters forwarded upstream, anything else is dropped
+ALLOWED_PARAMS = {"temperature", "top_p", "max_tokens", "response_format", "seed", "stop"}
+
+class QueueFullError(Exception):
+    """
+    Raised when a model's wait queue is full.
+    """
+
+class _InFlight:
+    """
+    One upstream completion, shared by every caller that asked for the same prompt.
+
+    Tokens are buffered so a caller joining late still receives the whole reply.
+    """
+
+    def __init__(self):
+        self.chunks: list[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._cond = asyncio.Condition()
+
+    async def push(self, text: str) -> None:
+        async with self._cond:
+            self.chunks.append(text)
+            self._cond.notify_all()
+
+    async def finish(self, error: Optional[BaseException] = None) -> None:
+        async with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    async def stream(self) -> AsyncIterator[str]:
+        """
+        Yield the reply token by token, from the beginning.
+        """
+        idx = 0
+        while True:
+            async with self._cond:
+                await self._cond.wait_for(lambda: len(self.chunks) > idx or self.done)
+                new_chunks = self.chunks[idx:]
+                finished = self.done
+            idx += len(new_chunks)
+            for chunk in new_chunks:
+                yield chunk
+            if finished and idx == len(self.chunks):
+                if self.error is not None:
+                    raise self.error
+                return
+
+    async def result(self) -> str:
+        return "".join([chunk async for chunk in self.stream()])
+
+class LLMGateway:
+    """
+    Gateway in front of the upstream LLM API.
+
+    - Identical requests in flight at the same time are sent upstream once.
+    - Each model has a concurrency limit; requests beyond it wait in a bounded queue,
+      and are rejected with QueueFullError when the queue is full.
+    """
+
+    def __init__(self, base_url: str, api_key: str, max_concurrency: int, max_queue: int,
+                 model_limits: Optional[dict] = None, timeout: float = 120):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.model_limits = model_limits or {}
+        self.timeout = timeout
+        self._client: Optional["AsyncOpenAI"] = None
+        self._inflight: dict[str, _InFlight] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._waiting: dict[str, int] = defaultdict(int)
+        self._active: dict[str, int] = defaultdict(int)
+        self.stats = {"requests": 0, "coalesced": 0, "upstream": 0, "rejected": 0, "errors": 0}
+
+    def _limits(self, model: str) -> tuple[int, int]:
+        limits = self.model_limits.get(model, {})
+        return limits.get("max_concurrency", self.max_concurrency), limits.get("max_queue", self.max_queue)
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        if model not in self._semaphores:
+            self._semaphores[model] = asyncio.Semaphore(self._limits(model)[0])
+        return self._semaphores[model]
+
+    def _get_client(self) -> "AsyncOpenAI":
+        if self._client is None:
+            # Imported on the first LLM call, openai is slow to import
+            from openai import AsyncOpenAI
+            self._client = AsyncOpenAI(base_url=self.base_url, api_key=self.api_key, timeout=self.timeout, max_retries=0)
+        return self._client
+
+    @staticmethod
+    def request_key(model: str, messages: list[dict], params: dict) -> str:
+        raw = json.dumps({"model": model, "messages": messages, "params": params}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def submit(self, model: str, messages: list[dict], params: dict) -> _InFlight:
+        """
+        Submit a chat completion, joining an identical one already in flight if there is one.
+
+        Raises:
+            QueueFullError: If the model's queue is full.
+        """
+        params = {k: v for k, v in params.items() if k in ALLOWED_PARAMS}
+        key = self.request_key(model, messages, params)
+        self.stats["requests"] += 1
+        entry = self._inflight.get(key)
+        if entry is not None:
+            self.stats["coalesced"] += 1
+            return entry
+
+        max_concurrency, max_queue = self._limits(model)
+        # Waiting requests beyond the free concurrency slots are the ones actually queued
+        if self._waiting[model] >= max_queue + max(0, max_concurrency - self._active[model]):
+            self.stats["rejected"] += 1
+            raise QueueFullError(f"Queue for {model} is full ({max_queue} waiting)")
+
+        entry = _InFlight()
+        self._inflight[key] = entry
+        self._waiting[model] += 1
+        task = asyncio.create_task(self._run(key, entry, model, messages, params))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return entry
+
+    async def _run(self, key: str, entry: _InFlight, model: str, messages: list[dict], params: dict) -> None:
+        waiting = True
+        try:
+            async with self._semaphore(model):
+                self._waiting[model] -= 1
+                waiting = False
+                self._active[model] += 1
+                try:
+                    self.stats["upstream"] += 1
+                    # A child of the request that started the call, shared callers join it
+                    with span("llm.upstream", SpanKind.CLIENT, {"llm.model": model}):
+                        stream = await self._get_client().chat.completions.create(
+                            model=model, messages=messages, stream=True, **params
+                        )
+                        async for chunk in stream:
+                            if chunk.choices and chunk.choices[0].delta.content:
+                                await entry.push(chunk.choices[0].delta.content)
+                finally:
+                    self._active[model] -= 1
+            await entry.finish()
+        except asyncio.CancelledError:
+            # Fail every caller sharing this call, rather than leave them waiting for a reply that never comes
+            logger.warning(f"LLM gateway request to {model} was cancelled")
+            self.stats["errors"] += 1
+            await entry.finish(RuntimeError(f"Upstream request to {model} was cancelled"))
+            raise
+        except Exception as e:
+            logger.warning(f"LLM gateway request to {model} failed: {e!r}")
+            self.stats["errors"] += 1
+            await entry.finish(e)
+        finally:
+            if waiting:
+                self._waiting[model] -= 1
+            self._inflight.pop(key, None)
+
+    def queue_depth(self) -> dict:
+        """
+        Get active and waiting requests per model.
+        """
+        models = set(self._active) | set(self._waiting)
+        return {
+            model: {
+                "active": self._active[model],
+                "waiting": self._waiting[model],
+                "max_concurrency": self._limits(model)[0],
+                "max_queue": self._limits(model)[1],
+            }
+            for model in sorted(models)
+        }
+
+    async def close(self) -> None:
+        """
+        Cancel the calls in flight, failing their callers, and close the upstream client.
+        """
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
@@ -0,0 +1,134 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from prometheus_client import Counter, Histogram, CollectorRegistry, REGISTRY, generate_latest, multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, SummaryMetricFamily
+
+from .profiling import profile_block
+from .tracing import span
+
+# Latency buckets from a fast API call up to a long Docling conversion
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency per route (streaming responses until the headers are sent).",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_DURATION = Histogram(
+    "pipeline_stage_duration_seconds",
+    "Duration of one call of a pipeline stage.",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_ITEMS = Counter(
+    "pipeline_stage_items_total",
+    "Items processed by a pipeline stage (PDFs, chunks, points, queries).",
+    ["stage"],
+)
+STAGE_ERRORS = Counter(
+    "pipeline_stage_errors_total",
+    "Failed calls of a pipeline stage.",
+    ["stage"],
+)
+
+@contextmanager
+def stage_timer(stage: str, items: int = 1) -> Iterator[None]:
+    """
+    Time a block as one call of a pipeline stage, counting `items` processed if it succeeds.
+
+    Stages: download, validate, convert, chunk, embed, qdrant_upsert, qdrant_search.
+    The block is also a `stage.<name>` span, and is sampled when the request or indexing run
+    is being profiled (utils/profiling.py).
+    """
+    start = time.perf_counter()
+    try:
+        with span(f"stage.{stage}", attributes={"pipeline.stage": stage, "pipeline.items": items}), profile_block():
+            yield
+    except Exception:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    else:
+        STAGE_ITEMS.labels(stage).inc(items)
+    finally:
+        STAGE_DURATION.labels(stage).observe(time.perf_counter() - start)
+
+def run_stage(stage: str, fn: Callable, *args, **kwargs):
+    """
+    Call `fn(*args, **kwargs)` timed as one call of `stage`, e.g. inside `asyncio.to_thread`.
+    """
+    with stage_timer(stage):
+        return fn(*args, **kwargs)
+
+class StateCollector:
+    """
+    Exports state kept elsewhere (cache counters, gateway queues, jobs, database latency)
+    at scrape time, so the owners of that state need no metrics code.
+    """
+
+    def __init__(self, caches: dict, gateway=None, jobs=None, db_stats: Callable[[], dict] = None):
+        self.caches = caches
+        self.gateway = gateway
+        self.jobs = jobs
+        self.db_stats = db_stats
+
+    def collect(self):
+        hits = CounterMetricFamily("cache_hits", "Cache hits.", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache misses.", labels=["cache"])
+        for name, cache in self.caches.items():
+            hits.add_metric([name], cache.hits)
+            misses.add_metric([name], cache.misses)
+        yield hits
+        yield misses
+
+        if self.gateway is not None:
+            requests = CounterMetricFamily("llm_gateway_requests", "LLM gateway requests by outcome.", labels=["outcome"])
+            for outcome, value in self.gateway.stats.items():
+                requests.add_metric([outcome], value)
+            yield requests
+            active = GaugeMetricFamily("llm_gateway_active", "Upstream LLM calls in flight.", labels=["model"])
+            waiting = GaugeMetricFamily("llm_gateway_waiting", "LLM calls waiting for a slot.", labels=["model"])
+            for model, depth in self.gateway.queue_depth().items():
+                active.add_metric([model], depth["active"])
+                waiting.add_metric([model], depth["waiting"])
+            yield active
+            yield waiting
+
+        if self.jobs is not None:
+            jobs = self.jobs.status()
+            yield GaugeMetricFamily("index_jobs_running", "Indexing jobs in progress.", value=self.jobs.running())
+            yield GaugeMetricFamily("index_job_subscribers", "Clients attached to indexing jobs.",
+                                    value=sum(job["subscribers"] for job in jobs))
+
+        if self.db_stats is not None:
+            db_latency = SummaryMetricFamily("mongo_operation_seconds", "MongoDB operation latency.", labels=["operation"])
+            db_errors = CounterMetricFamily("mongo_operation_errors", "Failed MongoDB operations.", labels=["operation"])
+            for operation, stats in self.db_stats().items():
+                db_latency.add_metric([operation], count_value=stats["count"], sum_value=stats["avg_ms"] * stats["count"] / 1000)
+                db_errors.add_metric([operation], stats["errors"])
+            yield db_latency
+            yield db_errors
+
+# State collectors of this process, added to the per-scrape registry in multiprocess mode
+_state_collectors: list[StateCollector] = []
+
+def register_state_collector(collector: StateCollector) -> None:
+    REGISTRY.register(collector)
+    _state_collectors.append(collector)
+
+def generate_metrics() -> bytes:
+    """
+    Render the metrics for a scrape. When several worker processes share PROMETHEUS_MULTIPROC_DIR
+    (serve.py), counters and histograms are aggregated over all of them, and state collectors
+    report this process only.
+    """
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return generate_latest()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    for collector in _state_collectors:
+        registry.register(collector)
+    return generate_latest(registry)
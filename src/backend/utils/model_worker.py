@@ -0,0 +1,105 @@
+import os
+import logging
+import threading
+from functools import lru_cache
+from multiprocessing.connection import Client, Connection, Listener
+from multiprocessing import AuthenticationError
+from typing import Any, Callable, Optional
+
+# Unix socket of the shared model worker started by serve.py; empty to load models in this process
+MODEL_WORKER_SOCKET = os.getenv("MODEL_WORKER_SOCKET", "")
+MODEL_WORKER_AUTHKEY = os.getenv("MODEL_WORKER_AUTHKEY", "")
+
+logger = logging.getLogger(__name__)
+
+class ModelWorkerError(Exception):
+    """
+    The model worker failed to handle a request; the message is the worker-side error.
+    """
+
+def serve(address: str, authkey: bytes, handlers: dict[str, Callable[..., Any]], ready: Optional[Callable[[], None]] = None) -> None:
+    """
+    Serve `handlers` on a Unix socket until the process exits, one thread per client connection.
+
+    Requests are `(operation, args)` tuples and replies `("ok", result)` or `("error", message)`.
+
+    Args:
+        address (str): Path of the Unix socket.
+        authkey (bytes): Shared secret clients must present.
+        handlers (dict): Operation name -> function called with the request's args.
+        ready (Callable): Called once the socket accepts connections.
+    """
+    with Listener(address, family="AF_UNIX", authkey=authkey) as listener:
+        logger.info(f"Model worker listening on {address} ({', '.join(handlers)})")
+        if ready is not None:
+            ready()
+        while True:
+            try:
+                conn = listener.accept()
+            except (AuthenticationError, OSError) as e:
+                logger.warning(f"Rejected model worker connection: {e!r}")
+                continue
+            threading.Thread(target=_handle, args=(conn, handlers), daemon=True).start()
+
+def _handle(conn: Connection, handlers: dict[str, Callable[..., Any]]) -> None:
+    with conn:
+        while True:
+            try:
+                operation, args = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                conn.send(("ok", handlers[operation](*args)))
+            except Exception as e:
+                logger.exception(f"Model worker {operation} failed")
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+
+class ModelWorkerClient:
+    """
+    Client of the shared model worker, with one connection per calling thread
+    (`asyncio.to_thread` calls run concurrently on different threads).
+    """
+
+    def __init__(self, address: str, authkey: bytes):
+        self.address = address
+        self.authkey = authkey
+        self._local = threading.local()
+
+    def _connection(self) -> Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+        return conn
+
+    def call(self, operation: str, *args) -> Any:
+        """
+        Run `operation` in the worker and return its result. A broken connection is reopened
+        and the request sent once more; the operations are idempotent.
+
+        Raises:
+            ModelWorkerError: If the operation failed in the worker.
+        """
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.send((operation, args))
+                status, result = conn.recv()
+                break
+            except (EOFError, OSError):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+                logger.info(f"Model worker connection lost, reconnecting for {operation}")
+        if status == "error":
+            raise ModelWorkerError(result)
+        return result
+
+@lru_cache(maxsize=1)
+def get_model_worker_client() -> Optional[ModelWorkerClient]:
+    """
+    Get the client of the shared model worker, or None if models are loaded in this process.
+    """
+    if not MODEL_WORKER_SOCKET:
+        return None
+    return ModelWorkerClient(MODEL_WORKER_SOCKET, MODEL_WORKER_AUTHKEY.encode())
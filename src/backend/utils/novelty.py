@@ -0,0 +1,65 @@
+import re
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for matching abstracts stored in different places.
+    """
+    return re.sub(r"\s+", " ", text or "").strip().lower()
+
+def cosine_similarities(query_vector: list[float], vectors: list[list[float]]) -> list[float]:
+    """
+    Compute the cosine similarity between a query vector and each of `vectors`.
+
+    Args:
+        query_vector (list[float]): The query vector.
+        vectors (list[list[float]]): The vectors to compare against.
+
+    Returns:
+        list[float]: One similarity per vector, in the same order.
+    """
+    if not vectors:
+        return []
+    # numpy is imported on first use, to keep it out of the backend's startup
+    import numpy as np
+
+    query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    norms[norms == 0] = 1.0
+    return (matrix @ query / norms).tolist()
+
+def classify_overlap(max_similarity: float, high_threshold: float, low_threshold: float) -> str:
+    """
+    Turn the highest similarity to an existing paper into a pre-screen verdict.
+
+    Args:
+        max_similarity (float): The highest cosine similarity between the draft and a related paper.
+        high_threshold (float): At or above this, the draft is considered covered by existing work.
+        low_threshold (float): Below this, the draft is considered clearly different.
+
+    Returns:
+        str: "likely_not_novel", "likely_novel" or "inconclusive".
+    """
+    if max_similarity >= high_threshold:
+        return "likely_not_novel"
+    if max_similarity < low_threshold:
+        return "likely_novel"
+    return "inconclusive"
+
+def merge_overlaps(overlaps: list[dict], limit: int) -> list[dict]:
+    """
+    Merge overlap candidates from several sources, keeping the best score per paper.
+
+    Args:
+        overlaps (list[dict]): Candidates with "score", "summary" and optional "id", "title", "url".
+        limit (int): The maximum number of overlaps to return.
+
+    Returns:
+        list[dict]: The top overlaps, ordered by score.
+    """
+    best: dict[str, dict] = {}
+    for overlap in overlaps:
+        key = overlap.get("id") or normalize_text(overlap.get("summary", ""))
+        if key not in best or overlap["score"] > best[key]["score"]:
+            best[key] = overlap
+    return sorted(best.values(), key=lambda item: item["score"], reverse=True)[:limit]
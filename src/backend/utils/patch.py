@@ -0,0 +1,107 @@
+from typing import Any
+
+# Top-level fields that identify a paper or are managed by the backend itself.
+PROTECTED_FIELDS = {"_id", "paper_name", "username", "version"}
+
+# Array fields that support append/remove operations, mapped to the key used
+# to identify an element on removal (None means the element value itself).
+ARRAY_FIELDS = {
+    "keywords": None,
+    "related_papers": "id",
+}
+
+def _validate_path(path: str) -> None:
+    """
+    Validate a dotted field path, e.g. ``generator.abstract``.
+
+    Raises:
+        ValueError: If the path is empty, malformed or targets a protected field.
+    """
+    if not isinstance(path, str) or not path:
+        raise ValueError("Field path must be a non-empty string")
+    segments = path.split(".")
+    if any(not segment or segment.startswith("$") for segment in segments):
+        raise ValueError(f"Invalid field path: {path}")
+    if segments[0] in PROTECTED_FIELDS:
+        raise ValueError(f"Field is not updatable: {segments[0]}")
+
+def _check_overlap(paths: list[str]) -> None:
+    """
+    Reject paths that overlap, MongoDB refuses to update e.g. ``generator`` and ``generator.abstract`` together.
+    """
+    ordered = sorted(paths)
+    for prev, curr in zip(ordered, ordered[1:]):
+        if curr == prev or curr.startswith(prev + "."):
+            raise ValueError(f"Conflicting field paths: {prev}, {curr}")
+
+def build_patch_update(patch: dict) -> dict:
+    """
+    Build a MongoDB update document from a field-level patch.
+
+    Args:
+        patch (dict): The patch, with optional keys:
+            - set (dict): dotted path -> new value, e.g. {"generator.abstract": "..."}
+            - unset (list[str]): dotted paths to remove
+            - append (dict): array field -> list of items to append
+            - remove (dict): array field -> list of items (or item ids) to remove
+
+    Returns:
+        dict: The update document, always incrementing ``version``.
+
+    Raises:
+        ValueError: If the patch is empty or invalid.
+    """
+    set_fields: dict[str, Any] = patch.get("set") or {}
+    unset_fields: list[str] = patch.get("unset") or []
+    append: dict[str, list] = patch.get("append") or {}
+    remove: dict[str, list] = patch.get("remove") or {}
+    for name, value in (("set", set_fields), ("append", append), ("remove", remove)):
+        if not isinstance(value, dict):
+            raise ValueError(f"'{name}' must be an object")
+    if not isinstance(unset_fields, list) or not all(isinstance(path, str) for path in unset_fields):
+        raise ValueError("'unset' must be a list of field paths")
+
+    if not (set_fields or unset_fields or append or remove):
+        raise ValueError("Patch is empty")
+
+    for path in list(set_fields) + list(unset_fields):
+        _validate_path(path)
+    for field, items in list(append.items()) + list(remove.items()):
+        if field not in ARRAY_FIELDS:
+            raise ValueError(f"Array operations are not supported on field: {field}")
+        if not isinstance(items, list):
+            raise ValueError(f"Array operation on {field} expects a list")
+    if set(append) & set(remove):
+        raise ValueError(f"Cannot append to and remove from the same field: {', '.join(set(append) & set(remove))}")
+    _check_overlap(list(set_fields) + list(unset_fields) + list(append) + list(remove))
+
+    update: dict[str, dict] = {"$inc": {"version": 1}}
+    if set_fields:
+        update["$set"] = dict(set_fields)
+    if unset_fields:
+        update["$unset"] = {path: "" for path in unset_fields}
+    if append:
+        update["$push"] = {field: {"$each": items} for field, items in append.items()}
+    for field, items in remove.items():
+        key = ARRAY_FIELDS[field]
+        if key is None:
+            update.setdefault("$pullAll", {})[field] = items
+        else:
+            ids = [item.get(key) if isinstance(item, dict) else item for item in items]
+            # A missing id would match, and pull, every element without one
+            if any(item_id is None for item_id in ids):
+                raise ValueError(f"Items removed from {field} must have an '{key}'")
+            update.setdefault("$pull", {})[field] = {key: {"$in": ids}}
+    return update
+
+def version_filter(expected_version: int | None) -> dict:
+    """
+    Build the filter clause for an optimistic concurrency check.
+
+    Papers created before versioning have no ``version`` field and count as version 0.
+    """
+    if expected_version is None:
+        return {}
+    if expected_version == 0:
+        return {"version": {"$in": [0, None]}}
+    return {"version": expected_version}
@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+# The recorder of the request or indexing run being profiled, inherited by `asyncio.to_thread`
+_current_recorder: ContextVar[Optional["ProfileRecorder"]] = ContextVar("profile_recorder", default=None)
+
+class ProfileRecorder:
+    """
+    Collects sampling profiles of one request or indexing run, from every thread it runs blocks in.
+
+    Each recorded block gets its own pyinstrument session; they are combined when saved.
+    """
+
+    def __init__(self, name: str, interval: float = 0.001):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.interval = interval
+        self.created_at = time.time()
+        self.sessions = []
+        # Set when a background job takes over saving the profile from the request that started it
+        self.detached = False
+        self._lock = threading.Lock()
+        self._active_threads: set[int] = set()
+
+    @contextmanager
+    def record(self) -> Iterator[None]:
+        """
+        Profile the current thread while the block runs; a no-op if it is already being profiled.
+        """
+        thread_id = threading.get_ident()
+        with self._lock:
+            nested = thread_id in self._active_threads
+            self._active_threads.add(thread_id)
+        if nested:
+            yield
+            return
+
+        # Imported here so the backend runs without pyinstrument when profiling is off
+        from pyinstrument import Profiler
+
+        profiler = Profiler(interval=self.interval, async_mode="disabled")
+        profiler.start()
+        try:
+            yield
+        finally:
+            session = profiler.stop()
+            with self._lock:
+                self._active_threads.discard(thread_id)
+                self.sessions.append(session)
+
+@contextmanager
+def activate(recorder: ProfileRecorder) -> Iterator[ProfileRecorder]:
+    """
+    Make `recorder` the current one for this context and the worker threads it starts.
+    """
+    token = _current_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_recorder.reset(token)
+
+def current_recorder() -> Optional[ProfileRecorder]:
+    return _current_recorder.get()
+
+@contextmanager
+def profile_block() -> Iterator[None]:
+    """
+    Record the block with the current recorder, if any. Costs one context variable lookup otherwise.
+    """
+    recorder = _current_recorder.get()
+    if recorder is None:
+        yield
+        return
+    with recorder.record():
+        yield
+
+class ProfileStore:
+    """
+    Saved profiles in a directory: `<id>.speedscope.json` (https://www.speedscope.app),
+    `<id>.html` (pyinstrument's call tree) and `<id>.json` metadata, keeping the newest `max_profiles`.
+    """
+
+    FORMATS = {"speedscope": ".speedscope.json", "html": ".html"}
+
+    def __init__(self, directory: str, max_profiles: int = 50):
+        self.directory = directory
+        self.max_profiles = max_profiles
+
+    def save(self, recorder: ProfileRecorder, **meta) -> Optional[dict]:
+        """
+        Combine the recorder's sessions and write them out; returns the metadata, or None if nothing was recorded.
+        """
+        if not recorder.sessions:
+            return None
+        from pyinstrument.session import Session
+        from pyinstrument.renderers import HTMLRenderer, SpeedscopeRenderer
+
+        session = recorder.sessions[0]
+        for other in recorder.sessions[1:]:
+            session = Session.combine(session, other)
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(recorder.id, "speedscope"), "w", encoding="utf-8") as f:
+            f.write(SpeedscopeRenderer().render(session))
+        with open(self._path(recorder.id, "html"), "w", encoding="utf-8") as f:
+            f.write(HTMLRenderer().render(session))
+        metadata = {
+            "profile_id": recorder.id,
+            "name": recorder.name,
+            "created_at": recorder.created_at,
+            "wall_seconds": round(time.time() - recorder.created_at, 3),
+            "sampled_seconds": round(session.duration, 3),
+            "blocks": len(recorder.sessions),
+            **meta,
+        }
+        with open(os.path.join(self.directory, f"{recorder.id}.json"), "w", encoding="utf-8") as f:
+            json.dump(metadata, f)
+        self._prune()
+        return metadata
+
+    def list(self) -> list[dict]:
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json") and not name.endswith(".speedscope.json"):
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    profiles.append(json.load(f))
+        return sorted(profiles, key=lambda profile: profile["created_at"], reverse=True)
+
+    def path(self, profile_id: str, fmt: str) -> Optional[str]:
+        """
+        Path of a saved profile in `fmt` ("speedscope" or "html"), or None if there is none.
+        """
+        if fmt not in self.FORMATS or not profile_id.isalnum():
+            return None
+        path = self._path(profile_id, fmt)
+        return path if os.path.isfile(path) else None
+
+    def _path(self, profile_id: str, fmt: str) -> str:
+        return os.path.join(self.directory, profile_id + self.FORMATS[fmt])
+
+    def _prune(self) -> None:
+        for profile in self.list()[self.max_profiles:]:
+            for suffix in (*self.FORMATS.values(), ".json"):
+                try:
+                    os.remove(os.path.join(self.directory, profile["profile_id"] + suffix))
+                except FileNotFoundError:
+                    pass
@@ -1,6 +1,8 @@
 import json
-import datetime
 import time
+import asyncio
+import datetime
+from typing import AsyncIterator, Optional
 
 def make_sse_message(status:str):
     """
@@ -17,4 +19,82 @@ def make_sse_message(status:str):
         "status": status
     }
     message = f"data: {json.dumps(payload)}\n\n"
-    return message
\ No newline at end of file
+    return message
+
+def make_sse_event(payload, event: str = None):
+    """
+    Create a Server-Sent Event carrying a JSON payload.
+
+    - payload: JSON-serialisable data, or a plain string sent as is.
+    - event: Optional event type.
+    """
+    data = payload if isinstance(payload, str) else json.dumps(payload)
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {data}\n\n"
+
+def make_sse_heartbeat():
+    """
+    Create an SSE comment line, ignored by clients but keeping idle connections and proxies alive.
+    """
+    return f": heartbeat {int(time.time())}\n\n"
+
+async def heartbeats_until(task: asyncio.Future, interval: float) -> AsyncIterator[str]:
+    """
+    Yield a heartbeat every `interval` seconds until `task` is done; the caller then reads `task.result()`.
+
+    - task: A future, e.g. blocking work wrapped in `asyncio.to_thread`.
+    - interval: Seconds between heartbeats.
+    """
+    task = asyncio.ensure_future(task)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=interval)
+        if done:
+            return
+        yield make_sse_heartbeat()
+
+class ProgressTracker:
+    """
+    Structured progress of one stage of a multi-stage job, coalesced to a maximum event rate.
+
+    Events carry the stage, its position among all stages, items done and total, throughput
+    (items per second since the stage started) and the estimated seconds left in the stage.
+    """
+
+    def __init__(self, stage: str, total: int, step: int, steps: int, interval: float):
+        self.stage = stage
+        self.total = total
+        self.step = step
+        self.steps = steps
+        self.interval = interval
+        self.started = time.monotonic()
+        self._last_emit = float("-inf")
+
+    def event(self, done: int, message: str = None) -> str:
+        """
+        Create the progress event for `done` items, regardless of the rate limit.
+        """
+        elapsed = time.monotonic() - self.started
+        rate = done / elapsed if elapsed > 0 else 0.0
+        payload = {
+            "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "stage": self.stage,
+            "step": self.step,
+            "steps": self.steps,
+            "done": done,
+            "total": self.total,
+            "rate": round(rate, 3),
+            "eta_seconds": round((self.total - done) / rate, 1) if rate > 0 else None,
+        }
+        if message:
+            payload["status"] = message
+        self._last_emit = time.monotonic()
+        return make_sse_event(payload, event="progress")
+
+    def update(self, done: int, message: str = None) -> Optional[str]:
+        """
+        Create the progress event for `done` items, or None if one was sent less than `interval`
+        seconds ago. The stage's first and last events are always sent.
+        """
+        if 0 < done < self.total and time.monotonic() - self._last_emit < self.interval:
+            return None
+        return self.event(done, message)
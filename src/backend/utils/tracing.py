@@ -0,0 +1,76 @@
+import os
+import logging
+from contextlib import contextmanager
+from typing import Iterator, Mapping, Optional
+
+from opentelemetry import trace, propagate
+from opentelemetry.context import Context
+from opentelemetry.trace import Span, SpanKind
+
+# otlp (to OTEL_EXPORTER_OTLP_ENDPOINT), console, file (JSON lines in TRACE_FILE) or none
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "otlp" if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT") else "none")
+TRACE_FILE = os.getenv("TRACE_FILE", "./traces.jsonl")
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0")) # of new traces, incoming ones keep the caller's decision
+
+logger = logging.getLogger(__name__)
+
+# A proxy until setup_tracing installs a provider; spans are no-ops without one
+tracer = trace.get_tracer("paper-assistant.backend")
+
+def setup_tracing(service_name: str) -> None:
+    """
+    Install the tracer provider and exporter selected by TRACE_EXPORTER.
+    """
+    if TRACE_EXPORTER == "none":
+        return
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    if TRACE_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter()
+    elif TRACE_EXPORTER == "console":
+        exporter = ConsoleSpanExporter()
+    elif TRACE_EXPORTER == "file":
+        exporter = ConsoleSpanExporter(
+            out=open(TRACE_FILE, "a", encoding="utf-8"),
+            formatter=lambda span: span.to_json(indent=None) + os.linesep,
+        )
+    else:
+        raise ValueError(f"Unsupported trace exporter: {TRACE_EXPORTER}")
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name}),
+        sampler=ParentBased(TraceIdRatioBased(TRACE_SAMPLE_RATIO)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    logger.info(f"Tracing {service_name} with the {TRACE_EXPORTER} exporter")
+
+@contextmanager
+def span(name: str, kind: SpanKind = SpanKind.INTERNAL, attributes: Optional[dict] = None,
+         context: Optional[Context] = None) -> Iterator[Span]:
+    """
+    Run the block in a new span, a child of `context` or of the current span.
+    Exceptions are recorded on the span; attributes that are None are left out.
+    """
+    attributes = {key: value for key, value in (attributes or {}).items() if value is not None}
+    with tracer.start_as_current_span(name, context=context, kind=kind, attributes=attributes) as current:
+        yield current
+
+def set_span_attributes(attributes: dict) -> None:
+    """
+    Add attributes to the current span, e.g. from code that runs inside a span opened elsewhere.
+    """
+    current = trace.get_current_span()
+    for key, value in attributes.items():
+        if value is not None:
+            current.set_attribute(key, value)
+
+def extract_context(headers: Mapping[str, str]) -> Context:
+    """
+    The trace context sent by the caller in the `traceparent` / `tracestate` headers.
+    """
+    return propagate.extract(headers)
@@ -1,9 +1,34 @@
+import logging
 from pprint import pprint
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-from qdrant_client.http.models.models import CollectionInfo
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
-def create_qd_collection(client_loc: str, coll_name: str, vector_size: int, distance: str = "COSINE") -> QdrantClient:
+from .metrics import stage_timer
+from .tracing import set_span_attributes
+
+if TYPE_CHECKING:
+    from qdrant_client import QdrantClient
+    from qdrant_client.http.models.models import CollectionInfo
+
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=None)
+def get_qd_client(client_loc: str) -> "QdrantClient":
+    """
+    Get the shared Qdrant client for a location, so connections are reused across calls.
+
+    Args:
+        client_loc (str): The URL of the Qdrant server, or ":memory:" for an in-process instance.
+
+    Returns:
+        QdrantClient: The shared client.
+    """
+    # qdrant_client is imported on first use, it is slow to import
+    from qdrant_client import QdrantClient
+
+    return QdrantClient(location=client_loc)
+
+def create_qd_collection(client_loc: str, coll_name: str, vector_size: int, distance: str = "COSINE") -> "QdrantClient":
     """
     Create a Qdrant collection with the specified name and vector size.
     
@@ -16,14 +41,16 @@ def create_qd_collection(client_loc: str, coll_name: str, vector_size: int, dist
     Returns:
         QdrantClient: The Qdrant client connected to the specified collection.
     """
-    qd_client = QdrantClient(url=client_loc)
+    from qdrant_client.models import Distance, VectorParams
+
+    qd_client = get_qd_client(client_loc)
     qd_client.recreate_collection(
         collection_name=coll_name,
         vectors_config=VectorParams(size=vector_size, distance=Distance[distance]),
     )
     return qd_client
 
-def insert_qd_collection(qd_client: QdrantClient, coll_name: str, data: dict) -> None:
+def insert_qd_collection(qd_client: "QdrantClient", coll_name: str, data: dict) -> None:
     """
     Insert points into the specified Qdrant collection.
     
@@ -32,10 +59,14 @@ def insert_qd_collection(qd_client: QdrantClient, coll_name: str, data: dict) ->
         coll_name (str): The name of the collection to insert points into.
         data (dict): The data to insert into the collection. Should contain 'vectors', and 'payload' keys.
     """
-    operation_info = qd_client.upsert(
-        collection_name=coll_name,
-        points=[PointStruct(id=i, vector=vec, payload=payload) for i, (vec, payload) in enumerate(zip(data['vectors'], data['payload']))],
-    )
+    from qdrant_client.models import PointStruct
+
+    with stage_timer("qdrant_upsert", items=len(data['vectors'])):
+        set_span_attributes({"db.system": "qdrant", "db.collection.name": coll_name})
+        operation_info = qd_client.upsert(
+            collection_name=coll_name,
+            points=[PointStruct(id=i, vector=vec, payload=payload) for i, (vec, payload) in enumerate(zip(data['vectors'], data['payload']))],
+        )
     
     print(f"Upserted {len(data['vectors'])} points into collection '{coll_name}'")
     print(f"Operation info: {operation_info}")
@@ -54,13 +85,15 @@ def search_qd_collection(client_loc: str, coll_name: str, query_vector: list[flo
     Returns:
         dict: The search results containing the IDs and distances of the nearest points.
     """
-    qd_client = QdrantClient(url=client_loc)
-    search_result = qd_client.query_points(
-        collection_name=coll_name,
-        query=query_vector,
-        with_payload=True,
-        limit=limit,
-    ).points
+    qd_client = get_qd_client(client_loc)
+    with stage_timer("qdrant_search"):
+        set_span_attributes({"db.system": "qdrant", "db.collection.name": coll_name, "db.query.limit": limit})
+        search_result = qd_client.query_points(
+            collection_name=coll_name,
+            query=query_vector,
+            with_payload=True,
+            limit=limit,
+        ).points
     
     if not search_result:
         print("No results found.")
@@ -79,7 +112,7 @@ def search_qd_collection(client_loc: str, coll_name: str, query_vector: list[flo
     pprint(results)
     return results
 
-def get_collection_info(client_loc: str, coll_name: str) -> CollectionInfo:
+def get_collection_info(client_loc: str, coll_name: str) -> "CollectionInfo":
     """
     Get information about the specified Qdrant collection.
     
@@ -90,9 +123,72 @@ def get_collection_info(client_loc: str, coll_name: str) -> CollectionInfo:
     Returns:
         dict: Information about the collection.
     """
-    qd_client = QdrantClient(url=client_loc)
+    qd_client = get_qd_client(client_loc)
     collection_info = qd_client.get_collection(collection_name=coll_name)
     
-    print(f"Collection info for '{coll_name}':")
-    pprint(collection_info)
-    return collection_info
\ No newline at end of file
+    logger.debug(f"Collection info for '{coll_name}': {collection_info}")
+    return collection_info
+
+def get_collection_stats(client_loc: str, coll_name: str) -> dict:
+    """
+    Get summary statistics of the specified Qdrant collection.
+
+    Qdrant does not report storage size per collection, so the size of the stored vectors is
+    estimated from the point count and vector size (float32), and attributed to disk or RAM
+    according to the collection's `on_disk` setting.
+
+    Args:
+        client_loc (str): The location of the Qdrant client.
+        coll_name (str): The name of the collection.
+
+    Returns:
+        dict: Point counts, status and estimated vector storage size; status is "missing" if
+            the collection does not exist.
+    """
+    from qdrant_client.http.exceptions import UnexpectedResponse
+
+    try:
+        info = get_collection_info(client_loc, coll_name)
+    except (UnexpectedResponse, ValueError) as e:
+        logger.info(f"Collection '{coll_name}' not available: {e}")
+        return {"collection_name": coll_name, "status": "missing", "points_count": 0,
+                "indexed_vectors_count": 0, "segments_count": 0, "vector_size": 0,
+                "on_disk": False, "vectors_disk_bytes": 0, "vectors_ram_bytes": 0}
+
+    vectors = info.config.params.vectors
+    vector_size = getattr(vectors, "size", 0) or 0
+    on_disk = bool(getattr(vectors, "on_disk", False))
+    points_count = info.points_count or 0
+    vectors_bytes = points_count * vector_size * 4
+    return {
+        "collection_name": coll_name,
+        "status": str(getattr(info.status, "value", info.status)),
+        "points_count": points_count,
+        "indexed_vectors_count": info.indexed_vectors_count or 0,
+        "segments_count": info.segments_count or 0,
+        "vector_size": vector_size,
+        "on_disk": on_disk,
+        "vectors_disk_bytes": vectors_bytes if on_disk else 0,
+        "vectors_ram_bytes": 0 if on_disk else vectors_bytes,
+    }
+
+def scroll_qd_collection(client_loc: str, coll_name: str, limit: int = 64) -> list[dict]:
+    """
+    Read the first points of the specified Qdrant collection, in id order.
+
+    Args:
+        client_loc (str): The location of the Qdrant client.
+        coll_name (str): The name of the collection.
+        limit (int): The maximum number of points to return. Default is 64.
+
+    Returns:
+        list[dict]: The points' IDs and payloads.
+    """
+    qd_client = get_qd_client(client_loc)
+    points, _ = qd_client.scroll(
+        collection_name=coll_name,
+        limit=limit,
+        with_payload=True,
+        with_vectors=False,
+    )
+    return [{"id": point.id, "payload": point.payload} for point in points]
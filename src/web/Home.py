@@ -1,16 +1,64 @@
-import streamlit as st
 import os
-import requests
+import math
+import streamlit as st
 
 # Self-defined imports
 from comp.utils.auth import login, register
-from comp.utils.data import list_all_paper_idea
+from comp.utils.data import list_paper_idea_page
 from comp.new_idea import new_idea_dialog 
 from comp.idea import view_paper_dialog
+from comp.utils.tracing import setup_tracing
+
+IDEAS_PAGE_SIZE = int(os.getenv("IDEAS_PAGE_SIZE", "12"))
+
+setup_tracing("web")
 
 if 'login' not in st.session_state:
     st.session_state.login = False
 
+@st.fragment
+def idea_grid(username):
+    """
+    Render one page of the idea grid, paging and filtering rerun only this fragment.
+    """
+    search = st.text_input('Search ideas by name', key='idea_search', placeholder='Filter by name...')
+    if st.session_state.get('idea_search_last') != search:
+        st.session_state.idea_search_last = search
+        st.session_state.idea_page = 1
+    page = st.session_state.get('idea_page', 1)
+
+    act_kb = list_paper_idea_page(username, search, page, IDEAS_PAGE_SIZE)
+    total_pages = max(1, math.ceil(act_kb.get('total', 0) / IDEAS_PAGE_SIZE))
+    if page > total_pages:
+        st.session_state.idea_page = page = total_pages
+        act_kb = list_paper_idea_page(username, search, page, IDEAS_PAGE_SIZE)
+
+    kb_left, kb_mid, kb_right = st.columns(3)
+    if len(act_kb['papers']) > 0:
+        for it, kb in enumerate(act_kb['papers']):
+            where = kb_left if it % 3 == 0 else kb_mid if it % 3 == 1 else kb_right
+            new_container = where.container(key=f'kb_{it}', border=True)
+            with new_container:
+                st.markdown(f"## {kb['icon']} {kb['paper_name']}")
+                st.write(kb['desc'])
+                if st.button('Open', key=f'open_kb_{it}'):
+                    view_paper_dialog(kb['paper_name'], kb['username'])
+    elif search:
+        st.info('No idea matches your search.')
+
+    if total_pages > 1:
+        prev_col, info_col, next_col = st.columns([1, 2, 1])
+        with prev_col:
+            if st.button('Previous', key='idea_prev_page', disabled=page <= 1):
+                st.session_state.idea_page = page - 1
+                st.rerun(scope='fragment')
+        with info_col:
+            st.caption(f"Page {page} of {total_pages} ({act_kb['total']} ideas)")
+        with next_col:
+            if st.button('Next', key='idea_next_page', disabled=page >= total_pages):
+                st.session_state.idea_page = page + 1
+                st.rerun(scope='fragment')
+
 if not st.session_state.login:
     # 建立 Login 與 Register 兩個 tabs
     tabs = st.tabs(["Login", "Register"])
@@ -63,14 +111,4 @@ else:
         if new_kb:
             new_idea_dialog()
     
-    kb_left, kb_mid, kb_right = st.columns(3)
-    act_kb = list_all_paper_idea(st.session_state.username)
-    if len(act_kb['papers']) > 0:
-        for it, kb in enumerate(act_kb['papers']):
-            where = kb_left if it % 3 == 0 else kb_mid if it % 3 == 1 else kb_right
-            new_container = where.container(key=f'kb_{it}', border=True)
-            with new_container:
-                st.markdown(f"## {kb['icon']} {kb['paper_name']}")
-                st.write(kb['desc'])
-                if st.button('Open', key=f'open_kb_{it}'):
-                    view_paper_dialog(kb['paper_name'], kb['username'])
\ No newline at end of file
+    idea_grid(st.session_state.username)
\ No newline at end of file
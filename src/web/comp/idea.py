@@ -3,21 +3,62 @@ import polars as pl
 
 from .utils.data import (
     get_paper_idea,
-    update_paper_idea,
+    patch_paper_idea,
     get_related_papers,
     get_emb_index,
-    get_emb_col_info,
-    similarity_search
+    get_emb_col_stats,
+    similarity_search,
+    novelty_prescreen,
+    suggest_keywords
 )
+from .utils.pipeline import generate_full_scaffold
+from .utils.novelty import check_novelty
+from .utils.tracing import span
 from .utils.llm import (
     llm_keywords_prompt,
     llm_paper_title_prompt,
     llm_abstract_prompt,
-    llm_novelty_check,
     llm_hypotheses_prompt,
     llm_experiment_design_prompt
 )
 
+def _save_paper_fields(paper_name, username, paper_data, success_message, **patch):
+    """
+    Patch only the given fields, guarded by the version the dialog was rendered with.
+    """
+    result = patch_paper_idea(paper_name, username, expected_version=paper_data['paper'].get('version', 0), **patch)
+    if result['status'] == 'success':
+        st.success(success_message)
+    elif result['status'] == 'conflict':
+        st.error("This paper idea was changed elsewhere. Please reopen it to load the latest version.")
+    else:
+        st.error("Failed to save changes.")
+    return result
+
+def _show_novelty(result):
+    """
+    Show the local pre-screen verdict with its closest papers, and the LLM check if it ran.
+    """
+    prescreen = result.get('prescreen')
+    if prescreen and prescreen.get('status') == 'success':
+        st.markdown("**Local Novelty Pre-screen**")
+        verdict = prescreen['verdict'].replace('_', ' ')
+        st.markdown(f"Verdict: {verdict} (max similarity {prescreen['max_similarity']:.2f}, "
+                    f"{prescreen['compared']} papers compared in {prescreen['elapsed_ms']:.0f} ms)")
+        if prescreen['overlaps']:
+            st.dataframe(pl.DataFrame([
+                {"title": overlap['title'], "similarity": round(overlap['score'], 3), "url": overlap['url']}
+                for overlap in prescreen['overlaps']
+            ]))
+    novelty = result.get('llm')
+    if novelty:
+        st.markdown("**Novelty Check Result**")
+        st.markdown(f"Novelty: {novelty['novelty']}")
+        st.markdown(f"Reason: {novelty['reason']}")
+        st.markdown(f"Suggestion: {novelty['suggestion']}")
+    elif prescreen:
+        st.caption("The remote LLM check was skipped, tick \"Always run the LLM novelty check\" to run it anyway.")
+
 @st.dialog("View Paper Idea")
 def view_paper_dialog(paper_name, username):
     tab1, tab2, tab3, tab4, tab5 = st.tabs(["Keyword", "Related Papers", "Embedding", "Scaffolding Generator", "Paper Generate"])
@@ -41,16 +82,27 @@ def view_paper_dialog(paper_name, username):
             generate_keywords = st.button("Generate Keywords", key="generate_keywords")
         with left_col:
             submit_button = st.button("Submit", key="submit_keywords")
+        llm_keywords = st.checkbox("Ask the LLM instead", key="llm_keywords",
+                                   help="By default keywords are mined from the related papers, which is faster and reproducible")
+        regenerate_keywords = st.checkbox("Regenerate (skip cached suggestions)", key="regenerate_keywords",
+                                          disabled=not llm_keywords)
         if generate_keywords:
-            # Call the LLM to get suggested keywords
-            st.session_state['tipwords'] = llm_keywords_prompt(tmp_keywords_input.split(","))
+            current_keywords = [keyword.strip() for keyword in tmp_keywords_input.split(",") if keyword.strip()]
+            suggestions = {"status": "fail", "keywords": []}
+            if not llm_keywords:
+                suggestions = suggest_keywords(paper_name, username, current_keywords)
+            if suggestions['keywords']:
+                st.session_state['tipwords'] = [suggestion['keyword'] for suggestion in suggestions['keywords']]
+            else:
+                # No related papers yet (or asked for), call the LLM to get suggested keywords
+                st.session_state['tipwords'] = llm_keywords_prompt(current_keywords, regenerate=regenerate_keywords)
         if st.session_state.get('tipwords'):
             st.info("Suggested keywords: " + ", ".join(st.session_state['tipwords']))
         if submit_button:
             keywords = [keyword.strip() for keyword in tmp_keywords_input.split(",") if keyword.strip()]
-            update_paper_idea(paper_name, username, {"keywords": keywords})
+            _save_paper_fields(paper_name, username, paper_data, "Keywords updated successfully!",
+                               set_fields={"keywords": keywords})
             st.session_state.keywords = keywords
-            st.success("Keywords updated successfully!")
             st.session_state['tipwords'] = None
     # Tab 2: Related Papers
     with tab2:
@@ -87,8 +139,8 @@ def view_paper_dialog(paper_name, username):
                 st.error("Failed to retrieve related papers.")
             else:
                 # Update the paper idea with the new related papers
-                update_paper_idea(paper_name, username, {"related_papers": related_papers['papers']})
-                st.success("Related papers updated successfully!")
+                _save_paper_fields(paper_name, username, paper_data, "Related papers updated successfully!",
+                                   set_fields={"related_papers": related_papers['papers']})
                 # Display the related papers in a table
                 related_papers_df = pl.DataFrame(related_papers['papers'])
                 st.dataframe(related_papers_df)
@@ -111,11 +163,17 @@ def view_paper_dialog(paper_name, username):
         # if emb_index, display them
         # if not emb_index and keywords != none, "Please press the button to get Embedding"
         if emb_index:
-            data = []
-            for index in emb_index:
-                collection_info = get_emb_col_info(index)
-                points_count = collection_info.get("points_count", 0)
-                data.append({"Collection Name": index, "points_count": points_count})
+            collections = get_emb_col_stats(paper_name, username)['collections']
+            data = [
+                {
+                    "Collection Name": col["collection_name"],
+                    "points_count": col["points_count"],
+                    "status": col["status"],
+                    "vectors_size_MB": round((col["vectors_ram_bytes"] + col["vectors_disk_bytes"]) / 2**20, 2),
+                    "on_disk": col["on_disk"],
+                }
+                for col in collections
+            ]
             df = pl.DataFrame(data)
             st.dataframe(df)
         elif emb_index == [] and keywords == []:
@@ -172,47 +230,92 @@ def view_paper_dialog(paper_name, username):
         with right_col:
             novelty_check = st.button("Novelty Check", key="novelty_check")
         save_section1 = st.button("Save", key="save_section1")
+        regenerate = st.checkbox("Regenerate (skip cached suggestions)", key="regenerate_generator")
+        force_llm_novelty = st.checkbox("Always run the LLM novelty check", key="force_llm_novelty",
+                                        help="By default the LLM is only asked when the local pre-screen is inconclusive")
+        prescreen = lambda title, abstract: novelty_prescreen(paper_name, username, title, abstract)
+        full_scaffold = st.button("Generate Full Scaffold", key="generate_full_scaffold",
+                                  help="Run title, abstract, novelty check, hypotheses and experiment design together")
+        if full_scaffold:
+            with span("ui.generate_full_scaffold"):
+                search_results = similarity_search(paper_name, username, ' '.join(st.session_state['keywords']))['results']
+                with st.spinner("Generating scaffold..."):
+                    scaffold = generate_full_scaffold(
+                        keywords=st.session_state['keywords'],
+                        relate_summaries=search_results[-1] if search_results else [],
+                        relate_chunks=search_results[0] if search_results else [],
+                        paper_title=paper_title if paper_title else "",
+                        paper_abstract=abstract if abstract else "",
+                        regenerate=regenerate,
+                        prescreen=prescreen,
+                        force_llm=force_llm_novelty,
+                    )
+                results = scaffold['results']
+                if 'titles' in results:
+                    st.info(f"Suggested paper title: {results['titles']}")
+                if 'abstract' in results:
+                    st.info(f"Suggested Abstract: {results['abstract']}")
+                if 'novelty' in results:
+                    _show_novelty(results['novelty'])
+                if 'hypotheses' in results:
+                    st.dataframe(pl.DataFrame(results['hypotheses']))
+                if 'experiment' in results:
+                    st.code(results['experiment'], language="yaml")
+                for step, error in scaffold['errors'].items():
+                    st.error(f"{step}: {error}")
+                st.caption(f"Scaffold generated in {scaffold['total_seconds']:.1f} s")
+                st.dataframe(pl.DataFrame([{"step": step, "seconds": round(seconds, 2)} for step, seconds in scaffold['timings'].items()]))
         if suggest_paper_title:
-            relate_summaries_list = similarity_search(paper_name, username, ' '.join(st.session_state['keywords']))['results'][-1]
-            relate_summaries = "\n".join([chunk['payload']['text'] for chunk in relate_summaries_list])
-            # Call the LLM to get suggested paper title
-            sg_paper_title = llm_paper_title_prompt(
-                keywords=st.session_state['keywords'],
-                user_draft_title=paper_title if paper_title else "",
-                relate_summaries=relate_summaries
-            )
-            st.info(f"Suggested paper title: {sg_paper_title}")
+            with span("ui.suggest_paper_title"):
+                # Search hits are packed into the prompt by score within the model's token budget
+                relate_summaries = similarity_search(paper_name, username, ' '.join(st.session_state['keywords']))['results'][-1]
+                # Call the LLM to get suggested paper title, streaming tokens until the reply is parsed
+                stream_box = st.empty()
+                sg_paper_title = llm_paper_title_prompt(
+                    keywords=st.session_state['keywords'],
+                    user_draft_title=paper_title if paper_title else "",
+                    relate_summaries=relate_summaries,
+                    stream_writer=stream_box.write_stream,
+                    regenerate=regenerate,
+                )
+                stream_box.empty()
+                st.info(f"Suggested paper title: {sg_paper_title}")
         if suggest_abstract:
-            relate_chunks_list = similarity_search(paper_name, username, ' '.join(st.session_state['keywords']))['results'][0]
-            relate_chunks = "\n".join([chunk['payload']['text'] for chunk in relate_chunks_list])
-            # Call the LLM to get suggested abstract
-            sg_abstract = llm_abstract_prompt(
-                keywords=st.session_state['keywords'],
-                paper_title=paper_title if paper_title else "",
-                relate_summaries=relate_chunks,
-                user_draft_abstract=abstract if abstract else "",
-            )
-            st.info(f"Suggested Abstract: {sg_abstract}")
+            with span("ui.suggest_abstract"):
+                relate_chunks = similarity_search(paper_name, username, ' '.join(st.session_state['keywords']))['results'][0]
+                # Call the LLM to get suggested abstract
+                stream_box = st.empty()
+                sg_abstract = llm_abstract_prompt(
+                    keywords=st.session_state['keywords'],
+                    paper_title=paper_title if paper_title else "",
+                    relate_summaries=relate_chunks,
+                    user_draft_abstract=abstract if abstract else "",
+                    stream_writer=stream_box.write_stream,
+                    regenerate=regenerate,
+                )
+                stream_box.empty()
+                st.info(f"Suggested Abstract: {sg_abstract}")
         if novelty_check:
-            # Call the LLM to get novelty check
-            # perplexity check -> summarize
-            novelty_check_result = llm_novelty_check(
-                paper_title=paper_title if paper_title else "",
-                paper_abstract=abstract if abstract else "",
-            )
-            st.markdown("**Novelty Check Result**")
-            st.markdown(f"Novelty: {novelty_check_result['novelty']}")
-            st.markdown(f"Reason: {novelty_check_result['reason']}")
-            st.markdown(f"Suggestion: {novelty_check_result['suggestion']}")
+            with span("ui.novelty_check"):
+                # Local pre-screen against the related papers first, the remote LLM only when it is inconclusive
+                stream_box = st.empty()
+                novelty_check_result = check_novelty(
+                    paper_title=paper_title if paper_title else "",
+                    paper_abstract=abstract if abstract else "",
+                    prescreen=prescreen,
+                    force_llm=force_llm_novelty,
+                    stream_writer=stream_box.write_stream,
+                    regenerate=regenerate,
+                )
+                stream_box.empty()
+                _show_novelty(novelty_check_result)
         if save_section1:
             paper_title = st.session_state.get('paper_title', paper_title)
             abstract = st.session_state.get('abstract', abstract)
-            generator_data['paper_title'] = paper_title
-            generator_data['abstract'] = abstract
-            update_paper_idea(paper_name, username, {"generator": generator_data})
+            _save_paper_fields(paper_name, username, paper_data, "Paper title and Abstract updated successfully!",
+                               set_fields={"generator.paper_title": paper_title, "generator.abstract": abstract})
             st.session_state.paper_title = paper_title
             st.session_state.abstract = abstract
-            st.success("Paper title and Abstract updated successfully!")
         ## 2. Proposal Hypotheses
         st.divider()
         st.subheader("Proposal Hypotheses")
@@ -224,15 +327,15 @@ def view_paper_dialog(paper_name, username):
         hypotheses_btn = st.button("Save", key="hypotheses_btn")
         suggest_hypotheses = st.button("Suggest Hypotheses", key="suggest_hypotheses")
         if hypotheses_btn:
-            generator_data['hypotheses'] = hypotheses
-            update_paper_idea(paper_name, username, {"generator": generator_data})
+            _save_paper_fields(paper_name, username, paper_data, "Proposal hypotheses updated successfully!",
+                               set_fields={"generator.hypotheses": hypotheses})
             st.session_state.hypotheses = hypotheses
-            st.success("Proposal hypotheses updated successfully!")
         if suggest_hypotheses:
             # Call the LLM to get suggested hypotheses
             sg_hypotheses = llm_hypotheses_prompt(
                 paper_title=st.session_state['paper_title'] if st.session_state.get('paper_title') else "",
                 paper_abstract=st.session_state['abstract'] if st.session_state.get('abstract') else "",
+                regenerate=regenerate,
             )
             # dict to polar dataframe
             st.json(
@@ -248,25 +351,27 @@ def view_paper_dialog(paper_name, username):
         generate_experiment_structure_btn = st.button("Generate Experiment Structure", key="generate_experiment_structure")
         if generate_experiment_structure_btn:
             # Call the LLM to get suggested experiment structure
+            stream_box = st.empty()
             experiment_structure_yaml = llm_experiment_design_prompt(
                 paper_abstract=st.session_state['abstract'] if st.session_state.get('abstract') else "",
                 paper_hypotheses=st.session_state['hypotheses'] if st.session_state.get('hypotheses') else "",
                 paper_title=st.session_state['paper_title'] if st.session_state.get('paper_title') else "",
+                stream_writer=stream_box.write_stream,
+                regenerate=regenerate,
             )
+            stream_box.empty()
             st.session_state['experiment_structure'] = experiment_structure_yaml
             # save to paper idea
-            generator_data['experiment_structure'] = experiment_structure_yaml
-            update_paper_idea(paper_name, username, {"generator": generator_data})
-            st.success("Experiment structure updated successfully!")
+            _save_paper_fields(paper_name, username, paper_data, "Experiment structure updated successfully!",
+                               set_fields={"generator.experiment_structure": experiment_structure_yaml})
 
         st.code(st.session_state.get('experiment_structure', ""), language="yaml")
         save_experiment_structure_btn = st.button("Save Experiment Structure", key="save_experiment_structure")
         if save_experiment_structure_btn:
             experiment_structure_yaml = st.session_state.get('experiment_structure', "")
-            generator_data['experiment_structure'] = experiment_structure_yaml
-            update_paper_idea(paper_name, username, {"generator": generator_data})
+            _save_paper_fields(paper_name, username, paper_data, "Experiment structure updated successfully!",
+                               set_fields={"generator.experiment_structure": experiment_structure_yaml})
             st.session_state['experiment_structure'] = experiment_structure_yaml
-            st.success("Experiment structure updated successfully!")
 
     # Tab 5: Paper Generate
     with tab5:
@@ -1,6 +1,7 @@
 import streamlit as st
-import os
-import requests
+
+from .utils.http_client import post
+from .utils.data import invalidate_paper_cache
 
 def new_idea(data:dict):
     """
@@ -11,17 +12,15 @@ def new_idea(data:dict):
         "username": "Owner Username"
     }
     """
-    url = os.getenv("BACKEND_SERVER", "http://localhost:8000") + "/papers/create"
+    path = "/papers/create"
     payload = {
         "paper_name": data["name"],
         "desc": data["desc"],
         "icon": data["icon"],
         "username": data["owner"]
     }
-    headers = {
-        "Content-Type": "application/json"
-    }
-    response = requests.post(url, json=payload, headers=headers)
+    response = post(path, payload)
+    invalidate_paper_cache(data["owner"])
     if response.status_code == 200:
         return response.json()
     else:
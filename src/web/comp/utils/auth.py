@@ -1,18 +1,15 @@
-import os
-import requests
-
-BACKEND_SERVER = os.getenv("BACKEND_SERVER", "http://localhost:8000")
+from .http_client import post
 
 def login(username: str, password: str) -> bool:
     """
     Login to the system.
     """
-    url = f"{BACKEND_SERVER}/login"
+    path = "/login"
     payload = {
         "username": username,
         "password": password
     }
-    response = requests.post(url, json=payload)
+    response = post(path, payload, idempotent=True)
     
     if response.status_code == 200:
         return True
@@ -23,12 +20,12 @@ def register(username: str, password: str) -> bool:
     """
     Register a new user.
     """
-    url = f"{BACKEND_SERVER}/register"
+    path = "/register"
     payload = {
         "username": username,
         "password": password
     }
-    response = requests.post(url, json=payload)
+    response = post(path, payload)
     
     if response.status_code == 200:
         return True
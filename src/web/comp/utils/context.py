@@ -0,0 +1,76 @@
+import os
+import re
+import json
+from functools import lru_cache
+from typing import Union
+
+import tiktoken
+
+CONTEXT_ENCODING = os.getenv("CONTEXT_ENCODING", "o200k_base")
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+# Per-model overrides, e.g. CONTEXT_TOKEN_BUDGETS='{"openai/o3-mini": 6000}'
+CONTEXT_TOKEN_BUDGETS: dict[str, int] = json.loads(os.getenv("CONTEXT_TOKEN_BUDGETS", "{}"))
+
+# A retrieved chunk is either a search hit ({"score": float, "payload": {"text": str}}) or plain text
+Chunk = Union[dict, str]
+
+@lru_cache(maxsize=None)
+def get_tokenizer(encoding_name: str = CONTEXT_ENCODING) -> tiktoken.Encoding:
+    """
+    Get a tokenizer, loaded once per process.
+    """
+    return tiktoken.get_encoding(encoding_name)
+
+def token_budget(model: str) -> int:
+    """
+    Get the number of context tokens allowed in a prompt for `model`.
+    """
+    return CONTEXT_TOKEN_BUDGETS.get(model, CONTEXT_TOKEN_BUDGET)
+
+def _normalize(chunks: Union[list[Chunk], str]) -> list[tuple[str, float]]:
+    if isinstance(chunks, str):
+        chunks = [chunks]
+    normalized = []
+    for chunk in chunks:
+        if isinstance(chunk, dict):
+            normalized.append(((chunk.get("payload") or {}).get("text", ""), float(chunk.get("score") or 0.0)))
+        else:
+            normalized.append((str(chunk), 0.0))
+    return [(text, score) for text, score in normalized if text.strip()]
+
+def build_context(chunks: Union[list[Chunk], str], model: str, budget: int = None, separator: str = "\n\n") -> str:
+    """
+    Pack retrieved chunks into a context string that fits a token budget.
+
+    Chunks are de-duplicated (keeping the best score), ordered by score and added greedily;
+    a chunk that does not fit is skipped in favour of smaller, lower-scored ones. If not even
+    the best chunk fits, it is truncated to the budget.
+
+    Args:
+        chunks: Search hits with "score" and "payload.text", plain strings, or a single string.
+        model (str): Model the prompt is for, selects the default budget.
+        budget (int): Token budget, overrides the model default.
+        separator (str): Text placed between chunks.
+
+    Returns:
+        str: The packed context.
+    """
+    budget = token_budget(model) if budget is None else budget
+    best: dict[str, tuple[str, float]] = {}
+    for text, score in _normalize(chunks):
+        key = re.sub(r"\s+", " ", text).strip().lower()
+        if key not in best or score > best[key][1]:
+            best[key] = (text.strip(), score)
+    ordered = sorted(best.values(), key=lambda item: item[1], reverse=True)
+
+    tokenizer = get_tokenizer()
+    separator_tokens = len(tokenizer.encode(separator, disallowed_special=()))
+    packed, used = [], 0
+    for text, _ in ordered:
+        cost = len(tokenizer.encode(text, disallowed_special=())) + (separator_tokens if packed else 0)
+        if used + cost <= budget:
+            packed.append(text)
+            used += cost
+    if not packed and ordered and budget > 0:
+        packed.append(tokenizer.decode(tokenizer.encode(ordered[0][0], disallowed_special=())[:budget]))
+    return separator.join(packed)
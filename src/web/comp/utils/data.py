@@ -1,69 +1,141 @@
+import os
+import time
 import httpx
 from httpx_sse import connect_sse
-import os
 import json
-import requests
 import logging
+import threading
 import streamlit as st
 
+from .http_client import get_http_client, post
+from .tracing import span
+
 logging.basicConfig(level=logging.INFO)
 
-BACKEND_SERVER = os.getenv("BACKEND_SERVER", "http://localhost:8000")
+READ_CACHE_TTL = int(os.getenv("READ_CACHE_TTL", "300"))
+READ_CACHE_MAX_ENTRIES = int(os.getenv("READ_CACHE_MAX_ENTRIES", "1000"))
+INDEX_STREAM_RECONNECTS = int(os.getenv("INDEX_STREAM_RECONNECTS", "5"))
+INDEX_STREAM_READ_TIMEOUT = float(os.getenv("INDEX_STREAM_READ_TIMEOUT", "60")) # a few backend heartbeats
+
+# Cached reads take a generation number as argument, bumping it makes the next call miss the cache.
+# Generations are per process, like the st.cache_data caches they key.
+_cache_generations: dict[tuple, int] = {}
+_cache_lock = threading.Lock()
+
+class _ReadFailed(Exception):
+    """
+    Raised inside cached reads so that failed responses are not cached.
+    """
+
+def _generation(*key) -> int:
+    return _cache_generations.get(key, 0)
 
-def list_all_paper_idea(username):
+def _bump_generation(*key) -> None:
+    with _cache_lock:
+        _cache_generations[key] = _cache_generations.get(key, 0) + 1
+
+def invalidate_paper_cache(username, paper_name=None):
     """
-    List all paper ideas for a given username.
+    Invalidate the cached idea list of `username` and, if given, the cached reads of one paper idea.
     """
-    url = f"{BACKEND_SERVER}/papers/list"
+    _bump_generation("list", username)
+    if paper_name is not None:
+        _bump_generation("paper", username, paper_name)
+
+def invalidate_collection_cache():
+    """
+    Invalidate cached vector store collection information.
+    """
+    _bump_generation("collections")
+
+def list_paper_idea_page(username, query="", page=1, page_size=12):
+    """
+    List one page of paper ideas for a given username, optionally filtered by name.
+    Only the fields shown on the home page cards are returned.
+    """
+    try:
+        return _list_paper_idea_page(username, query, page, page_size, _generation("list", username))
+    except _ReadFailed:
+        return {"status": "fail", "papers": [], "total": 0, "page": page, "page_size": page_size}
+
+@st.cache_data(ttl=READ_CACHE_TTL, max_entries=READ_CACHE_MAX_ENTRIES, show_spinner=False)
+def _list_paper_idea_page(username, query, page, page_size, generation):
+    path = "/papers/list"
     payload = {
-        "username": username
-    }
-    headers = {
-        "Content-Type": "application/json"
+        "username": username,
+        "query": query,
+        "page": page,
+        "page_size": page_size
     }
-    response = requests.post(url, json=payload, headers=headers)
+    response = post(path, payload, idempotent=True)
     if response.status_code == 200:
         return response.json()
-    else:
-        return {"status": "fail", "papers": []}
+    raise _ReadFailed(response.status_code)
 
 def get_paper_idea(paper_name, username):
     """
     Get a paper idea by its name.
     """
-    url = f"{BACKEND_SERVER}/papers/get_one"
+    try:
+        return _get_paper_idea(paper_name, username, _generation("paper", username, paper_name))
+    except _ReadFailed:
+        return {"status": "fail", "paper": {}}
+
+@st.cache_data(ttl=READ_CACHE_TTL, max_entries=READ_CACHE_MAX_ENTRIES, show_spinner=False)
+def _get_paper_idea(paper_name, username, generation):
+    path = "/papers/get_one"
     payload = {
         "paper_name": paper_name,
         "username": username
     }
-    headers = {
-        "Content-Type": "application/json"
-    }
-    response = requests.post(url, json=payload, headers=headers)
+    response = post(path, payload, idempotent=True)
     if response.status_code == 200:
         return response.json()
-    else:
-        return {"status": "fail", "paper": {}}
+    raise _ReadFailed(response.status_code)
     
 def update_paper_idea(paper_name, username, new_data):
     """
     Update a paper idea by its name.
     """
-    url = f"{BACKEND_SERVER}/papers/update"
+    path = "/papers/update"
     payload = {
         "paper_name": paper_name,
         "username": username,
         "new_data": new_data
     }
-    headers = {
-        "Content-Type": "application/json"
+    response = post(path, payload)
+    invalidate_paper_cache(username, paper_name)
+    if response.status_code == 200:
+        return response.json()
+    else:
+        return {"status": "fail"}
+
+def patch_paper_idea(paper_name, username, set_fields=None, append=None, remove=None, expected_version=None):
+    """
+    Apply a field-level patch to a paper idea.
+
+    `set_fields` uses dotted paths (e.g. {"generator.abstract": "..."}), `append`/`remove`
+    work on the `keywords` and `related_papers` arrays. When `expected_version` is given
+    the backend rejects the patch if the idea has been changed since it was read.
+    """
+    path = "/papers/patch"
+    payload = {
+        "paper_name": paper_name,
+        "username": username,
+        "set": set_fields or {},
+        "append": append or {},
+        "remove": remove or {},
+        "expected_version": expected_version
     }
-    response = requests.post(url, json=payload, headers=headers)
+    response = post(path, payload)
+    invalidate_paper_cache(username, paper_name)
     if response.status_code == 200:
         return response.json()
+    elif response.status_code == 409:
+        return {"status": "conflict", **response.json().get("detail", {})}
     else:
         return {"status": "fail"}
-    
+
 def get_related_papers(keywords):
     """
     Get related papers based on keywords.
@@ -72,7 +144,7 @@ def get_related_papers(keywords):
         "status": "fail",
         "papers": []
     }
-    url = f"{BACKEND_SERVER}/arxiv/search"
+    path = "/arxiv/search"
     
     # Split the keyword string into a list and include the original keyword string
     keyword_list = [keywords] + [k.strip() for k in keywords]
@@ -80,10 +152,7 @@ def get_related_papers(keywords):
         payload_list = {
             "query": keyword,
         }
-        headers = {
-            "Content-Type": "application/json"
-        }
-        response = requests.post(url, json=payload_list, headers=headers)
+        response = post(path, payload_list, idempotent=True)
         logging.info(f"Response status code: {response.status_code}")
         if response.status_code == 200:
             data = response.json()
@@ -97,45 +166,79 @@ def get_related_papers(keywords):
 
     return return_data
 
+def _progress_text(progress: dict) -> str:
+    text = f"{progress.get('status') or progress['stage']} ({progress['done']}/{progress['total']})"
+    if progress.get('rate'):
+        text += f" · {progress['rate']:.1f}/s"
+    if progress.get('eta_seconds') is not None and progress['done'] < progress['total']:
+        text += f" · ETA {progress['eta_seconds']:.0f} s"
+    return text
+
 def get_emb_index(paper_name: str, username: str):
     """
-    Get embedding index for a paper using SSE with httpx.
+    Get embedding index for a paper using SSE with httpx, rendering progress as a single bar.
+
+    If the stream drops, reconnect with the last event ID to resume the same indexing job
+    on the backend instead of starting a new one.
     """
-    url = f"{BACKEND_SERVER}/papers/get_emb_index"
+    # Reconnects stay in one trace, with the backend's indexing spans under it
+    with span("index.stream", attributes={"paper.name": paper_name}):
+        return _get_emb_index(paper_name, username)
+
+def _get_emb_index(paper_name: str, username: str):
+    path = "/papers/get_emb_index"
     payload = {
         "paper_name": paper_name,
         "username": username
     }
     results = []
+    overall = 0.0
+    last_event_id = None
+    progress_bar = st.progress(overall, text="Starting indexing...")
     try:
-        # Use httpx.Client to establish a connection
-        with httpx.Client(timeout=None) as client: # timeout=None to avoid timeout for long operations
-            # Use connect_sse to establish an SSE connection
-            # httpx_sse supports passing json parameters
-            with connect_sse(client, "GET", url, json=payload) as event_source:
-                # Check HTTP status code (httpx_sse raises exceptions on connection failure)
-                # event_source.response.raise_for_status() # httpx_sse < 0.4.0
-                # For httpx_sse >= 0.4.0, errors are raised during connect_sse
-
-                # Iterate to receive SSE events
-                for sse in event_source.iter_sse():
-                    # sse.data is the message string yielded each time
-                    if sse.data == "[DONE]":
-                        break
-                    results.append(sse.data)
-                    try:
-                        # Attempt to parse JSON and display status
-                        data = json.loads(sse.data)
-                        status = data.get("status", "processing")
-                        st.toast(status)
-                    except json.JSONDecodeError:
-                        # If not JSON, directly display the raw message
-                        st.toast(f"Received: {sse.data}")
-                    except Exception as e:
-                        st.error(f"Error processing event: {e}")
-                        print(f"Error processing event data: {sse.data}, Error: {e}")
-
-        return {"status": "success", "events": results}
+        # Use the shared client; the backend sends heartbeats, so a silent connection is a dead one
+        client = get_http_client()
+        for attempt in range(INDEX_STREAM_RECONNECTS + 1):
+            headers = {"Last-Event-ID": last_event_id} if last_event_id else {}
+            try:
+                # Use connect_sse to establish an SSE connection
+                # httpx_sse supports passing json parameters
+                with connect_sse(client, "GET", path, json=payload, headers=headers,
+                                 timeout=httpx.Timeout(10.0, read=INDEX_STREAM_READ_TIMEOUT)) as event_source:
+                    event_source.response.raise_for_status()
+                    # Iterate to receive SSE events (heartbeat comments are skipped by httpx_sse)
+                    for sse in event_source.iter_sse():
+                        if sse.id:
+                            last_event_id = sse.id
+                        if sse.data == "[DONE]":
+                            progress_bar.progress(1.0, text="Indexing done.")
+                            return {"status": "success", "events": results}
+                        results.append(sse.data)
+                        try:
+                            data = json.loads(sse.data)
+                        except json.JSONDecodeError:
+                            continue
+                        if sse.event == "error":
+                            st.error(f"Indexing failed: {data.get('error')}")
+                            return {"status": "fail", "events": results, "error": data.get("error")}
+                        if sse.event == "progress":
+                            # Overall fraction: finished stages plus the share done of the current one
+                            stage_fraction = data['done'] / data['total'] if data['total'] else 1.0
+                            overall = min((data['step'] - 1 + stage_fraction) / data['steps'], 1.0)
+                            progress_bar.progress(overall, text=_progress_text(data))
+                        elif isinstance(data, dict) and data.get("status"):
+                            progress_bar.progress(overall, text=data["status"])
+                    # The stream ended without [DONE]
+                    raise httpx.RemoteProtocolError("Stream closed before the indexing job finished",
+                                                    request=event_source.response.request)
+            except httpx.TransportError as exc:
+                if attempt == INDEX_STREAM_RECONNECTS:
+                    raise
+                logging.info(f"Indexing stream dropped ({exc!r}), resuming after event {last_event_id}")
+                progress_bar.progress(overall, text="Connection lost, resuming...")
+                time.sleep(min(2 ** attempt, 10))
+
+        return {"status": "fail", "events": results}
 
     except httpx.RequestError as exc:
         st.error(f"An error occurred while requesting {exc.request.url!r}: {exc}")
@@ -146,45 +249,86 @@ def get_emb_index(paper_name: str, username: str):
     except Exception as e:
         st.error(f"An unexpected error occurred: {e}")
         return {"status": "fail", "events": [], "error": str(e)}
+    finally:
+        # The index build rewrites emb_index and fills new collections
+        invalidate_paper_cache(username, paper_name)
+        invalidate_collection_cache()
     
-def get_emb_col_info(col_name: str):
+def get_emb_col_stats(paper_name: str, username: str):
     """
-    Get embedding collection information.
+    Get statistics of all embedding collections of a paper idea in one request.
     """
-    url = f"{BACKEND_SERVER}/vec_store/col_count/{col_name}"
-    headers = {
-        "Content-Type": "application/json"
+    try:
+        return _get_emb_col_stats(paper_name, username,
+                                  _generation("paper", username, paper_name), _generation("collections"))
+    except _ReadFailed:
+        return {"status": "fail", "collections": []}
+
+@st.cache_data(ttl=READ_CACHE_TTL, max_entries=READ_CACHE_MAX_ENTRIES, show_spinner=False)
+def _get_emb_col_stats(paper_name, username, paper_generation, collections_generation):
+    path = "/vec_store/stats"
+    payload = {
+        "paper_name": paper_name,
+        "username": username
     }
-    response = requests.get(url, headers=headers)
+    response = post(path, payload, idempotent=True)
     if response.status_code == 200:
-        return {"status": "success",
-                "collection_name": col_name,
-                **response.json()}
-    else:
-        return {"status": "fail",
-            "collection_name": col_name,
-            "indexed_vectors_count": 0,
-            "optimizer_status": "unknown",
-            "points_count": 0,
-            "segments_count": 0,
-            "status": "unknown",
-            "vectors_count": 0}
-    
+        return response.json()
+    raise _ReadFailed(response.status_code)
+
 def similarity_search(paper_name: str, username: str, query: str):
     """
     Perform similarity search for a given paper name and username.
     """
-    url = f"{BACKEND_SERVER}/papers/similarity_search"
+    try:
+        return _similarity_search(paper_name, username, query, _generation("paper", username, paper_name))
+    except _ReadFailed:
+        return {"status": "fail", "results": []}
+
+@st.cache_data(ttl=READ_CACHE_TTL, max_entries=READ_CACHE_MAX_ENTRIES, show_spinner=False)
+def _similarity_search(paper_name, username, query, generation):
+    path = "/papers/similarity_search"
     payload = {
         "paper_name": paper_name,
         "username": username,
         "query": query
     }
-    headers = {
-        "Content-Type": "application/json"
+    response = post(path, payload, idempotent=True)
+    if response.status_code == 200:
+        return response.json()
+    raise _ReadFailed(response.status_code)
+
+def novelty_prescreen(paper_name: str, username: str, paper_title: str, paper_abstract: str, limit: int = 5):
+    """
+    Run the local novelty pre-screen of a draft against the paper idea's related papers.
+    """
+    path = "/papers/novelty_prescreen"
+    payload = {
+        "paper_name": paper_name,
+        "username": username,
+        "title": paper_title,
+        "abstract": paper_abstract,
+        "limit": limit
     }
-    response = requests.post(url, json=payload, headers=headers)
+    response = post(path, payload, idempotent=True)
     if response.status_code == 200:
         return response.json()
-    else:
-        return {"status": "fail", "results": []}
\ No newline at end of file
+    logging.warning(f"Novelty pre-screen failed: {response.status_code} {response.text}")
+    return {"status": "fail", "verdict": "inconclusive", "overlaps": []}
+
+def suggest_keywords(paper_name: str, username: str, keywords: list[str], top_n: int = 5):
+    """
+    Get keyword suggestions mined from the paper idea's related papers, without an LLM.
+    """
+    path = "/papers/suggest_keywords"
+    payload = {
+        "paper_name": paper_name,
+        "username": username,
+        "keywords": keywords,
+        "top_n": top_n
+    }
+    response = post(path, payload, idempotent=True)
+    if response.status_code == 200:
+        return response.json()
+    logging.warning(f"Keyword suggestion failed: {response.status_code} {response.text}")
+    return {"status": "fail", "keywords": []}
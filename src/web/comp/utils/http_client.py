@@ -0,0 +1,89 @@
+import os
+import time
+import random
+import logging
+import httpx
+import streamlit as st
+from opentelemetry.trace import SpanKind
+
+from .tracing import span, inject_trace_headers
+
+BACKEND_SERVER = os.getenv("BACKEND_SERVER", "http://localhost:8000")
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "120"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.3"))
+RETRY_STATUS_CODES = {502, 503, 504}
+
+logger = logging.getLogger(__name__)
+
+@st.cache_resource
+def get_http_client() -> httpx.Client:
+    """
+    Get the keep-alive HTTP client shared by every session of this Streamlit server process.
+
+    HTTP/2 is negotiated when the backend is served over TLS; plain http falls back to HTTP/1.1 keep-alive.
+    The transport retries failed connection attempts on its own. Every request carries the current trace context.
+    """
+    transport = httpx.HTTPTransport(
+        http2=True,
+        retries=HTTP_RETRIES,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+    return httpx.Client(
+        base_url=BACKEND_SERVER,
+        transport=transport,
+        timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        event_hooks={"request": [inject_trace_headers]},
+    )
+
+def request(method: str, path: str, idempotent: bool = False, **kwargs) -> httpx.Response:
+    """
+    Send a request to the backend through the shared client.
+
+    Idempotent requests are also retried, with jittered exponential backoff, on timeouts
+    and on 502/503/504 responses.
+
+    Args:
+        method (str): HTTP method.
+        path (str): Path relative to BACKEND_SERVER, e.g. "/papers/list".
+        idempotent (bool): Whether the request is safe to send again.
+        **kwargs: Passed to `httpx.Client.request` (json, headers, timeout, ...).
+
+    Returns:
+        httpx.Response: The last response received.
+    """
+    with span(f"{method} {path}", SpanKind.CLIENT, {"http.request.method": method, "url.path": path}) as current:
+        response = _request(method, path, idempotent, **kwargs)
+        current.set_attribute("http.response.status_code", response.status_code)
+        return response
+
+def _request(method: str, path: str, idempotent: bool, **kwargs) -> httpx.Response:
+    client = get_http_client()
+    attempts = HTTP_RETRIES + 1 if idempotent else 1
+    for attempt in range(attempts):
+        last_attempt = attempt == attempts - 1
+        try:
+            response = client.request(method, path, **kwargs)
+        except httpx.TimeoutException:
+            if last_attempt:
+                raise
+            logger.info(f"Timeout on {method} {path}, retrying ({attempt+1}/{attempts-1})")
+        else:
+            if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                return response
+            logger.info(f"HTTP {response.status_code} on {method} {path}, retrying ({attempt+1}/{attempts-1})")
+        time.sleep(HTTP_RETRY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+def get(path: str, idempotent: bool = True, **kwargs) -> httpx.Response:
+    return request("GET", path, idempotent=idempotent, **kwargs)
+
+def post(path: str, payload: dict, idempotent: bool = False, **kwargs) -> httpx.Response:
+    return request("POST", path, idempotent=idempotent, json=payload, **kwargs)
@@ -1,7 +1,18 @@
 import os
 import json
+import time
 import logging
-from openai import OpenAI
+from functools import lru_cache
+from typing import Callable, Iterator, Optional
+from openai import OpenAI, DefaultHttpxClient, APIConnectionError, APITimeoutError, RateLimitError, InternalServerError
+import httpx
+from httpx_sse import EventSource
+from opentelemetry.trace import SpanKind
+
+from .llm_cache import LLMCache, get_llm_cache
+from .context import Chunk, build_context
+from .resilience import LatencyTracker, hedged_call, remaining, retry_with_backoff, with_deadline
+from .tracing import span, inject_trace_headers
 
 OPENROUTE_BASE_URL = os.getenv("OPENROUTE_BASE_URL", "https://openrouter.ai/api/v1")
 OPENROUTE_API_KEY = os.getenv("OPENROUTE_API_KEY", "your_openroute_api_key")
@@ -11,6 +22,35 @@ ABSTRACT_PROMPT_MODEL = os.getenv("ABSTRACT_PROMPT_MODEL", "microsoft/phi-4-reas
 NOVELTY_CHECK_MODEL = os.getenv("NOVELTY_CHECK_MODEL", "perplexity/sonar-reasoning-pro")
 HYPOTHESES_PROMPT_MODEL = os.getenv("HYPOTHESES_PROMPT_MODEL", "openai/o3-mini")
 LLM_MODEL = os.getenv("LLM_MODEL", "openai/o3-mini")
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+# Send LLM calls through the backend gateway (/llm/chat) instead of directly to OpenRouter
+LLM_GATEWAY_ENABLED = os.getenv("LLM_GATEWAY_ENABLED", "true").lower() == "true"
+BACKEND_SERVER = os.getenv("BACKEND_SERVER", "http://localhost:8000")
+# Fallback/hedge models per function, empty to disable
+KEY_PROMPT_FALLBACK_MODEL = os.getenv("KEY_PROMPT_FALLBACK_MODEL", "")
+TITLE_PROMPT_FALLBACK_MODEL = os.getenv("TITLE_PROMPT_FALLBACK_MODEL", "")
+ABSTRACT_PROMPT_FALLBACK_MODEL = os.getenv("ABSTRACT_PROMPT_FALLBACK_MODEL", "")
+NOVELTY_CHECK_FALLBACK_MODEL = os.getenv("NOVELTY_CHECK_FALLBACK_MODEL", "")
+HYPOTHESES_PROMPT_FALLBACK_MODEL = os.getenv("HYPOTHESES_PROMPT_FALLBACK_MODEL", "")
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "")
+# Network timeout of one attempt, and retries with jittered backoff on timeouts, connection errors, 429 and 5xx
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "90"))
+# Wall-clock budget of one LLM call, retries, hedging and streaming included
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "180"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", "1.0"))
+# Hedged requests fire the fallback model once the primary is slower than its observed p95
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "30"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "2"))
+
+class GatewayBusyError(Exception):
+    """
+    The LLM gateway answered with a retryable status (queue full or upstream failure).
+    """
+
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, RateLimitError, InternalServerError, httpx.TransportError, GatewayBusyError)
 
 # 設定 logging
 logging.basicConfig(
@@ -23,16 +63,182 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def llm_keywords_prompt(current_keywords: list[str]) -> list[str]:
+# Receives the token stream and returns the full text, e.g. `st.write_stream`
+StreamWriter = Callable[[Iterator[str]], str]
+
+latency_tracker = LatencyTracker()
+
+@lru_cache(maxsize=1)
+def get_llm_client() -> OpenAI:
     """
-    根據 current_keywords，向 LLM 要求再建議 5 個與 SCI 領域有關的關鍵字。
-    回傳格式：Python list of str。
+    Get the OpenRouter client shared by all LLM calls of this process, so HTTP connections are reused.
     """
-    # 初始化 client
-    client = OpenAI(
+    return OpenAI(
         base_url=OPENROUTE_BASE_URL,
         api_key=OPENROUTE_API_KEY,
+        timeout=LLM_TIMEOUT,
+        max_retries=0, # retried in _chat with jittered backoff
+        http_client=DefaultHttpxClient(
+            limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS),
+        ),
     )
+
+@lru_cache(maxsize=1)
+def get_gateway_client() -> httpx.Client:
+    """
+    Get the client used to reach the backend LLM gateway, kept apart from the short-lived data calls.
+    """
+    return httpx.Client(
+        base_url=BACKEND_SERVER,
+        timeout=httpx.Timeout(LLM_TIMEOUT, connect=5),
+        limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS),
+        event_hooks={"request": [inject_trace_headers]},
+    )
+
+def _check_gateway_response(response: httpx.Response) -> None:
+    if response.status_code in (429, 502, 503, 504):
+        raise GatewayBusyError(f"LLM gateway returned {response.status_code}: {response.text}")
+    response.raise_for_status()
+
+def _attempt_timeout(deadline: float) -> float:
+    """
+    Network timeout of one attempt: LLM_TIMEOUT, or less if the call's deadline is closer.
+    """
+    return min(LLM_TIMEOUT, remaining(deadline))
+
+def _gateway_stream(model: str, messages: list[dict], timeout: float, **params) -> Iterator[str]:
+    """
+    Open a token stream from the gateway; the request is sent before returning, the tokens are read lazily.
+    """
+    client = get_gateway_client()
+    request = client.build_request("POST", "/llm/chat", json={"model": model, "messages": messages, "params": params, "stream": True},
+                                   timeout=httpx.Timeout(timeout, connect=5))
+    response = client.send(request, stream=True)
+    if response.status_code != 200:
+        response.read()
+        response.close()
+        _check_gateway_response(response)
+
+    def tokens():
+        try:
+            for sse in EventSource(response).iter_sse():
+                if sse.data == "[DONE]":
+                    return
+                data = json.loads(sse.data)
+                if sse.event == "error":
+                    raise RuntimeError(data.get("error"))
+                yield data["delta"]
+        finally:
+            response.close()
+    return tokens()
+
+def _iter_content(stream) -> Iterator[str]:
+    """
+    Yield the text deltas of a streamed chat completion.
+    """
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        stream.close()
+
+def _hedge_delay(model: str) -> float:
+    observed = latency_tracker.percentile(model, LLM_HEDGE_PERCENTILE)
+    return max(LLM_HEDGE_MIN_DELAY, observed if observed is not None else LLM_HEDGE_DEFAULT_DELAY)
+
+def _complete(model: str, messages: list[dict], deadline: float, **params) -> str:
+    """
+    One non-streamed completion with retries within `deadline`, recording its latency.
+    """
+    def attempt():
+        start = time.perf_counter()
+        timeout = _attempt_timeout(deadline)
+        if LLM_GATEWAY_ENABLED:
+            response = get_gateway_client().post("/llm/chat", json={"model": model, "messages": messages, "params": params},
+                                                 timeout=httpx.Timeout(timeout, connect=5))
+            _check_gateway_response(response)
+            content = response.json()["content"]
+        else:
+            response = get_llm_client().chat.completions.create(model=model, messages=messages, timeout=timeout, **params)
+            content = response.choices[0].message.content
+        latency_tracker.observe(model, time.perf_counter() - start)
+        return content
+    return retry_with_backoff(attempt, LLM_MAX_RETRIES, LLM_RETRY_BACKOFF, RETRYABLE_ERRORS, deadline)
+
+def _open_stream(model: str, messages: list[dict], deadline: float, **params) -> Iterator[str]:
+    """
+    Open a streamed completion and return its tokens, which stop with TimeoutError at `deadline`;
+    retries only cover establishing the stream, before any token is shown.
+    """
+    def attempt():
+        timeout = _attempt_timeout(deadline)
+        if LLM_GATEWAY_ENABLED:
+            return _gateway_stream(model, messages, timeout, **params)
+        stream = get_llm_client().chat.completions.create(model=model, messages=messages, stream=True, timeout=timeout, **params)
+        return _iter_content(stream)
+    return with_deadline(retry_with_backoff(attempt, LLM_MAX_RETRIES, LLM_RETRY_BACKOFF, RETRYABLE_ERRORS, deadline), deadline)
+
+def _chat(model: str, system_prompt: str, user_prompt: str, stream_writer: Optional[StreamWriter] = None, regenerate: bool = False, fallback_model: str = "", **params) -> str:
+    """
+    Send a chat completion request and return the reply text.
+
+    If `stream_writer` is given the reply is streamed and handed to it token by token.
+    Replies are served from the persistent LLM cache unless `regenerate` is set, in which
+    case a fresh reply is requested and replaces the cached one.
+    The whole call, retries, hedging and streaming included, has a budget of LLM_DEADLINE
+    seconds, after which TimeoutError is raised; each attempt also has a network timeout of
+    LLM_TIMEOUT, and transient errors are retried while the budget lasts. With a
+    `fallback_model`, non-streamed calls are hedged: the fallback is also sent once the
+    primary is slower than its observed p95 and the first reply wins; streamed calls fall
+    back only if the stream cannot be opened.
+    """
+    attributes = {"llm.model": model, "llm.fallback_model": fallback_model or None, "llm.stream": stream_writer is not None}
+    with span("llm.chat", SpanKind.CLIENT, attributes) as current:
+        content, cached = _chat_in_span(model, system_prompt, user_prompt, stream_writer, regenerate, fallback_model, **params)
+        current.set_attribute("llm.cache_hit", cached)
+        return content
+
+def _chat_in_span(model: str, system_prompt: str, user_prompt: str, stream_writer: Optional[StreamWriter], regenerate: bool, fallback_model: str, **params) -> tuple[str, bool]:
+    cache = get_llm_cache()
+    cache_key = LLMCache.make_key(model, system_prompt, user_prompt, params)
+    if cache is not None and not regenerate:
+        content = cache.get(cache_key)
+        if content is not None:
+            logger.info(f"LLM cache hit for {model}")
+            return (stream_writer(iter([content])) if stream_writer is not None else content), True
+
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user",   "content": user_prompt},
+    ]
+    secondary_model = fallback_model if fallback_model and fallback_model != model else ""
+    deadline = time.monotonic() + LLM_DEADLINE
+    if stream_writer is None:
+        content = hedged_call(
+            lambda: _complete(model, messages, deadline, **params),
+            (lambda: _complete(secondary_model, messages, deadline, **params)) if secondary_model else None,
+            _hedge_delay(model) if LLM_HEDGE_ENABLED else None,
+            deadline,
+        )
+    else:
+        tokens = hedged_call(
+            lambda: _open_stream(model, messages, deadline, **params),
+            (lambda: _open_stream(secondary_model, messages, deadline, **params)) if secondary_model else None,
+            None,
+            deadline,
+        )
+        content = stream_writer(tokens)
+
+    if cache is not None and content:
+        cache.set(cache_key, model, content)
+    return content, False
+
+def llm_keywords_prompt(current_keywords: list[str], stream_writer: Optional[StreamWriter] = None, regenerate: bool = False) -> list[str]:
+    """
+    根據 current_keywords，向 LLM 要求再建議 5 個與 SCI 領域有關的關鍵字。
+    回傳格式：Python list of str。
+    """
     # 準備對話
     system_prompt = "You are an assistant that suggests research keywords in the scientific domain."
     user_prompt = (
@@ -42,14 +248,7 @@ def llm_keywords_prompt(current_keywords: list[str]) -> list[str]:
         "e.g. [\"keyword1\", \"keyword2\", \"keyword3\", \"keyword4\", \"keyword5\"]"
     )
     # 呼叫 LLM
-    response = client.chat.completions.create(
-        model=KEY_PROMPT_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user",   "content": user_prompt},
-        ],
-    )
-    content = response.choices[0].message.content
+    content = _chat(KEY_PROMPT_MODEL, system_prompt, user_prompt, stream_writer=stream_writer, regenerate=regenerate, fallback_model=KEY_PROMPT_FALLBACK_MODEL)
     
     # 將 JSON 字串解析回 Python list
     try:
@@ -63,34 +262,22 @@ def llm_keywords_prompt(current_keywords: list[str]) -> list[str]:
         ]
     return keywords
 
-def llm_paper_title_prompt(keywords: list[str], user_draft_title: str, relate_summaries: list[str]) -> str:
+def llm_paper_title_prompt(keywords: list[str], user_draft_title: str, relate_summaries: list[Chunk], stream_writer: Optional[StreamWriter] = None, regenerate: bool = False) -> str:
     """
     Given keywords and user_draft_title, ask LLM to generate a paper title related to the SCI field.
     Return format: str.
     """
-    # 初始化 client
-    client = OpenAI(
-        base_url=OPENROUTE_BASE_URL,
-        api_key=OPENROUTE_API_KEY,
-    )
     # 準備對話
     system_prompt = "You are an assistant that suggest research paper titles in the scientific domain."
     user_prompt = (
         f"Given the research keywords: {', '.join(keywords)}, user draft title: {user_draft_title}, "
-        f"and the related summaries: {', '.join(relate_summaries)}, "
+        f"and the related summaries: {build_context(relate_summaries, TITLE_PROMPT_MODEL)}, "
         "please suggest three relevant research paper title. "
         "Reply with a JSON array of three strings only. "
         "e.g. [\"title1\", \"title2\", \"title3\"]"
     )
     # 呼叫 LLM
-    response = client.chat.completions.create(
-        model=TITLE_PROMPT_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user",   "content": user_prompt},
-        ],
-    )
-    content = response.choices[0].message.content
+    content = _chat(TITLE_PROMPT_MODEL, system_prompt, user_prompt, stream_writer=stream_writer, regenerate=regenerate, fallback_model=TITLE_PROMPT_FALLBACK_MODEL)
     # 將 JSON 字串解析回 Python list
     try:
         titles = json.loads(content)
@@ -103,36 +290,24 @@ def llm_paper_title_prompt(keywords: list[str], user_draft_title: str, relate_su
         ]
     return titles
 
-def llm_abstract_prompt(keywords: list[str], paper_title: str, relate_summaries: list[str] = [], user_draft_abstract: str = "") -> str:
+def llm_abstract_prompt(keywords: list[str], paper_title: str, relate_summaries: list[Chunk] = [], user_draft_abstract: str = "", stream_writer: Optional[StreamWriter] = None, regenerate: bool = False) -> str:
     """
     According to keywords and paper_title, ask LLM to generate a abstract related to the SCI field.
     Return format: str.
     """
-    # 初始化 client
-    client = OpenAI(
-        base_url=OPENROUTE_BASE_URL,
-        api_key=OPENROUTE_API_KEY,
-    )
     # 準備對話
     system_prompt = "You are an assistant that suggests research paper abstracts in the scientific domain."
     user_prompt = (
         f"Given the research keywords: {', '.join(keywords)}, "
         f"and the research paper title: {paper_title}, "
-        f"and the related summaries: {', '.join(relate_summaries)}, "
+        f"and the related summaries: {build_context(relate_summaries, ABSTRACT_PROMPT_MODEL)}, "
         f"and the user draft abstract: {user_draft_abstract}, "
         "please suggest one relevant research paper abstract. "
         "Reply with a JSON string only. "
         "e.g. {\"abstract\": \"...\"}"
     )
     # 呼叫 LLM
-    response = client.chat.completions.create(
-        model=ABSTRACT_PROMPT_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user",   "content": user_prompt},
-        ],
-    )
-    content = response.choices[0].message.content
+    content = _chat(ABSTRACT_PROMPT_MODEL, system_prompt, user_prompt, stream_writer=stream_writer, regenerate=regenerate, fallback_model=ABSTRACT_PROMPT_FALLBACK_MODEL)
     # 將 JSON 字串解析回 Python dict
     try:
         abstract = json.loads(content)
@@ -143,16 +318,11 @@ def llm_abstract_prompt(keywords: list[str], paper_title: str, relate_summaries:
         }
     return abstract["abstract"]
 
-def llm_novelty_check(paper_title:str, paper_abstract:str) -> dict:
+def llm_novelty_check(paper_title:str, paper_abstract:str, stream_writer: Optional[StreamWriter] = None, regenerate: bool = False) -> dict:
     """
     Check the novelty of a research paper by comparing its title and abstract with existing papers.
     Return format: dict.
     """
-    # 初始化 client
-    client = OpenAI(
-        base_url=OPENROUTE_BASE_URL,
-        api_key=OPENROUTE_API_KEY,
-    )
     # 準備對話
     system_prompt = "You are an assistant that checks the novelty of research papers in the scientific domain."
     user_prompt = (
@@ -162,14 +332,7 @@ def llm_novelty_check(paper_title:str, paper_abstract:str) -> dict:
         "e.g. {\"novelty\": \"1 to 10\", \"reason\": \"...\", \"suggestion\": \"...\"}"
     )
     # 呼叫 LLM
-    response = client.chat.completions.create(
-        model=NOVELTY_CHECK_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user",   "content": user_prompt},
-        ],
-    )
-    content = response.choices[0].message.content
+    content = _chat(NOVELTY_CHECK_MODEL, system_prompt, user_prompt, stream_writer=stream_writer, regenerate=regenerate, fallback_model=NOVELTY_CHECK_FALLBACK_MODEL)
     # 將 JSON 字串解析回 Python dict
     try:
         result = json.loads(content)
@@ -182,16 +345,11 @@ def llm_novelty_check(paper_title:str, paper_abstract:str) -> dict:
         result = json.loads(content)
     return result
 
-def llm_hypotheses_prompt(paper_title:str, paper_abstract:str) -> list[dict]:
+def llm_hypotheses_prompt(paper_title:str, paper_abstract:str, stream_writer: Optional[StreamWriter] = None, regenerate: bool = False) -> list[dict]:
     """
     Generate a hypotheses based on the paper title and abstract.
     Return format: str.
     """
-    # 初始化 client
-    client = OpenAI(
-        base_url=OPENROUTE_BASE_URL,
-        api_key=OPENROUTE_API_KEY,
-    )
     # 準備對話
     system_prompt = "You are an assistant that generates **research hypotheses** strictly aligned with the supplied paper's field (e.g., computer vision, graph learning)."
     user_prompt = (
@@ -214,15 +372,7 @@ def llm_hypotheses_prompt(paper_title:str, paper_abstract:str) -> list[dict]:
     )
 
     # 呼叫 LLM
-    response = client.chat.completions.create(
-        model=HYPOTHESES_PROMPT_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user",   "content": user_prompt},
-        ],
-        response_format={"type": "json_object"},
-    )
-    content = response.choices[0].message.content
+    content = _chat(HYPOTHESES_PROMPT_MODEL, system_prompt, user_prompt, stream_writer=stream_writer, regenerate=regenerate, fallback_model=HYPOTHESES_PROMPT_FALLBACK_MODEL, response_format={"type": "json_object"})
     # 將 JSON 字串解析回 Python dict
     try:
         result = json.loads(content)
@@ -233,16 +383,11 @@ def llm_hypotheses_prompt(paper_title:str, paper_abstract:str) -> list[dict]:
         }
     return result["hypotheses"] if isinstance(result, dict) else result
 
-def llm_experiment_design_prompt(paper_title:str, paper_abstract:str, paper_hypotheses:str) -> str:
+def llm_experiment_design_prompt(paper_title:str, paper_abstract:str, paper_hypotheses:str, stream_writer: Optional[StreamWriter] = None, regenerate: bool = False) -> str:
     """
     Generate an experiment design based on the paper title, abstract, and hypotheses.
     Return format: str.
     """
-    # 初始化 client
-    client = OpenAI(
-        base_url=OPENROUTE_BASE_URL,
-        api_key=OPENROUTE_API_KEY,
-    )
     # 準備對話
     system_prompt = "You generate YAML experiment designs for scientific papers, specifying objectives, methods, data to collect, analyses, and metrics."
     user_prompt = (
@@ -252,14 +397,7 @@ def llm_experiment_design_prompt(paper_title:str, paper_abstract:str, paper_hypo
         "please generate an experiment design and return in yaml format."
     )
     # 呼叫 LLM
-    response = client.chat.completions.create(
-        model=LLM_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user",   "content": user_prompt},
-        ],
-    )
-    content = response.choices[0].message.content
+    content = _chat(LLM_MODEL, system_prompt, user_prompt, stream_writer=stream_writer, regenerate=regenerate, fallback_model=LLM_FALLBACK_MODEL)
     logger.info(f"LLM response: {content}")
     # check if the response is in YAML format
     if content.startswith("```yaml") and content.endswith("```"):
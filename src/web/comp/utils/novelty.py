@@ -0,0 +1,44 @@
+import os
+from typing import Callable, Optional
+
+from .llm import StreamWriter, llm_novelty_check
+
+# "inconclusive": call the remote LLM only when the local pre-screen cannot decide, "always" or "never"
+NOVELTY_LLM_POLICY = os.getenv("NOVELTY_LLM_POLICY", "inconclusive")
+
+def check_novelty(
+    paper_title: str,
+    paper_abstract: str,
+    prescreen: Optional[Callable[[str, str], dict]] = None,
+    force_llm: bool = False,
+    stream_writer: Optional[StreamWriter] = None,
+    regenerate: bool = False,
+) -> dict:
+    """
+    Check the novelty of a draft, locally first and with the remote LLM only when needed.
+
+    Args:
+        paper_title (str): The draft title.
+        paper_abstract (str): The draft abstract.
+        prescreen: Function of (title, abstract) returning the local pre-screen result, None to skip it.
+        force_llm (bool): Run the LLM check whatever the pre-screen says.
+        stream_writer: Where the LLM reply is streamed to.
+        regenerate (bool): Skip cached LLM replies.
+
+    Returns:
+        dict: {"prescreen": pre-screen result or None, "llm": LLM novelty check or None}
+    """
+    prescreen_result = prescreen(paper_title, paper_abstract) if prescreen else None
+    verdict = (prescreen_result or {}).get("verdict", "inconclusive")
+    if prescreen_result is None or prescreen_result.get("status") != "success":
+        verdict = "inconclusive"
+    run_llm = force_llm or NOVELTY_LLM_POLICY == "always" or (NOVELTY_LLM_POLICY == "inconclusive" and verdict == "inconclusive")
+    llm_result = None
+    if run_llm:
+        llm_result = llm_novelty_check(
+            paper_title=paper_title,
+            paper_abstract=paper_abstract,
+            stream_writer=stream_writer,
+            regenerate=regenerate,
+        )
+    return {"prescreen": prescreen_result, "llm": llm_result}
@@ -0,0 +1,133 @@
+import json
+import time
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Optional
+
+from .context import Chunk
+from .llm import (
+    llm_paper_title_prompt,
+    llm_abstract_prompt,
+    llm_hypotheses_prompt,
+    llm_experiment_design_prompt,
+)
+from .novelty import check_novelty
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+# step name -> (names of the steps it needs, function of the results so far)
+Steps = dict[str, tuple[list[str], Callable[[dict], Any]]]
+
+def run_steps(steps: Steps, max_workers: int = 4) -> dict:
+    """
+    Run dependent steps on a thread pool, starting each one as soon as its dependencies are done.
+
+    A failed step is recorded in `errors` and every step depending on it is skipped.
+
+    Returns:
+        dict: {"results": {step: value}, "errors": {step: message}, "timings": {step: seconds}, "total_seconds": float}
+    """
+    results, errors, timings = {}, {}, {}
+    pending = dict(steps)
+    running = {}
+    start = time.perf_counter()
+
+    def timed_call(name, fn, inputs):
+        step_start = time.perf_counter()
+        try:
+            with span(f"scaffold.{name}"):
+                return fn(inputs)
+        finally:
+            timings[name] = time.perf_counter() - step_start
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            for name, (deps, fn) in list(pending.items()):
+                if any(dep in errors for dep in deps):
+                    errors[name] = f"Skipped, depends on failed step: {', '.join(dep for dep in deps if dep in errors)}"
+                    del pending[name]
+                elif all(dep in results for dep in deps):
+                    running[executor.submit(contextvars.copy_context().run, timed_call, name, fn, dict(results))] = name
+                    del pending[name]
+            if not running:
+                # Unsatisfiable dependencies
+                for name in pending:
+                    errors[name] = "Skipped, unknown dependency"
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    logger.exception(f"Scaffold step {name} failed")
+                    errors[name] = str(e)
+
+    return {"results": results, "errors": errors, "timings": timings, "total_seconds": time.perf_counter() - start}
+
+def generate_full_scaffold(
+    keywords: list[str],
+    relate_summaries: list[Chunk],
+    relate_chunks: list[Chunk],
+    paper_title: str = "",
+    paper_abstract: str = "",
+    regenerate: bool = False,
+    prescreen: Optional[Callable[[str, str], dict]] = None,
+    force_llm: bool = False,
+) -> dict:
+    """
+    Generate title suggestions, abstract, novelty check, hypotheses and experiment design in one go.
+
+    Dependencies (independent branches run concurrently):
+        title -> abstract -> novelty
+                          -> hypotheses -> experiment
+    If the user already has a draft title, the abstract does not wait for the title suggestions.
+    The novelty step runs the local `prescreen` first and only calls the LLM when it is inconclusive,
+    or always with `force_llm`.
+
+    Returns:
+        dict: See `run_steps`; results are keyed by "titles", "abstract", "novelty",
+            "hypotheses" and "experiment"; "novelty" is the result of `check_novelty`.
+    """
+    def chosen_title(results: dict) -> str:
+        if paper_title:
+            return paper_title
+        titles = results.get("titles") or []
+        return titles[0] if isinstance(titles, list) and titles else str(titles)
+
+    steps: Steps = {
+        "titles": ([], lambda r: llm_paper_title_prompt(
+            keywords=keywords,
+            user_draft_title=paper_title,
+            relate_summaries=relate_summaries,
+            regenerate=regenerate,
+        )),
+        "abstract": ([] if paper_title else ["titles"], lambda r: llm_abstract_prompt(
+            keywords=keywords,
+            paper_title=chosen_title(r),
+            relate_summaries=relate_chunks,
+            user_draft_abstract=paper_abstract,
+            regenerate=regenerate,
+        )),
+        "novelty": (["abstract"], lambda r: check_novelty(
+            paper_title=chosen_title(r),
+            paper_abstract=r["abstract"],
+            prescreen=prescreen,
+            force_llm=force_llm,
+            regenerate=regenerate,
+        )),
+        "hypotheses": (["abstract"], lambda r: llm_hypotheses_prompt(
+            paper_title=chosen_title(r),
+            paper_abstract=r["abstract"],
+            regenerate=regenerate,
+        )),
+        "experiment": (["hypotheses"], lambda r: llm_experiment_design_prompt(
+            paper_title=chosen_title(r),
+            paper_abstract=r["abstract"],
+            paper_hypotheses=json.dumps(r["hypotheses"], ensure_ascii=False),
+            regenerate=regenerate,
+        )),
+    }
+    return run_steps(steps)
@@ -0,0 +1,158 @@
+import os
+import time
+import random
+import logging
+import threading
+import contextvars
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "50"))
+LLM_LATENCY_MIN_SAMPLES = int(os.getenv("LLM_LATENCY_MIN_SAMPLES", "5"))
+
+logger = logging.getLogger(__name__)
+
+# Hedged requests run here so a slow loser can finish in the background without blocking the caller
+_hedge_executor = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_HEDGE_WORKERS", "16")), thread_name_prefix="llm-hedge")
+
+class LatencyTracker:
+    """
+    Rolling window of observed latencies per model.
+    """
+
+    def __init__(self, window: int = LLM_LATENCY_WINDOW, min_samples: int = LLM_LATENCY_MIN_SAMPLES):
+        self.min_samples = min_samples
+        self._samples: dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def observe(self, model: str, seconds: float) -> None:
+        with self._lock:
+            self._samples[model].append(seconds)
+
+    def percentile(self, model: str, q: float) -> Optional[float]:
+        """
+        Get the q-quantile of the latency of `model`, or None until enough samples are observed.
+        """
+        with self._lock:
+            samples = sorted(self._samples[model])
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    """
+    Seconds left until `deadline` (a `time.monotonic()` value), or None without a deadline.
+
+    Raises:
+        TimeoutError: If the deadline has passed.
+    """
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise TimeoutError("Deadline exceeded")
+    return left
+
+def retry_with_backoff(
+    fn: Callable[[], T],
+    retries: int,
+    backoff: float,
+    retry_on: tuple[type[BaseException], ...],
+    deadline: Optional[float] = None,
+) -> T:
+    """
+    Call `fn`, retrying up to `retries` times on `retry_on` errors with full-jitter exponential backoff.
+    No attempt is started, and no backoff slept, past `deadline` (a `time.monotonic()` value).
+
+    Raises:
+        TimeoutError: If the deadline is reached before a retry.
+    """
+    for attempt in range(retries + 1):
+        remaining(deadline)
+        try:
+            return fn()
+        except retry_on as e:
+            if attempt == retries:
+                raise
+            delay = random.uniform(0, backoff * 2 ** attempt)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise TimeoutError(f"Deadline exceeded, not retrying after {type(e).__name__}") from e
+            logger.info(f"Retrying after {type(e).__name__} in {delay:.2f} s ({attempt+1}/{retries})")
+            time.sleep(delay)
+
+def with_deadline(tokens: Iterator[T], deadline: Optional[float]) -> Iterator[T]:
+    """
+    Pass `tokens` through, stopping with TimeoutError once `deadline` has passed, so a stream that
+    keeps trickling tokens cannot outlive it. The source is closed when it stops early.
+    """
+    try:
+        for token in tokens:
+            remaining(deadline)
+            yield token
+    finally:
+        close = getattr(tokens, "close", None)
+        if close is not None:
+            close()
+
+def _wait_timeout(timeout: Optional[float], deadline: Optional[float]) -> Optional[float]:
+    left = remaining(deadline)
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+def hedged_call(primary: Callable[[], T], secondary: Optional[Callable[[], T]], hedge_after: Optional[float], deadline: Optional[float] = None) -> T:
+    """
+    Call `primary`; fire `secondary` as well if `primary` has not finished after `hedge_after`
+    seconds, or as a fallback if `primary` fails. The first successful result wins.
+
+    With a `deadline` (a `time.monotonic()` value) the caller gets TimeoutError once it passes;
+    calls still running are left to finish in the background.
+
+    Args:
+        primary: The preferred call.
+        secondary: The backup call, or None to only run `primary`.
+        hedge_after: Seconds to wait before hedging, None to only use `secondary` as a fallback.
+        deadline: When to stop waiting for a result, None to wait for the calls to finish.
+
+    Returns:
+        The result of whichever call succeeded first.
+
+    Raises:
+        TimeoutError: If no call succeeded before the deadline.
+    """
+    if secondary is None and deadline is None:
+        return primary()
+
+    # Run in a copy of the caller's context so the calls stay in its trace
+    primary_future = _hedge_executor.submit(contextvars.copy_context().run, primary)
+    if secondary is None:
+        done, _ = wait([primary_future], timeout=_wait_timeout(None, deadline))
+        if not done:
+            raise TimeoutError("Deadline exceeded")
+        return primary_future.result()
+
+    done, _ = wait([primary_future], timeout=_wait_timeout(hedge_after, deadline))
+    if not done:
+        remaining(deadline) # hedge only if there is budget left
+    if done and primary_future.exception() is None:
+        return primary_future.result()
+    if done:
+        logger.info(f"Primary call failed ({primary_future.exception()!r}), falling back")
+    else:
+        logger.info(f"Primary call slower than {hedge_after:.1f} s, sending hedged request")
+
+    secondary_future = _hedge_executor.submit(contextvars.copy_context().run, secondary)
+    pending = {secondary_future} if done else {primary_future, secondary_future}
+    errors = [primary_future.exception()] if done else []
+    while pending:
+        done, pending = wait(pending, timeout=_wait_timeout(None, deadline), return_when=FIRST_COMPLETED)
+        if not done:
+            raise TimeoutError("Deadline exceeded")
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            errors.append(future.exception())
+    raise errors[-1]
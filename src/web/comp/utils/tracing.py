@@ -0,0 +1,69 @@
+import os
+import logging
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterator, Optional
+
+import httpx
+from opentelemetry import trace, propagate
+from opentelemetry.trace import Span, SpanKind
+
+# otlp (to OTEL_EXPORTER_OTLP_ENDPOINT), console, file (JSON lines in TRACE_FILE) or none
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "otlp" if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT") else "none")
+TRACE_FILE = os.getenv("TRACE_FILE", "./traces.jsonl")
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))
+
+logger = logging.getLogger(__name__)
+
+# A proxy until setup_tracing installs a provider; spans are no-ops without one
+tracer = trace.get_tracer("paper-assistant.web")
+
+@lru_cache(maxsize=1)
+def setup_tracing(service_name: str = "web") -> None:
+    """
+    Install the tracer provider and exporter selected by TRACE_EXPORTER, once per process
+    (Streamlit reruns the page script on every interaction).
+    """
+    if TRACE_EXPORTER == "none":
+        return
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    if TRACE_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter()
+    elif TRACE_EXPORTER == "console":
+        exporter = ConsoleSpanExporter()
+    elif TRACE_EXPORTER == "file":
+        exporter = ConsoleSpanExporter(
+            out=open(TRACE_FILE, "a", encoding="utf-8"),
+            formatter=lambda span: span.to_json(indent=None) + os.linesep,
+        )
+    else:
+        raise ValueError(f"Unsupported trace exporter: {TRACE_EXPORTER}")
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name}),
+        sampler=ParentBased(TraceIdRatioBased(TRACE_SAMPLE_RATIO)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    logger.info(f"Tracing {service_name} with the {TRACE_EXPORTER} exporter")
+
+@contextmanager
+def span(name: str, kind: SpanKind = SpanKind.INTERNAL, attributes: Optional[dict] = None) -> Iterator[Span]:
+    """
+    Run the block in a new child span of the current one. Exceptions are recorded on the span;
+    attributes that are None are left out.
+    """
+    attributes = {key: value for key, value in (attributes or {}).items() if value is not None}
+    with tracer.start_as_current_span(name, kind=kind, attributes=attributes) as current:
+        yield current
+
+def inject_trace_headers(request: httpx.Request) -> None:
+    """
+    httpx request hook sending the current trace context to the backend (`traceparent` header).
+    """
+    propagate.inject(request.headers)